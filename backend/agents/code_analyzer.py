@@ -10,6 +10,8 @@ from typing import Dict, List, Optional
 import vertexai
 from vertexai.generative_models import GenerativeModel
 
+from utils.metrics import track_llm_call
+
 
 class CodeAnalyzerAgent:
     """
@@ -36,7 +38,8 @@ class CodeAnalyzerAgent:
         analysis_prompt = self._build_analysis_prompt(file_structure, project_path)
         
         try:
-            response = await self.model.generate_content_async(analysis_prompt)
+            with track_llm_call('code_analyzer'):
+                response = await self.model.generate_content_async(analysis_prompt)
             
             # Properly extract text from Gemini response
             response_text = None
@@ -7,6 +7,8 @@ from typing import Dict
 import vertexai
 from vertexai.generative_models import GenerativeModel
 
+from utils.metrics import track_llm_call
+
 
 class DockerExpertAgent:
     """
@@ -209,7 +211,8 @@ Generate a production-optimized Dockerfile for Google Cloud Run with these requi
 Return ONLY the Dockerfile content, no markdown formatting.
 """
         
-        response = await self.model.generate_content_async(prompt)
+        with track_llm_call('docker_expert'):
+            response = await self.model.generate_content_async(prompt)
         
         # Properly extract text from Gemini response
         dockerfile_content = None
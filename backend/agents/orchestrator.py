@@ -9,18 +9,22 @@ FAANG-Level Production Implementation
 """
 
 import asyncio
+import logging
 import time
 from typing import Dict, List, Optional, Any, Callable
 import vertexai
 from vertexai.generative_models import GenerativeModel, Tool, FunctionDeclaration, Part, GenerationConfig
 from datetime import datetime
 import json
-import uuid
 import os
 from dataclasses import dataclass
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models import Deployment
 from utils.progress_notifier import ProgressNotifier, DeploymentStages
+from utils.metrics import track_llm_call
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -52,10 +56,10 @@ class OrchestratorAgent:
         self.use_vertex_ai = bool(gcloud_project)
         self.gcloud_project = gcloud_project
         
-        print(f"[Orchestrator] Initialization:")
-        print(f"  - Vertex AI: {self.use_vertex_ai} (project: {gcloud_project})")
-        print(f"  - Gemini API key available: {bool(gemini_api_key)}")
-        print(f"  - Fallback ready: {self.use_vertex_ai and bool(gemini_api_key)}")
+        logger.info(
+            "Initialization: Vertex AI: %s (project: %s), Gemini API key available: %s, fallback ready: %s",
+            self.use_vertex_ai, gcloud_project, bool(gemini_api_key), self.use_vertex_ai and bool(gemini_api_key)
+        )
         
         if self.use_vertex_ai:
             if not gcloud_project:
@@ -128,8 +132,7 @@ Env vars auto-parsed from .env. Never clone twice.
             self.create_progress_tracker = create_progress_tracker
             
         except ImportError as e:
-            print(f"[WARNING] Service import failed: {e}")
-            print("[WARNING] Running in mock mode - services not available")
+            logger.warning("Service import failed: %s - running in mock mode, services not available", e)
             # Create mock services for testing
             self._init_mock_services()
     
@@ -240,7 +243,8 @@ Env vars auto-parsed from .env. Never clone twice.
         """
         for attempt in range(max_retries):
             try:
-                return func()
+                with track_llm_call('orchestrator'):
+                    return func()
             except Exception as e:
                 error_str = str(e).lower()
                 # Check if it's a network/connectivity error
@@ -253,8 +257,10 @@ Env vars auto-parsed from .env. Never clone twice.
                     raise  # Not a network error or final attempt - propagate
                 
                 delay = base_delay * (2 ** attempt)  # Exponential backoff
-                print(f"[Orchestrator] Network error (attempt {attempt + 1}/{max_retries}): {str(e)[:100]}")
-                print(f"[Orchestrator] Retrying in {delay}s...")
+                logger.warning(
+                    "Network error (attempt %d/%d): %s - retrying in %ss",
+                    attempt + 1, max_retries, str(e)[:100], delay
+                )
                 await self._send_progress_message(f"🔄 Network issue detected, retrying... (attempt {attempt + 1}/{max_retries})")
                 await asyncio.sleep(delay)
         
@@ -280,15 +286,15 @@ Env vars auto-parsed from .env. Never clone twice.
             ])
             
             if is_quota_error:
-                print(f"[Orchestrator] ⚠️ Quota error detected: {error_str}")
-                print(f"[Orchestrator] Fallback conditions:")
-                print(f"  - Using Vertex AI: {self.use_vertex_ai}")
-                print(f"  - Gemini API key available: {bool(self.gemini_api_key)}")
+                logger.warning(
+                    "Quota error detected: %s (using Vertex AI: %s, Gemini API key available: %s)",
+                    error_str, self.use_vertex_ai, bool(self.gemini_api_key)
+                )
                 
                 # Check if fallback is possible
                 if self.use_vertex_ai and self.gemini_api_key:
                     # Switch to Gemini API fallback
-                    print(f"[Orchestrator] ✅ Activating fallback to Gemini API")
+                    logger.info("Activating fallback to Gemini API")
                     await self._send_progress_message("⚠️ Vertex AI quota exhausted. Switching to backup AI service...")
                     
                     try:
@@ -306,28 +312,29 @@ Env vars auto-parsed from .env. Never clone twice.
                         
                         # Create new chat session with backup model
                         backup_chat = backup_model.start_chat(history=[])
-                        response = backup_chat.send_message(message)
+                        with track_llm_call('orchestrator'):
+                            response = backup_chat.send_message(message)
                         
                         # Switch permanently to Gemini API
                         self.use_vertex_ai = False
                         self.model = backup_model
                         self.chat_session = backup_chat
                         
-                        print(f"[Orchestrator] ✅ Successfully switched to Gemini API")
+                        logger.info("Successfully switched to Gemini API")
                         await self._send_progress_message("✅ Now using Gemini API - deployment continues...")
                         return response
                         
                     except Exception as fallback_err:
-                        print(f"[Orchestrator] ❌ Fallback to Gemini API failed: {fallback_err}")
+                        logger.error("Fallback to Gemini API failed: %s", fallback_err)
                         raise Exception(f"Both Vertex AI and Gemini API failed. Gemini API error: {str(fallback_err)}")
                 
                 elif not self.gemini_api_key:
                     # No API key available for fallback
-                    print(f"[Orchestrator] ❌ No Gemini API key available for fallback")
+                    logger.error("No Gemini API key available for fallback")
                     raise Exception(f"Vertex AI quota exhausted. Please add a Gemini API key in Settings to continue.")
                 else:
                     # Already using Gemini API and still got quota error
-                    print(f"[Orchestrator] ❌ Gemini API also quota exhausted")
+                    logger.error("Gemini API also quota exhausted")
                     raise Exception(f"Gemini API quota exhausted. Please wait a few minutes and try again.")
             
             # Re-raise if not quota error
@@ -422,9 +429,7 @@ Env vars auto-parsed from .env. Never clone twice.
             
         except Exception as e:
             error_msg = str(e)
-            print(f"[Orchestrator] Error: {error_msg}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error: %s", error_msg)
             
             # User-friendly error message for network issues
             if any(keyword in error_msg.lower() for keyword in ['connection', 'network', 'unavailable', 'timeout', 'iocp', 'socket']):
@@ -476,7 +481,7 @@ Env vars auto-parsed from .env. Never clone twice.
                         )
                     await self._send_progress_message(message)
                 except Exception as e:
-                    print(f"[Orchestrator] Clone progress error: {e}")
+                    logger.warning("Clone progress error: %s", e)
             
             await self._send_progress_message("📦 Cloning repository from GitHub...")
             
@@ -542,7 +547,7 @@ Env vars auto-parsed from .env. Never clone twice.
                     await self._send_progress_message(message)
                     
                 except Exception as e:
-                    print(f"[Orchestrator] Progress callback error: {e}")
+                    logger.warning("Progress callback error: %s", e)
                     # Don't fail the analysis if progress update fails
             
             try:
@@ -613,7 +618,7 @@ Env vars auto-parsed from .env. Never clone twice.
                         )
                     await self._send_progress_message(message)
                 except Exception as e:
-                    print(f"[Orchestrator] Dockerfile progress error: {e}")
+                    logger.warning("Dockerfile progress error: %s", e)
             
             dockerfile_save = await self.docker_service.save_dockerfile(
                 analysis_result['dockerfile']['content'],
@@ -672,9 +677,7 @@ Env vars auto-parsed from .env. Never clone twice.
             }
             
         except Exception as e:
-            print(f"[Orchestrator] Clone and analyze error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Clone and analyze error: %s", e)
             return {
                 'type': 'error',
                 'content': f'❌ **Analysis failed**\n\n```\n{str(e)}\n```\n\nPlease try again or check the logs.',
@@ -688,7 +691,7 @@ Env vars auto-parsed from .env. Never clone twice.
         CRITICAL: This method must be called AFTER safe_send is stored in process_message
         """
         if not self.safe_send or not self.session_id:
-            print(f"[Orchestrator] ⚠️ Cannot send progress: safe_send={bool(self.safe_send)}, session_id={bool(self.session_id)}")
+            logger.warning("Cannot send progress: safe_send=%s, session_id=%s", bool(self.safe_send), bool(self.session_id))
             return
         
         try:
@@ -700,9 +703,9 @@ Env vars auto-parsed from .env. Never clone twice.
                 },
                 'timestamp': datetime.now().isoformat()
             })
-            print(f"[Orchestrator] ✅ Sent progress: {message[:50]}...")
+            logger.debug("Sent progress: %.50s...", message)
         except Exception as e:
-            print(f"[Orchestrator] ❌ Error sending progress: {e}")
+            logger.error("Error sending progress: %s", e)
     
     def _extract_text_from_response(self, response) -> str:
         """Extract text content from Gemini response"""
@@ -717,7 +720,7 @@ Env vars auto-parsed from .env. Never clone twice.
                         if hasattr(part, 'text') and part.text
                     ])
         except Exception as e:
-            print(f"[Orchestrator] Error extracting text: {e}")
+            logger.warning("Error extracting text: %s", e)
         return ''
     
     async def _handle_function_call(
@@ -737,7 +740,7 @@ Env vars auto-parsed from .env. Never clone twice.
         function_name = function_call.name
         args = dict(function_call.args)
         
-        print(f"[Orchestrator] Function call: {function_name} with args: {args}")
+        logger.info("Function call: %s", function_name, extra={'function_args': args})
         
         # Route to real service handlers
         handlers = {
@@ -825,7 +828,7 @@ Env vars auto-parsed from .env. Never clone twice.
             project_path = self.project_context['project_path']
             # Normalize path to fix Windows paths
             project_path = project_path.replace('\\', '/').replace('//', '/')
-            print(f"[Orchestrator] Using project_path from context (normalized): {project_path}")
+            logger.info("Using project_path from context (normalized): %s", project_path)
         
         if not project_path:
             return {
@@ -851,13 +854,13 @@ Env vars auto-parsed from .env. Never clone twice.
                 # Extract repo name from URL (e.g., "ihealth_backend.git" -> "ihealth-backend")
                 repo_name = repo_url.split('/')[-1].replace('.git', '').replace('_', '-').lower()
                 service_name = repo_name
-                print(f"[Orchestrator] Auto-generated service_name: {service_name}")
+                logger.info("Auto-generated service_name: %s", service_name)
             else:
                 service_name = 'servergem-app'
         
         # CRITICAL: Use env_vars from project_context if not provided!
         if not env_vars and 'env_vars' in self.project_context and self.project_context['env_vars']:
-            print(f"[Orchestrator] Using env_vars from project_context: {len(self.project_context['env_vars'])} vars")
+            logger.info("Using env_vars from project_context: %d vars", len(self.project_context['env_vars']))
             # Convert format from {key: {value, isSecret}} to {key: value}
             env_vars = {
                 key: val['value'] 
@@ -871,8 +874,9 @@ Env vars auto-parsed from .env. Never clone twice.
                 'timestamp': datetime.now().isoformat()
             }
         
-        # Generate deployment ID for tracking
-        deployment_id = f"deploy-{uuid.uuid4().hex[:8]}"
+        # Generate deployment ID for tracking - the notifier's, when there is one,
+        # so stage updates and tracker events share one stream
+        deployment_id = progress_notifier.deployment_id if progress_notifier else Deployment.new_id()
         start_time = time.time()
         
         try:
@@ -1064,7 +1068,7 @@ Env vars auto-parsed from .env. Never clone twice.
                 service_name,
                 env_vars=deploy_env,
                 progress_callback=deploy_progress,
-                user_id=deployment_id[:8]
+                user_id=deployment_id[-8:]  # hex only - valid in a Cloud Run name
             )
             
             deploy_duration = time.time() - deploy_start
@@ -1157,9 +1161,7 @@ Env vars auto-parsed from .env. Never clone twice.
             
         except Exception as e:
             self.monitoring.complete_deployment(deployment_id, 'failed')
-            print(f"[Orchestrator] Deployment error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Deployment error: %s", e)
             return {
                 'type': 'error',
                 'content': f'❌ **Deployment failed**\n\n```\n{str(e)}\n```',
@@ -1264,7 +1266,7 @@ Which repository would you like to deploy? Just tell me the name or paste the UR
             }
             
         except Exception as e:
-            print(f"[Orchestrator] List repos error: {str(e)}")
+            logger.error("List repos error: %s", e)
             return {
                 'type': 'error',
                 'content': f'❌ **Failed to list repositories**\n\n{str(e)}',
@@ -1323,7 +1325,7 @@ Showing last {min(20, len(logs))} entries (total: {len(logs)})
             }
             
         except Exception as e:
-            print(f"[Orchestrator] Get logs error: {str(e)}")
+            logger.error("Get logs error: %s", e)
             return {
                 'type': 'error',
                 'content': f'❌ **Failed to fetch logs**\n\n{str(e)}',
@@ -4,8 +4,9 @@ FastAPI server optimized for Google Cloud Run
 بِسْمِ اللَّهِ الرَّحْمَٰنِ الرَّحِيمِ
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import os
@@ -13,22 +14,39 @@ from dotenv import load_dotenv
 import asyncio
 from datetime import datetime
 import json
+import logging
 import uuid
-import traceback
 
 from agents.orchestrator import OrchestratorAgent
 from services.deployment_service import deployment_service
 from services.user_service import user_service
 from services.usage_service import usage_service
+from middleware.metrics import MetricsMiddleware
 from middleware.usage_tracker import UsageTrackingMiddleware
-from models import DeploymentStatus, PlanTier
+from middleware.rate_limiter import RateLimitExceeded, rate_limiter
+from models import Deployment, DeploymentStatus, PlanTier
+from storage import DuplicateKeyError, get_storage_writer
 
 # Import progress notifier
 import sys
 sys.path.append(os.path.dirname(__file__))
 from utils.progress_notifier import ProgressNotifier, DeploymentStages
+from utils.response_cache import cached_json_response
+from utils.metrics import WEBSOCKET_ACTIVE_SESSIONS, WEBSOCKET_QUEUED_FRAMES, registry as metrics_registry
+from utils.log import bind_log_context, log_context, setup_logging
+from utils.ws_outbound import OutboundQueue
+from utils.progress_coalescer import ProgressCoalescer, progress_frame_key
+from utils.heartbeat import heartbeat_scheduler
+from utils.replay_buffer import replay_store
+from utils.deployment_events import deployment_events
 
 load_dotenv()
+setup_logging()
+
+logger = logging.getLogger("servergem.app")
+ws_logger = logging.getLogger("servergem.websocket")
+# Per-frame events - sampled (see utils.log.DEFAULT_SAMPLING)
+send_logger = logging.getLogger("servergem.websocket.send")
 
 app = FastAPI(
     title="ServerGem API",
@@ -36,7 +54,13 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS configuration
+# Usage tracking + rate limiting middleware
+app.add_middleware(UsageTrackingMiddleware)
+
+# Request latency histograms + X-Process-Time (measures 429s too)
+app.add_middleware(MetricsMiddleware)
+
+# CORS configuration - added last so it wraps everything, 429s included
 app.add_middleware(
     CORSMiddleware,
     allow_origins=os.getenv("ALLOWED_ORIGINS", "*").split(","),
@@ -45,9 +69,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Usage tracking middleware
-app.add_middleware(UsageTrackingMiddleware)
-
 # Store active WebSocket connections with metadata
 active_connections: dict[str, dict] = {}
 
@@ -55,6 +76,9 @@ active_connections: dict[str, dict] = {}
 # This preserves project context across reconnections
 session_orchestrators: dict[str, OrchestratorAgent] = {}
 
+WEBSOCKET_ACTIVE_SESSIONS.set_function(lambda: len(active_connections))
+WEBSOCKET_QUEUED_FRAMES.set_function(lambda: sum(len(c['outbound']) for c in list(active_connections.values())))
+
 # Initialize global orchestrator (fallback only)
 orchestrator = OrchestratorAgent(
     gcloud_project=os.getenv('GOOGLE_CLOUD_PROJECT'),
@@ -68,65 +92,89 @@ class ChatMessage(BaseModel):
     session_id: str
 
 
+class LogBatch(BaseModel):
+    lines: List[str]
+
+
+# Build log lines persisted per storage write by the bulk ingestion endpoints
+LOG_BATCH_MAX_LINES = int(os.getenv("LOG_BATCH_MAX_LINES", "5000"))
+# Longest NDJSON record the streamed ingestion endpoint buffers
+LOG_RECORD_MAX_BYTES = int(os.getenv("LOG_RECORD_MAX_BYTES", "65536"))
+
+
 # ============================================================================
 # HELPER FUNCTIONS FOR SAFE WEBSOCKET SENDING
 # ============================================================================
 
-async def safe_send_json(session_id: str, data: dict) -> bool:
+# Per-connection frames that are not numbered or replayed after a reconnect
+UNSEQUENCED_TYPES = frozenset({'typing'})
+
+
+def _queue_frame(session_id: str, data: dict) -> bool:
     """
-    Safely send JSON to WebSocket, handling all error cases.
-    Returns True if sent successfully, False otherwise.
+    Number a frame in the session's replay log and hand it to the writer
+    task. While the client is reconnecting the frame is only kept in the
+    log; it is replayed once the client resumes.
     """
-    if session_id not in active_connections:
-        print(f"[WebSocket] ⚠️  Session {session_id} not in active connections")
+    replay_log = replay_store.get(session_id)
+    if replay_log is None:
+        send_logger.warning("Session %s not in active connections", session_id)
         return False
-    
-    connection_info = active_connections[session_id]
-    websocket = connection_info['websocket']
-    
-    try:
-        # Check if WebSocket is in a state that can send
-        if websocket.client_state.name != "CONNECTED":
-            print(f"[WebSocket] ⚠️  Session {session_id} not connected (state: {websocket.client_state.name})")
+    if data.get('type') not in UNSEQUENCED_TYPES:
+        data = replay_log.append(data)
+    connection_info = active_connections.get(session_id)
+    if connection_info is None:
+        if 'seq' not in data:
             return False
-        
-        # Try to send
-        await websocket.send_json(data)
-        print(f"[WebSocket] ✅ Sent to {session_id}: {data.get('type', 'unknown')}")
+        send_logger.debug("Session %s disconnected, kept seq %d for replay", session_id, data['seq'])
         return True
-        
-    except RuntimeError as e:
-        if "close message has been sent" in str(e):
-            print(f"[WebSocket] ⚠️  Session {session_id} already closed, removing from active connections")
-            # Remove from active connections
-            if session_id in active_connections:
-                del active_connections[session_id]
-            return False
-        else:
-            print(f"[WebSocket] ❌ RuntimeError sending to {session_id}: {e}")
+    return connection_info['outbound'].put(data)
+
+
+# Progress frames are batched per session (WS_PROGRESS_BATCH_MS window)
+progress_coalescer = ProgressCoalescer(_queue_frame)
+
+
+async def safe_send_json(session_id: str, data: dict) -> bool:
+    """
+    Queue JSON for a session's WebSocket without waiting for the send.
+    Frames go out in order through the connection's writer task
+    (utils.ws_outbound.OutboundQueue), so a slow client never blocks
+    the caller. Progress frames are coalesced into one progress_batch
+    frame per short window; any other frame flushes the pending batch
+    first so ordering is preserved. Frames are numbered per session and
+    kept for replay (utils.replay_buffer), so a client that reconnects
+    gets what it missed. Returns True if queued or kept for replay,
+    False if the session is unknown or the frame was dropped.
+    """
+    is_progress, key = progress_frame_key(data)
+    if is_progress:
+        if replay_store.get(session_id) is None:
+            send_logger.warning("Session %s not in active connections", session_id)
             return False
-            
-    except Exception as e:
-        print(f"[WebSocket] ❌ Error sending to {session_id}: {e}")
-        return False
+        return progress_coalescer.add(session_id, data, key)
+    progress_coalescer.flush(session_id)
+    return _queue_frame(session_id, data)
 
 
 async def broadcast_to_session(session_id: str, data: dict):
-    """Broadcast message to a specific session with retries"""
-    max_retries = 3
-    for attempt in range(max_retries):
-        success = await safe_send_json(session_id, data)
-        if success:
-            return True
-        
-        if attempt < max_retries - 1:
-            print(f"[WebSocket] 🔄 Retry {attempt + 1}/{max_retries} for session {session_id}")
-            await asyncio.sleep(0.5)
-    
-    print(f"[WebSocket] ❌ Failed to send to {session_id} after {max_retries} attempts")
+    """Queue a message for a specific session (ordering and delivery are the writer task's job)"""
+    if await safe_send_json(session_id, data):
+        return True
+    send_logger.error("Failed to queue message for %s", session_id)
     return False
 
 
+def _connection_closed(outbound: OutboundQueue):
+    """Writer stopped (socket gone or overflow): forget the connection if still current"""
+    heartbeat_scheduler.unregister(outbound.session_id, outbound)
+    connection_info = active_connections.get(outbound.session_id)
+    if connection_info is not None and connection_info['outbound'] is outbound:
+        del active_connections[outbound.session_id]
+        replay_store.detach(outbound.session_id)
+        send_logger.warning("Removed %s from active connections", outbound.session_id)
+
+
 # ============================================================================
 # SESSION CLEANUP TASK
 # ============================================================================
@@ -150,41 +198,55 @@ async def cleanup_stale_sessions():
             if stale_sessions:
                 for session_id in stale_sessions:
                     del session_orchestrators[session_id]
-                print(f"[Cleanup] Removed {len(stale_sessions)} stale session orchestrators")
+                logger.info("Removed %d stale session orchestrators", len(stale_sessions))
+            
+            # Replay logs of sessions that never came back
+            expired_streams = replay_store.prune()
+            for session_id in expired_streams:
+                progress_coalescer.discard(session_id)
+            if expired_streams:
+                logger.info("Expired %d session replay logs", len(expired_streams))
                 
         except Exception as e:
-            print(f"[Cleanup] Error in cleanup task: {e}")
+            logger.exception("Error in cleanup task: %s", e)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Start background tasks on server startup"""
     asyncio.create_task(cleanup_stale_sessions())
-    print("[ServerGem] 🚀 Background cleanup task started")
+    logger.info("Background cleanup task started")
+    
+    asyncio.create_task(usage_service.run_flusher())
+    logger.info("Usage flush task started (every %ss)", usage_service.flush_interval)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Persist buffered state before the process exits"""
+    await heartbeat_scheduler.stop()
+    flushed = usage_service.flush()
+    await get_storage_writer().drain()
+    logger.info("Flushed %d usage records on shutdown", flushed)
 
 
 # ============================================================================
-# KEEP-ALIVE TASK
+# HEARTBEAT
 # ============================================================================
 
-async def keep_alive_task(session_id: str):
-    """Send periodic pings to keep connection alive"""
-    while session_id in active_connections:
+# Close code for a connection that stopped answering heartbeat pings
+HEARTBEAT_CLOSE_CODE = 1001  # "Going Away"
+
+
+def _heartbeat_closer(websocket: WebSocket, outbound: OutboundQueue):
+    """Close callback for the heartbeat scheduler: drop a dead connection"""
+    async def close():
+        await outbound.close()
         try:
-            await asyncio.sleep(30)  # Ping every 30 seconds
-            
-            if session_id in active_connections:
-                await safe_send_json(session_id, {
-                    'type': 'ping',
-                    'timestamp': datetime.now().isoformat()
-                })
-                print(f"[WebSocket] 🏓 Heartbeat sent to {session_id}")
-        except asyncio.CancelledError:
-            print(f"[WebSocket] Keep-alive task cancelled for {session_id}")
-            break
-        except Exception as e:
-            print(f"[WebSocket] ❌ Keep-alive error for {session_id}: {e}")
-            break
+            await websocket.close(code=HEARTBEAT_CLOSE_CODE, reason="Heartbeat timeout")
+        except Exception:
+            pass
+    return close
 
 
 # ============================================================================
@@ -211,6 +273,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (text exposition format)"""
+    return Response(content=metrics_registry.render(), media_type=metrics_registry.CONTENT_TYPE)
+
+
 @app.post("/chat")
 async def chat(message: ChatMessage):
     """HTTP endpoint for chat (non-streaming)"""
@@ -233,7 +301,7 @@ async def websocket_endpoint(websocket: WebSocket, api_key: Optional[str] = Quer
     
     session_id = None
     user_api_key = api_key
-    keep_alive = None
+    outbound = None
     
     try:
         # Vertex AI uses Google Cloud authentication - no API key needed
@@ -245,7 +313,7 @@ async def websocket_endpoint(websocket: WebSocket, api_key: Optional[str] = Quer
             return
         
         await websocket.accept()
-        print(f"[WebSocket] ✅ Connection accepted (Using Vertex AI with project: {gcloud_project})")
+        ws_logger.info("Connection accepted (Using Vertex AI with project: %s)", gcloud_project)
         
         # Receive init message
         init_message = await asyncio.wait_for(
@@ -261,27 +329,33 @@ async def websocket_endpoint(websocket: WebSocket, api_key: Optional[str] = Quer
         
         session_id = init_message.get('session_id', f'session_{uuid.uuid4().hex[:12]}')
         instance_id = init_message.get('instance_id', 'unknown')
+        # Chat messages are rate limited per user, or per client address
+        limit_user_id = init_message.get('user_id')
+        limit_client = websocket.client.host if websocket.client else None
         is_reconnect = init_message.get('is_reconnect', False)
+        # Resume point: the last sequence number the client processed on its stream
+        resume_seq = init_message.get('last_seq')
+        resume_stream = init_message.get('stream_id')
         
-        print(f"[WebSocket] 🔌 Client connecting:")
-        print(f"  Session ID: {session_id}")
-        print(f"  Instance ID: {instance_id}")
-        print(f"  Reconnect: {is_reconnect}")
+        # Every record logged for this connection carries the session
+        bind_log_context(session_id=session_id)
+        ws_logger.info(
+            "Client connecting (instance %s, reconnect: %s)", instance_id, is_reconnect,
+            extra={'instance_id': instance_id, 'reconnect': is_reconnect}
+        )
         
         # Handle reconnection
         if session_id in active_connections:
-            print(f"[WebSocket] 🔄 Reconnection detected for {session_id}")
+            ws_logger.info("Reconnection detected for %s", session_id)
             old_connection = active_connections[session_id]
             old_ws = old_connection['websocket']
-            old_keep_alive = old_connection.get('keep_alive_task')
+            old_outbound = old_connection['outbound']
             
-            # Cancel old keep-alive task
-            if old_keep_alive and not old_keep_alive.done():
-                old_keep_alive.cancel()
-                try:
-                    await old_keep_alive
-                except asyncio.CancelledError:
-                    pass
+            # Stop heartbeats for the old connection
+            heartbeat_scheduler.unregister(session_id, old_outbound)
+            
+            # Stop the old writer - the new connection gets its own queue
+            await old_outbound.close()
             
             # Close old WebSocket gracefully
             try:
@@ -290,23 +364,30 @@ async def websocket_endpoint(websocket: WebSocket, api_key: Optional[str] = Quer
                 pass
         
         # Store new connection
-        keep_alive = asyncio.create_task(keep_alive_task(session_id))
+        outbound = OutboundQueue(websocket, session_id, on_closed=_connection_closed)
+        outbound.start()
+        heartbeat_scheduler.register(
+            session_id, outbound, outbound.put, _heartbeat_closer(websocket, outbound)
+        )
         
         active_connections[session_id] = {
             'websocket': websocket,
-            'keep_alive_task': keep_alive,
+            'outbound': outbound,
             'connected_at': datetime.now().isoformat(),
             'instance_id': instance_id
         }
+        replay_log = replay_store.attach(session_id)
         
-        print(f"[WebSocket] ✅ Session {session_id} registered. Active: {len(active_connections)}")
+        ws_logger.info("Session %s registered. Active: %d", session_id, len(active_connections))
         
         # CRITICAL FIX: Reuse existing orchestrator for this session or create new one
         # This preserves project context (including cloned repo info) across reconnections
         if session_id in session_orchestrators:
             user_orchestrator = session_orchestrators[session_id]
-            print(f"[WebSocket] ♻️  Reusing existing orchestrator for {session_id}")
-            print(f"[WebSocket] 📦 Context preserved: {list(user_orchestrator.project_context.keys())}")
+            ws_logger.info(
+                "Reusing existing orchestrator for %s (context: %s)",
+                session_id, list(user_orchestrator.project_context.keys())
+            )
         else:
             # Extract Gemini API key from query params (from user's localStorage)
             gemini_key = user_api_key  # This was extracted from query params earlier
@@ -320,18 +401,39 @@ async def websocket_endpoint(websocket: WebSocket, api_key: Optional[str] = Quer
             session_orchestrators[session_id] = user_orchestrator
             
             mode = "Vertex AI" if not gemini_key else "Gemini API (user key)"
-            print(f"[WebSocket] ✨ Created new orchestrator for {session_id} - Mode: {mode}")
+            ws_logger.info("Created new orchestrator for %s - Mode: %s", session_id, mode)
         
         # Get or initialize session env vars from orchestrator context
         session_env_vars = user_orchestrator.project_context.get('env_vars', {})
         
-        # Send connection confirmation
-        await safe_send_json(session_id, {
+        # Send connection confirmation (per connection - not numbered)
+        outbound.put({
             'type': 'connected',
             'session_id': session_id,
+            'stream_id': replay_log.stream_id,
             'message': 'Connected to ServerGem AI - Ready to deploy!'
         })
         
+        # Replay what the client missed while it was away
+        if isinstance(resume_seq, int):
+            if resume_stream == replay_log.stream_id:
+                missed, complete = replay_log.since(resume_seq)
+            else:
+                # Different stream (server restarted or log expired): all of it is new
+                missed, _ = replay_log.since(0)
+                complete = False
+            if missed or not complete:
+                outbound.put({
+                    'type': 'replay',
+                    'events': missed,
+                    'complete': complete,
+                    'timestamp': datetime.now().isoformat()
+                })
+            ws_logger.info(
+                "Resumed %s after seq %d: replayed %d events (complete: %s)",
+                session_id, resume_seq, len(missed), complete
+            )
+        
         # Message loop with timeout
         while True:
             try:
@@ -345,22 +447,31 @@ async def websocket_endpoint(websocket: WebSocket, api_key: Optional[str] = Quer
                 continue
             except RuntimeError as e:
                 # WebSocket disconnected while waiting for message
-                print(f"[WebSocket] ⚠️ RuntimeError in receive loop for {session_id}: {e}")
+                ws_logger.warning("RuntimeError in receive loop for %s: %s", session_id, e)
                 break
             except WebSocketDisconnect:
                 # Client disconnected normally
-                print(f"[WebSocket] 🔌 Client {session_id} disconnected during receive")
+                ws_logger.info("Client %s disconnected during receive", session_id)
                 break
             except Exception as e:
                 # Any other error during receive
-                print(f"[WebSocket] ❌ Error receiving from {session_id}: {e}")
+                ws_logger.error("Error receiving from %s: %s", session_id, e)
                 break
             
             msg_type = data.get('type')
+            heartbeat_scheduler.seen(session_id)
             
-            # Handle pong response
+            # Handle pong response (latency is tracked by the scheduler)
             if msg_type == 'pong':
-                print(f"[WebSocket] 🏓 Pong received from {session_id}")
+                heartbeat_scheduler.pong(session_id, data.get('id'))
+                continue
+            
+            # Client-side heartbeat
+            if msg_type == 'ping':
+                outbound.put({
+                    'type': 'pong',
+                    'timestamp': datetime.now().isoformat()
+                })
                 continue
             
             # Handle env vars
@@ -368,7 +479,7 @@ async def websocket_endpoint(websocket: WebSocket, api_key: Optional[str] = Quer
                 variables = data.get('variables', [])
                 count = data.get('count', len(variables))
                 
-                print(f"[WebSocket] 📦 Received {count} env vars")
+                ws_logger.info("Received %d env vars", count)
                 
                 # Store env vars in both session and orchestrator context
                 for var in variables:
@@ -378,7 +489,7 @@ async def websocket_endpoint(websocket: WebSocket, api_key: Optional[str] = Quer
                     }
                 
                 user_orchestrator.project_context['env_vars'] = session_env_vars
-                print(f"[WebSocket] ✅ Env vars stored: {count} variables")
+                ws_logger.info("Env vars stored: %d variables", count)
                 
                 # Format list
                 env_list = '\n'.join([
@@ -417,6 +528,18 @@ All secrets will be stored securely in Google Secret Manager.
                 if not message:
                     continue
                 
+                try:
+                    rate_limiter.hit(limit_user_id, limit_client, kind="chat")
+                except RateLimitExceeded as e:
+                    await safe_send_json(session_id, {
+                        'type': 'error',
+                        'message': f'{e.reason}. Try again in {e.retry_after_header}s.',
+                        'code': 'RATE_LIMITED',
+                        'retry_after': int(e.retry_after_header),
+                        'timestamp': datetime.now().isoformat()
+                    })
+                    continue
+                
                 # Typing indicator
                 await safe_send_json(session_id, {
                     'type': 'typing',
@@ -430,14 +553,14 @@ All secrets will be stored securely in Google Secret Manager.
                 # Create progress notifier
                 progress_notifier = None
                 if might_deploy:
-                    deployment_id = f"deploy-{uuid.uuid4().hex[:8]}"
+                    deployment_id = Deployment.new_id()
                     # Pass session_id and safe_send function
                     progress_notifier = ProgressNotifier(
                         session_id, 
                         deployment_id, 
                         safe_send_json  # Pass the safe send function!
                     )
-                    print(f"[WebSocket] ✨ Created progress notifier: {deployment_id}")
+                    ws_logger.info("Created progress notifier: %s", deployment_id)
                     
                     # Send deployment started
                     await safe_send_json(session_id, {
@@ -447,76 +570,77 @@ All secrets will be stored securely in Google Secret Manager.
                         "timestamp": datetime.now().isoformat()
                     })
                 
-                # Process message
-                try:
-                    response = await user_orchestrator.process_message(
-                        message,
-                        session_id,
-                        progress_notifier=progress_notifier,
-                        safe_send=safe_send_json  # Pass safe_send for progress messages during analysis
-                    )
-                    
-                    # Send response
-                    await safe_send_json(session_id, {
-                        'type': 'message',
-                        'data': response,
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"[WebSocket] ❌ Error processing message: {error_msg}")
-                    print(traceback.format_exc())
-                    
-                    # Send error
-                    if '429' in error_msg or 'quota' in error_msg.lower():
-                        await safe_send_json(session_id, {
-                            'type': 'error',
-                            'message': 'API quota exceeded. Please try again later.',
-                            'code': 'QUOTA_EXCEEDED',
-                            'timestamp': datetime.now().isoformat()
-                        })
-                    elif '401' in error_msg or '403' in error_msg:
+                # Process message (records logged meanwhile carry the deployment ID)
+                with log_context(deployment_id=deployment_id if might_deploy else None):
+                    try:
+                        response = await user_orchestrator.process_message(
+                            message,
+                            session_id,
+                            progress_notifier=progress_notifier,
+                            safe_send=safe_send_json  # Pass safe_send for progress messages during analysis
+                        )
+                        
+                        # Send response
                         await safe_send_json(session_id, {
-                            'type': 'error',
-                            'message': 'Invalid API key. Please check Settings.',
-                            'code': 'INVALID_API_KEY',
-                            'timestamp': datetime.now().isoformat()
-                        })
-                    else:
-                        await safe_send_json(session_id, {
-                            'type': 'error',
-                            'message': f'Error: {error_msg}',
-                            'code': 'API_ERROR',
+                            'type': 'message',
+                            'data': response,
                             'timestamp': datetime.now().isoformat()
                         })
+                        
+                        # A deployment already ended its stream with its status; anything else ends here
+                        if progress_notifier:
+                            deployment_events.finish(progress_notifier.deployment_id)
+                        
+                    except Exception as e:
+                        error_msg = str(e)
+                        ws_logger.exception("Error processing message: %s", error_msg)
+                        if progress_notifier:
+                            deployment_events.finish(progress_notifier.deployment_id, 'failed')
+                        
+                        # Send error
+                        if '429' in error_msg or 'quota' in error_msg.lower():
+                            await safe_send_json(session_id, {
+                                'type': 'error',
+                                'message': 'API quota exceeded. Please try again later.',
+                                'code': 'QUOTA_EXCEEDED',
+                                'timestamp': datetime.now().isoformat()
+                            })
+                        elif '401' in error_msg or '403' in error_msg:
+                            await safe_send_json(session_id, {
+                                'type': 'error',
+                                'message': 'Invalid API key. Please check Settings.',
+                                'code': 'INVALID_API_KEY',
+                                'timestamp': datetime.now().isoformat()
+                            })
+                        else:
+                            await safe_send_json(session_id, {
+                                'type': 'error',
+                                'message': f'Error: {error_msg}',
+                                'code': 'API_ERROR',
+                                'timestamp': datetime.now().isoformat()
+                            })
     
     except WebSocketDisconnect:
-        print(f"[WebSocket] 🔌 Client {session_id} disconnected normally")
+        ws_logger.info("Client %s disconnected normally", session_id)
     
     except asyncio.TimeoutError:
-        print(f"[WebSocket] ⏰ Timeout for {session_id}")
+        ws_logger.warning("Timeout for %s", session_id)
     
     except Exception as e:
-        print(f"[WebSocket] ❌ Error for {session_id}: {e}")
-        print(traceback.format_exc())
+        ws_logger.exception("Error for %s: %s", session_id, e)
     
     finally:
         # Cleanup
-        if session_id and session_id in active_connections:
-            connection_info = active_connections[session_id]
-            
-            # Cancel keep-alive
-            if keep_alive and not keep_alive.done():
-                keep_alive.cancel()
-                try:
-                    await keep_alive
-                except asyncio.CancelledError:
-                    pass
-            
-            # Remove from active connections
+        if outbound is not None:
+            heartbeat_scheduler.unregister(session_id, outbound)
+            await outbound.close()
+        
+        # Remove from active connections - unless a reconnect already replaced us
+        connection_info = active_connections.get(session_id) if session_id else None
+        if connection_info is not None and connection_info['websocket'] is websocket:
             del active_connections[session_id]
-            print(f"[WebSocket] 🧹 Cleaned up connection for {session_id}. Active: {len(active_connections)}")
+            replay_store.detach(session_id)
+            ws_logger.info("Cleaned up connection for %s. Active: %d", session_id, len(active_connections))
             
             # NOTE: We DON'T delete from session_orchestrators here
             # This preserves context for reconnections within the same session
@@ -540,30 +664,45 @@ async def create_user(
     if existing:
         return {"user": existing.to_dict(), "existing": True}
     
-    user = user_service.create_user(
-        email=email,
-        username=username,
-        display_name=display_name,
-        avatar_url=avatar_url,
-        github_token=github_token
-    )
+    # User writes run in a worker thread: with several worker processes
+    # they wait for the users collection lock
+    try:
+        user = await asyncio.to_thread(
+            user_service.create_user,
+            email=email,
+            username=username,
+            display_name=display_name,
+            avatar_url=avatar_url,
+            github_token=github_token
+        )
+    except DuplicateKeyError as e:
+        # Lost a race with a concurrent signup for the same email
+        existing = user_service.get_user_by_email(email)
+        if e.field == 'email' and existing:
+            return {"user": existing.to_dict(), "existing": True}
+        raise HTTPException(status_code=409, detail=str(e))
     
     return {"user": user.to_dict(), "existing": False}
 
 
 @app.get("/api/users/{user_id}")
-async def get_user(user_id: str):
-    """Get user by ID"""
+async def get_user(user_id: str, request: Request):
+    """Get user by ID (ETag / If-None-Match aware)"""
     user = user_service.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user.to_dict()
+    return cached_json_response(request, (f"user:{user_id}",), user.to_dict)
 
 
 @app.patch("/api/users/{user_id}")
 async def update_user(user_id: str, updates: dict):
     """Update user"""
-    user = user_service.update_user(user_id, **updates)
+    try:
+        user = await asyncio.to_thread(user_service.update_user, user_id, **updates)
+    except DuplicateKeyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user.to_dict()
@@ -577,7 +716,7 @@ async def upgrade_user(user_id: str, tier: str):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid tier")
     
-    user = user_service.upgrade_user_plan(user_id, plan_tier)
+    user = await asyncio.to_thread(user_service.upgrade_user_plan, user_id, plan_tier)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -589,22 +728,64 @@ async def upgrade_user(user_id: str, tier: str):
 # ============================================================================
 
 @app.get("/api/deployments")
-async def list_deployments(user_id: str = Query(...)):
-    """Get all deployments for user"""
-    deployments = deployment_service.get_user_deployments(user_id)
-    return {
-        "deployments": [d.to_dict() for d in deployments],
-        "count": len(deployments)
-    }
+async def list_deployments(
+    request: Request,
+    user_id: str = Query(...),
+    status: Optional[str] = None,
+    region: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    sort: str = "-created_at",
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """
+    Get one page of a user's deployments (pass next_cursor for the next page)
+    
+    sort: created_at | updated_at, prefixed with "-" for newest first
+    """
+    status_enum = None
+    if status is not None:
+        try:
+            status_enum = DeploymentStatus(status)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid status")
+    # Before the If-None-Match check: a bad cursor or sort is a 400, not a 304
+    try:
+        deployment_service.page_position(sort, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def build():
+        deployments, next_cursor = deployment_service.list_deployments(
+            user_id,
+            status=status_enum,
+            region=region,
+            created_after=created_after,
+            created_before=created_before,
+            sort=sort,
+            limit=limit,
+            cursor=cursor
+        )
+        return {
+            "deployments": [d.to_dict() for d in deployments],
+            "count": len(deployments),
+            "total": deployment_service.get_deployment_count(user_id),
+            "next_cursor": next_cursor
+        }
+    
+    # Unchanged pages are answered with 304 or a cached body, without a lookup
+    deployment_service.refresh()
+    return cached_json_response(request, (f"deployments:{user_id}",), build)
 
 
 @app.get("/api/deployments/{deployment_id}")
-async def get_deployment(deployment_id: str):
-    """Get deployment by ID"""
+async def get_deployment(deployment_id: str, request: Request):
+    """Get deployment by ID (ETag / If-None-Match aware)"""
     deployment = deployment_service.get_deployment(deployment_id)
     if not deployment:
         raise HTTPException(status_code=404, detail="Deployment not found")
-    return deployment.to_dict()
+    return cached_json_response(request, (f"deployment:{deployment_id}",), deployment.to_dict)
 
 
 @app.post("/api/deployments")
@@ -620,7 +801,7 @@ async def create_deployment(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    active_count = len(deployment_service.get_active_deployments(user_id))
+    active_count = deployment_service.get_active_deployment_count(user_id)
     if not user.can_deploy_more_services(active_count):
         raise HTTPException(
             status_code=403,
@@ -677,50 +858,253 @@ async def delete_deployment(deployment_id: str):
 
 
 @app.get("/api/deployments/{deployment_id}/events")
-async def get_deployment_events(deployment_id: str, limit: int = 50):
-    """Get deployment event log"""
-    events = deployment_service.get_deployment_events(deployment_id, limit)
+async def get_deployment_events(
+    deployment_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    event_type: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
+    """Get deployment event log, newest first (pass next_cursor for older events)"""
+    try:
+        events, next_cursor = await deployment_service.aget_deployment_events_page(
+            deployment_id,
+            limit,
+            cursor,
+            event_type=event_type,
+            since=since,
+            until=until
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
     return {
         "events": [e.to_dict() for e in events],
-        "count": len(events)
+        "count": len(events),
+        "next_cursor": next_cursor
+    }
+
+
+@app.get("/api/deployments/{deployment_id}/stream")
+async def stream_deployment_progress(
+    deployment_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Query(None)
+):
+    """
+    Live deployment progress as Server-Sent Events
+    
+    Streams the events ProgressNotifier and DeploymentProgressTracker
+    produce for the deployment, plus status_changed for stored deployments,
+    and ends after deployment_finished (status success / failed / a terminal
+    deployment status, or null if the request ended without deploying). Resume
+    with the Last-Event-ID header (or ?last_event_id= for clients that
+    cannot set headers).
+    """
+    channel = deployment_events.get(deployment_id)
+    if channel is None:
+        deployment = deployment_service.get_deployment(deployment_id)
+        if deployment is None:
+            raise HTTPException(status_code=404, detail="Deployment not found")
+        channel = deployment_events.open(deployment_id)
+        if deployment.status.is_terminal:
+            # Nothing in progress - the stream reports the outcome and ends
+            deployment_events.finish(deployment_id, deployment.status.value)
+    
+    return StreamingResponse(
+        deployment_events.stream(channel, request.headers.get("last-event-id") or last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/deployments/{deployment_id}/logs")
+async def get_deployment_logs(
+    deployment_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    tail: Optional[int] = Query(None, ge=1, le=1000)
+):
+    """Read build logs by range (offset/limit) or the last N lines (tail)"""
+    if not deployment_service.get_deployment(deployment_id):
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    
+    lines, offset, total = await deployment_service.aget_build_logs(
+        deployment_id,
+        offset,
+        limit,
+        tail
+    )
+    return {
+        "lines": lines,
+        "offset": offset,
+        "count": len(lines),
+        "total": total
     }
 
 
 @app.post("/api/deployments/{deployment_id}/logs")
 async def add_deployment_log(deployment_id: str, log_line: str):
     """Add build log line"""
-    deployment_service.add_build_log(deployment_id, log_line)
+    if not deployment_service.add_build_log(deployment_id, log_line):
+        raise HTTPException(status_code=404, detail="Deployment not found")
     return {"message": "Log added"}
 
 
+@app.post("/api/deployments/{deployment_id}/logs/batch")
+async def add_deployment_logs(deployment_id: str, batch: LogBatch):
+    """Add many build log lines in one request and one storage write"""
+    if len(batch.lines) > LOG_BATCH_MAX_LINES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {LOG_BATCH_MAX_LINES} lines per batch"
+        )
+    if not deployment_service.add_build_logs(deployment_id, batch.lines):
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    return {"accepted": len(batch.lines)}
+
+
+def parse_log_record(raw: str) -> str:
+    """One NDJSON / WebSocket log record: a JSON string or {"line": ...}"""
+    record = json.loads(raw)
+    if isinstance(record, dict):
+        record = record.get("line")
+    if not isinstance(record, str):
+        raise ValueError("Log record must be a string or an object with a 'line' string")
+    return record
+
+
+@app.post("/api/deployments/{deployment_id}/logs/stream")
+async def stream_deployment_logs(deployment_id: str, request: Request):
+    """
+    Ingest build logs from a streamed NDJSON body
+    
+    Each line of the body is a JSON string or {"line": "..."}; lines are
+    persisted in batches of LOG_BATCH_MAX_LINES as the body arrives.
+    A record longer than LOG_RECORD_MAX_BYTES ends the request with 400.
+    """
+    if deployment_service.get_deployment(deployment_id) is None:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    
+    accepted = 0
+    pending: List[str] = []
+    buffer = b""
+    
+    def store(lines: List[str]) -> int:
+        # The deployment can be deleted while the body is still arriving
+        if not deployment_service.add_build_logs(deployment_id, lines):
+            raise HTTPException(
+                status_code=404,
+                detail={"error": "Deployment not found", "accepted": accepted}
+            )
+        return len(lines)
+    
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            *records, buffer = buffer.split(b"\n")
+            for raw in records:
+                if len(raw) > LOG_RECORD_MAX_BYTES:
+                    raise ValueError(f"longer than {LOG_RECORD_MAX_BYTES} bytes")
+                if raw.strip():
+                    pending.append(parse_log_record(raw.decode('utf-8')))
+            # Without a newline the buffer would grow with the whole body
+            if len(buffer) > LOG_RECORD_MAX_BYTES:
+                raise ValueError(f"longer than {LOG_RECORD_MAX_BYTES} bytes")
+            if len(pending) >= LOG_BATCH_MAX_LINES:
+                accepted += store(pending)
+                pending = []
+        if buffer.strip():
+            pending.append(parse_log_record(buffer.decode('utf-8')))
+    except ValueError as e:
+        # Lines before the bad record are kept; the client resumes after `accepted`
+        accepted += store(pending)
+        raise HTTPException(
+            status_code=400,
+            detail={"error": f"Invalid log record: {e}", "accepted": accepted}
+        )
+    
+    accepted += store(pending)
+    return {"accepted": accepted}
+
+
+@app.websocket("/ws/deployments/{deployment_id}/logs")
+async def deployment_logs_websocket(websocket: WebSocket, deployment_id: str):
+    """
+    Build log ingestion over a WebSocket
+    
+    Each message is {"lines": [...]}, {"line": "..."} or a JSON string and
+    is persisted as one batch; the server acks with the running total.
+    """
+    await websocket.accept()
+    if deployment_service.get_deployment(deployment_id) is None:
+        await websocket.close(code=1008, reason="Deployment not found")
+        return
+    
+    accepted = 0
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                message = json.loads(raw)
+                if isinstance(message, dict) and "lines" in message:
+                    lines = message["lines"]
+                    if not isinstance(lines, list) or not all(isinstance(l, str) for l in lines):
+                        raise ValueError("'lines' must be a list of strings")
+                else:
+                    lines = [parse_log_record(raw)]
+                if len(lines) > LOG_BATCH_MAX_LINES:
+                    raise ValueError(f"At most {LOG_BATCH_MAX_LINES} lines per message")
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "message": str(e), "accepted": accepted})
+                continue
+            
+            if not deployment_service.add_build_logs(deployment_id, lines):
+                # Deleted while the connection was open
+                await websocket.close(code=1008, reason="Deployment not found")
+                return
+            accepted += len(lines)
+            await websocket.send_json({"type": "ack", "accepted": accepted})
+    except WebSocketDisconnect:
+        pass
+
+
 # ============================================================================
 # Usage & Analytics Endpoints
 # ============================================================================
 
 @app.get("/api/usage/{user_id}/today")
-async def get_today_usage(user_id: str):
-    """Get today's usage for user"""
+async def get_today_usage(user_id: str, request: Request):
+    """Get today's usage for user (ETag / If-None-Match aware)"""
     usage = usage_service.get_today_usage(user_id)
     user = user_service.get_user(user_id)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return {
-        "usage": usage.to_dict(),
-        "limits": {
-            "max_services": user.max_services,
-            "max_requests_per_day": user.max_requests_per_day,
-            "max_memory_mb": user.max_memory_mb
+    return cached_json_response(
+        request,
+        (f"usage:{user_id}", f"user:{user_id}"),
+        lambda: {
+            "usage": usage.to_dict(),
+            "limits": {
+                "max_services": user.max_services,
+                "max_requests_per_day": user.max_requests_per_day,
+                "max_memory_mb": user.max_memory_mb
+            },
+            "plan_tier": user.plan_tier.value
         },
-        "plan_tier": user.plan_tier.value
-    }
+        # A new day starts a new usage record under the same version tag
+        salt=usage.date
+    )
 
 
 @app.get("/api/usage/{user_id}/summary")
 async def get_usage_summary(user_id: str, days: int = 30):
     """Get usage summary for last N days"""
     summary = usage_service.get_usage_summary(user_id, days)
+    summary["lifetime"] = usage_service.get_lifetime_totals(user_id)
     return summary
 
 
@@ -730,6 +1114,7 @@ async def get_monthly_usage(user_id: str, year: int, month: int):
     usage_list = usage_service.get_monthly_usage(user_id, year, month)
     return {
         "usage": [u.to_dict() for u in usage_list],
+        "totals": usage_service.get_monthly_totals(user_id, year, month),
         "month": f"{year}-{month:02d}"
     }
 
@@ -752,10 +1137,15 @@ if __name__ == "__main__":
     import uvicorn
     
     port = int(os.getenv("PORT", 8000))
+    # Several workers need STORAGE_MULTIPROCESS (on by default when > 1)
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
     
     uvicorn.run(
-        app,
+        "app:app" if workers > 1 else app,
         host="0.0.0.0",
         port=port,
-        log_level="info"
+        workers=workers,
+        log_level="info",
+        # uvicorn's own loggers propagate to the queue handler from setup_logging
+        log_config=None
     )
\ No newline at end of file
@@ -0,0 +1,22 @@
+"""
+ServerGem Benchmarks - run from backend/ with: python -m benchmarks.<name>
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+
+def use_scratch_data_dir(prefix: str = "servergem-bench-") -> str:
+    """
+    Switch to a throwaway working directory (removed at exit)
+
+    Importing services creates their global instances on the relative
+    data/ path; call this first so a benchmark never writes to, or
+    compacts, the real backend/data.
+    """
+    path = tempfile.mkdtemp(prefix=prefix)
+    os.chdir(path)
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
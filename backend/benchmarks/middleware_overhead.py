@@ -0,0 +1,166 @@
+"""
+Usage Middleware Benchmark
+Requests/sec of a small API with no middleware, the previous
+BaseHTTPMiddleware implementation and the pure ASGI UsageTrackingMiddleware
+
+Requests are driven straight through the ASGI interface (no sockets), so
+the numbers isolate framework + middleware cost.
+
+Usage:
+    python -m benchmarks.middleware_overhead [--requests 20000] [--concurrency 50] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import use_scratch_data_dir
+
+# The middleware module creates the global usage service in ./data
+use_scratch_data_dir()
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware.usage_tracker import UsageTrackingMiddleware
+from services.usage_service import UsageService
+
+
+class LegacyUsageMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware version this benchmark compares against"""
+
+    def __init__(self, app, usage: UsageService):
+        super().__init__(app)
+        self.usage = usage
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        user_id = request.query_params.get('user_id', 'anonymous')
+        if user_id != 'anonymous':
+            self.usage.track_request(user_id)
+        response = await call_next(request)
+        if user_id != 'anonymous':
+            response_size = int(response.headers.get('content-length', 0))
+            if response_size > 0:
+                self.usage.track_bandwidth(user_id, response_size)
+        response.headers['X-Process-Time'] = str(time.time() - start_time)
+        return response
+
+
+def build_app(variant: str, usage: UsageService) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/items")
+    async def items(user_id: str):
+        return {"user_id": user_id, "items": list(range(20))}
+
+    @app.get("/api/stream")
+    async def stream(user_id: str):
+        async def body():
+            for i in range(10):
+                yield f"line {i}\n".encode()
+        return StreamingResponse(body(), media_type="text/plain")
+
+    if variant == "legacy":
+        app.add_middleware(LegacyUsageMiddleware, usage=usage)
+    elif variant == "asgi":
+        app.add_middleware(UsageTrackingMiddleware, usage=usage)
+    return app
+
+
+async def call(app, path: str, query: bytes) -> int:
+    """Run one GET through the ASGI app; returns body bytes received"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query,
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+    received = 0
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return received
+
+
+async def run(app, path: str, requests: int, concurrency: int) -> float:
+    """Requests per second for `requests` GETs with `concurrency` in flight"""
+    per_worker = requests // concurrency
+
+    async def worker(n: int):
+        query = f"user_id=user_{n % 10}".encode()
+        for _ in range(per_worker):
+            await call(app, path, query)
+
+    # Warm up routing / pydantic caches
+    await asyncio.gather(*(call(app, path, b"user_id=warmup") for _ in range(concurrency)))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return per_worker * concurrency / (time.perf_counter() - start)
+
+
+async def main_async(args):
+    variants = ("none", "legacy", "asgi")
+    print(f"{'route':<14}{'middleware':<12}{'req/s':>10}{'vs none':>10}  usage recorded")
+    for path in ("/api/items", "/api/stream"):
+        usages = {
+            variant: UsageService(
+                storage_path=os.path.join("data", f"usage-{variant}.json"),
+                flush_interval=3600,
+                flush_threshold=10 ** 9
+            )
+            for variant in variants
+        }
+        apps = {variant: build_app(variant, usages[variant]) for variant in variants}
+
+        # Interleave variants and keep each one's best round - runs are noisy
+        best = dict.fromkeys(variants, 0.0)
+        for _ in range(args.rounds):
+            for variant in variants:
+                best[variant] = max(best[variant], await run(apps[variant], path, args.requests, args.concurrency))
+
+        for variant in variants:
+            recorded = "-"
+            if variant != "none":
+                metrics = usages[variant].get_today_usage("user_0")
+                recorded = f"{metrics.requests} req, {metrics.bandwidth_gb * 1024 ** 3:.0f} B"
+            rate = best[variant]
+            print(f"{path:<14}{variant:<12}{rate:>10.0f}{rate / best['none']:>10.2f}  {recorded}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Model Microbenchmarks
+Per-record memory and serialization cost of the slotted models
+
+Compares each model against an equivalent regular (dict-backed) dataclass
+serialized with dataclasses.asdict - the previous implementation.
+
+Usage:
+    python -m benchmarks.models [--records 20000] [--rounds 5]
+"""
+
+import argparse
+import dataclasses
+import gc
+import os
+import sys
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, List, Type
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import use_scratch_data_dir
+
+# Nothing here should touch storage, but never let it reach backend/data
+use_scratch_data_dir()
+
+from models import Deployment, DeploymentStatus, PlanTier, UsageMetrics, User
+
+
+def sample_records() -> Dict[Type, Dict[str, Any]]:
+    """One realistic stored record per model"""
+    deployment = Deployment(
+        id="dep_0123456789ab",
+        user_id="user_0123456789ab",
+        service_name="user-0123456789ab-api",
+        repo_url="https://github.com/example/api",
+        status=DeploymentStatus.LIVE,
+        url="https://user-0123456789ab-api.servergem.app",
+        gcp_url="https://api-abc123-uc.a.run.app",
+        env_vars={f"VAR_{i}": f"value-{i}" for i in range(8)},
+        last_deployed="2025-01-01T00:00:00",
+        request_count=1234,
+    )
+    user = User(
+        id="user_0123456789ab",
+        email="dev@example.com",
+        username="dev",
+        display_name="Developer",
+        avatar_url="https://avatars.example.com/dev.png",
+        plan_tier=PlanTier.PRO,
+        settings={"theme": "dark", "notifications": {"email": True, "slack": False}},
+    )
+    usage = UsageMetrics(
+        user_id="user_0123456789ab",
+        date="2025-01-01",
+        requests=420,
+        deployments=3,
+        memory_used_mb=1024,
+        bandwidth_gb=1.5,
+    )
+    return {model: record.to_dict() for model, record in ((Deployment, deployment), (User, user), (UsageMetrics, usage))}
+
+
+def legacy_model(model: Type) -> Type:
+    """The same fields as a regular dataclass (per-instance __dict__)"""
+    return dataclasses.make_dataclass(
+        f"Legacy{model.__name__}",
+        [
+            (f.name, f.type, dataclasses.field(default=f.default, default_factory=f.default_factory))
+            for f in dataclasses.fields(model)
+        ],
+    )
+
+
+def legacy_to_dict(obj: Any) -> Dict[str, Any]:
+    """Previous serializer: deep-copying asdict plus enum conversion"""
+    data = dataclasses.asdict(obj)
+    for name, value in data.items():
+        if hasattr(value, 'value'):
+            data[name] = value.value
+    return data
+
+
+def decoded(model: Type, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Record with enum fields converted, as constructor arguments"""
+    kwargs = dict(record)
+    if 'status' in kwargs:
+        kwargs['status'] = DeploymentStatus(kwargs['status'])
+    if 'plan_tier' in kwargs:
+        kwargs['plan_tier'] = PlanTier(kwargs['plan_tier'])
+    return kwargs
+
+
+def bytes_per_record(factory: Callable[[], Any], count: int) -> float:
+    """Average traced allocation per instance (shared field values excluded)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances: List[Any] = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del instances
+    return (after - before) / count
+
+
+def best_us(fn: Callable[[], Any], number: int, rounds: int) -> float:
+    """Best per-call time in microseconds"""
+    return min(timeit.repeat(fn, number=number, repeat=rounds)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000, help="instances per memory measurement")
+    parser.add_argument("--rounds", type=int, default=5, help="timing repeats (best is reported)")
+    args = parser.parse_args()
+
+    number = 20000
+    print(f"{'model':<14}{'variant':<10}{'bytes/rec':>11}{'to_dict us':>12}{'from_dict us':>14}")
+    for model, record in sample_records().items():
+        legacy = legacy_model(model)
+        kwargs = decoded(model, record)
+
+        # Serializers must agree before their speed is worth comparing
+        assert model.from_dict(record).to_dict() == record
+        assert legacy_to_dict(legacy(**kwargs)) == record
+
+        current = model.from_dict(record)
+        old = legacy(**kwargs)
+        rows = [
+            (
+                "dataclass",
+                bytes_per_record(lambda: legacy(**kwargs), args.records),
+                best_us(lambda: legacy_to_dict(old), number, args.rounds),
+                best_us(lambda: legacy(**decoded(model, record)), number, args.rounds),
+            ),
+            (
+                "slotted",
+                bytes_per_record(lambda: model.from_dict(record), args.records),
+                best_us(current.to_dict, number, args.rounds),
+                best_us(lambda: model.from_dict(record), number, args.rounds),
+            ),
+        ]
+        for variant, size, to_dict_us, from_dict_us in rows:
+            print(f"{model.__name__:<14}{variant:<10}{size:>11.0f}{to_dict_us:>12.2f}{from_dict_us:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
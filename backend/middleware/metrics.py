@@ -0,0 +1,60 @@
+"""
+HTTP Metrics Middleware
+Per-route request latency histograms and the X-Process-Time header
+"""
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.metrics import HTTP_REQUEST_DURATION, Histogram
+
+
+class MetricsMiddleware:
+    """
+    Observe HTTP request latency (pure ASGI)
+
+    Features:
+    - Labelled by the matched route template ("/api/deployments/{deployment_id}"),
+      never the raw path, so series stay bounded; unmatched paths share one label
+    - Latency measured to the last body chunk, so streamed responses count
+      in full
+    - Adds X-Process-Time (seconds until the response started)
+    - Outermost of the app's own middleware, so rate-limited requests are
+      measured too
+    """
+
+    UNMATCHED = "<unmatched>"
+
+    def __init__(self, app: ASGIApp, histogram: Histogram = HTTP_REQUEST_DURATION, skip_paths=("/metrics",)):
+        self.app = app
+        self.histogram = histogram
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                process_time = time.perf_counter() - start_time
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-process-time", str(process_time).encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            template = getattr(route, "path", None) or self.UNMATCHED
+            self.histogram.labels(scope["method"], template, str(status)).observe(
+                time.perf_counter() - start_time
+            )
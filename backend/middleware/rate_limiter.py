@@ -0,0 +1,215 @@
+"""
+Rate Limiting
+In-memory token buckets per user and plan tier, plus daily request quotas
+"""
+
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from models import PlanTier
+from services.usage_service import usage_service
+from services.user_service import user_service
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Sustained rate and burst size of one bucket"""
+    per_minute: float
+    burst: int
+
+
+# Plan tier -> (API requests, chat messages hitting the LLM)
+PLAN_RATE_LIMITS: Dict[PlanTier, Dict[str, RateLimit]] = {
+    PlanTier.FREE: {
+        "api": RateLimit(per_minute=60, burst=30),
+        "chat": RateLimit(per_minute=6, burst=3),
+    },
+    PlanTier.PRO: {
+        "api": RateLimit(per_minute=300, burst=100),
+        "chat": RateLimit(per_minute=30, burst=10),
+    },
+    PlanTier.ENTERPRISE: {
+        "api": RateLimit(per_minute=1200, burst=300),
+        "chat": RateLimit(per_minute=120, burst=30),
+    },
+}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request must be rejected with 429"""
+
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After value: whole seconds, at least 1"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Refills continuously at rate tokens/second up to capacity"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, limit: RateLimit, now: float):
+        self.rate = limit.per_minute / 60.0
+        self.capacity = float(limit.burst)
+        self.tokens = self.capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consume one token; returns 0 or the seconds until one is available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Profile:
+    """Cached plan tier and today's request count for one user"""
+
+    __slots__ = ("known", "tier", "daily_limit", "date", "used", "refreshed_at")
+
+    def __init__(self):
+        self.known = False
+        self.tier = PlanTier.FREE
+        self.daily_limit = -1
+        self.date = ""
+        self.used = 0
+        self.refreshed_at = float("-inf")
+
+
+class RateLimiter:
+    """
+    Per-user request limiting
+
+    Features:
+    - Token buckets per (user, kind): "api" for HTTP requests carrying a
+      user_id, "chat" for LLM-backed chat over HTTP and WebSocket
+    - Bucket sizes follow the user's plan tier (PLAN_RATE_LIMITS)
+    - Daily quota from User.max_requests_per_day (-1 = unlimited)
+    - Tier and today's count are re-read from UserService / UsageService
+      every refresh_interval seconds per user, so counts from other worker
+      processes are picked up without any per-request storage access
+    - At most max_profiles (env RATE_LIMIT_PROFILES) cached profiles, least
+      recently used dropped first; the lookup never creates user or usage
+      records, so made-up user IDs cost nothing beyond the cache slot
+    - Chat without a user_id, and any request whose user_id names no
+      user, is limited per client address at FREE rates - inventing IDs
+      does not buy fresh buckets
+    - At most max_buckets (env RATE_LIMIT_BUCKETS) token buckets, least
+      recently used dropped first
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = None,
+        enabled: bool = None,
+        max_profiles: int = None,
+        max_buckets: int = None
+    ):
+        self.refresh_interval = refresh_interval or float(os.getenv("RATE_LIMIT_REFRESH", "30"))
+        if enabled is None:
+            enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+        self.max_profiles = max_profiles or int(os.getenv("RATE_LIMIT_PROFILES", "10000"))
+        self.max_buckets = max_buckets or int(os.getenv("RATE_LIMIT_BUCKETS", "50000"))
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._profiles: "OrderedDict[str, _Profile]" = OrderedDict()
+
+    def hit(self, user_id: Optional[str], client: Optional[str] = None, kind: str = "api"):
+        """
+        Count one request against the caller's limits
+
+        Raises:
+            RateLimitExceeded: bucket empty or daily quota used up
+        """
+        if not self.enabled:
+            return
+        if user_id is None:
+            if kind != "chat" or not client:
+                return
+            self._take(f"ip:{client}", kind, PLAN_RATE_LIMITS[PlanTier.FREE][kind])
+            return
+
+        now = time.monotonic()
+        profile = self._profile(user_id, now)
+        if not profile.known:
+            # The ID is the client's word only - limit the address instead
+            key = f"ip:{client}" if client else user_id
+            self._take(key, kind, PLAN_RATE_LIMITS[PlanTier.FREE][kind], now)
+            return
+
+        if kind == "api" and profile.daily_limit != -1:
+            today = datetime.utcnow().date().isoformat()
+            if profile.date != today:
+                profile.date, profile.used = today, 0
+            if profile.used >= profile.daily_limit:
+                raise RateLimitExceeded(
+                    _seconds_until_midnight(),
+                    f"Daily limit of {profile.daily_limit} requests reached for the {profile.tier.value} plan"
+                )
+
+        self._take(user_id, kind, PLAN_RATE_LIMITS[profile.tier][kind], now)
+        if kind == "api":
+            profile.used += 1
+
+    def _take(self, key: str, kind: str, limit: RateLimit, now: float = None):
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get((key, kind))
+        if bucket is None or bucket.capacity != limit.burst:
+            bucket = self._buckets[(key, kind)] = TokenBucket(limit, now)
+        self._buckets.move_to_end((key, kind))
+        if len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+
+        wait = bucket.take(now)
+        if wait:
+            raise RateLimitExceeded(wait, f"Rate limit of {limit.per_minute:g} {kind} requests per minute exceeded")
+
+    def _profile(self, user_id: str, now: float) -> _Profile:
+        """Plan and usage for a user, refreshed from the services periodically"""
+        profile = self._profiles.get(user_id)
+        if profile is None:
+            profile = self._profiles[user_id] = _Profile()
+            if len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        else:
+            self._profiles.move_to_end(user_id)
+        if now - profile.refreshed_at >= self.refresh_interval:
+            profile.refreshed_at = now
+            user = user_service.get_user(user_id)
+            if user is None:
+                # Unknown ID: FREE rates, no quota, nothing to look up
+                profile.known = False
+                profile.tier, profile.daily_limit = PlanTier.FREE, -1
+                return profile
+            profile.known = True
+            profile.tier = user.plan_tier
+            profile.daily_limit = user.max_requests_per_day
+            date, requests = usage_service.peek_today_requests(user_id)
+            if profile.date != date:
+                profile.date, profile.used = date, 0
+            # Usage holds every worker's counts; ours may not be recorded yet
+            profile.used = max(profile.used, requests)
+        return profile
+
+
+def _seconds_until_midnight() -> float:
+    now = datetime.utcnow()
+    midnight = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    return (midnight - now).total_seconds()
+
+
+# Global instance
+rate_limiter = RateLimiter()
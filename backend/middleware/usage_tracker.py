@@ -3,52 +3,114 @@ Usage Tracking Middleware
 Automatically track API usage for all requests
 """
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-import time
+import json
+from typing import Iterable, Optional
+from urllib.parse import parse_qsl
 
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from middleware.rate_limiter import RateLimitExceeded, rate_limiter
 from services.usage_service import usage_service
 
 
-class UsageTrackingMiddleware(BaseHTTPMiddleware):
+# Never counted towards a user's usage
+SKIP_PATHS = frozenset({"/", "/health", "/metrics", "/favicon.ico", "/docs", "/redoc", "/openapi.json"})
+SKIP_PREFIXES = ("/static/", "/assets/", "/docs/")
+# Routes that reach the LLM - limited as "chat" even without a user_id
+CHAT_PATHS = frozenset({"/chat"})
+
+
+class UsageTrackingMiddleware:
     """
-    Middleware to track API usage
-    
+    Middleware to track API usage (pure ASGI)
+
     Features:
     - Track requests per user
-    - Track bandwidth
-    - Track response times
-    - Rate limiting enforcement
+    - Track bandwidth from the body bytes actually sent, so streamed and
+      chunked responses are counted too
+    - Rate limiting enforcement: 429 with Retry-After from RateLimiter
+      (rejected requests are not counted as usage)
+    - Health, docs and static routes skipped with a set / prefix check
+    - No per-request task or response wrapping: send() is wrapped in place
+      and counters are handed to UsageService as O(1) in-memory increments
     """
-    
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-    
-    async def dispatch(self, request: Request, call_next):
-        """Track request and enforce limits"""
-        start_time = time.time()
-        
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        skip_paths: Iterable[str] = SKIP_PATHS,
+        skip_prefixes: Iterable[str] = SKIP_PREFIXES,
+        usage=None,
+        limiter=None
+    ):
+        self.app = app
+        self.skip_paths = frozenset(skip_paths)
+        self.skip_prefixes = tuple(skip_prefixes)
+        self.usage = usage or usage_service
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Track request and response size"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path in self.skip_paths or path.startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+
         # Extract user_id from session/auth
-        # For now, use session_id from WebSocket or query params
-        user_id = request.query_params.get('user_id', 'anonymous')
-        
-        # Track request
-        if user_id != 'anonymous':
-            usage_service.track_request(user_id)
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Track bandwidth (approximate)
-        if user_id != 'anonymous':
-            # Estimate response size (not 100% accurate but good enough)
-            response_size = int(response.headers.get('content-length', 0))
-            if response_size > 0:
-                usage_service.track_bandwidth(user_id, response_size)
-        
-        # Add performance headers
-        process_time = time.time() - start_time
-        response.headers['X-Process-Time'] = str(process_time)
-        
-        return response
+        # For now, use the user_id query parameter
+        user_id = self._user_id(scope)
+
+        try:
+            client = scope.get("client")
+            client_host = client[0] if client else None
+            if path in CHAT_PATHS:
+                self.limiter.hit(user_id, client_host, kind="chat")
+            if user_id is not None:
+                self.limiter.hit(user_id, client_host)
+        except RateLimitExceeded as e:
+            await self._reject(send, e)
+            return
+
+        body_bytes = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal body_bytes
+            if message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if user_id is not None:
+                self.usage.record_http_request(user_id, body_bytes)
+
+    @staticmethod
+    async def _reject(send: Send, error: RateLimitExceeded):
+        """Send 429 Too Many Requests"""
+        body = json.dumps({"detail": error.reason, "retry_after": int(error.retry_after_header)}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", error.retry_after_header.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def _user_id(scope: Scope) -> Optional[str]:
+        """user_id query parameter, parsed only when present"""
+        query = scope.get("query_string", b"")
+        if b"user_id=" not in query:
+            return None
+        for name, value in parse_qsl(query.decode("latin-1")):
+            if name == "user_id" and value and value != "anonymous":
+                return value
+        return None
@@ -1,13 +1,23 @@
 """
 Data Models for ServerGem Backend
 Production-grade data structures with validation
+
+Models are slotted dataclasses with hand-written serializers:
+- to_dict() builds one flat dict without copying nested containers
+  (env_vars, settings, metadata are shared with the model - callers that
+  mutate the result must copy them first)
+- from_dict() never mutates its input, so stored records can be decoded
+  without a defensive copy
+
+benchmarks/models.py measures both against dataclasses.asdict.
 """
 
-from dataclasses import dataclass, field, asdict
-from typing import Optional, Dict, List, Any
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
 import json
+import uuid
 
 
 class DeploymentStatus(Enum):
@@ -19,6 +29,11 @@ class DeploymentStatus(Enum):
     FAILED = "failed"
     STOPPED = "stopped"
 
+    @property
+    def is_terminal(self) -> bool:
+        """A deployment run ends in this state (its progress stream finishes)"""
+        return self in (DeploymentStatus.LIVE, DeploymentStatus.FAILED, DeploymentStatus.STOPPED)
+
 
 class PlanTier(Enum):
     """Subscription tiers"""
@@ -27,7 +42,7 @@ class PlanTier(Enum):
     ENTERPRISE = "enterprise"
 
 
-@dataclass
+@dataclass(slots=True)
 class Deployment:
     """Production deployment record"""
     id: str
@@ -44,26 +59,46 @@ class Deployment:
     created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
     updated_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
     last_deployed: Optional[str] = None
-    build_logs: List[str] = field(default_factory=list)
     error_message: Optional[str] = None
     request_count: int = 0
     uptime_percentage: float = 100.0
     
+    @staticmethod
+    def new_id() -> str:
+        """Deployment ID - shared by stored records and chat deployments"""
+        return f"dep_{uuid.uuid4().hex[:12]}"
+    
     def to_dict(self) -> Dict:
         """Convert to dictionary for JSON serialization"""
-        data = asdict(self)
-        data['status'] = self.status.value
-        return data
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'service_name': self.service_name,
+            'repo_url': self.repo_url,
+            'status': self.status.value,
+            'url': self.url,
+            'gcp_url': self.gcp_url,
+            'region': self.region,
+            'memory': self.memory,
+            'cpu': self.cpu,
+            'env_vars': self.env_vars,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'last_deployed': self.last_deployed,
+            'error_message': self.error_message,
+            'request_count': self.request_count,
+            'uptime_percentage': self.uptime_percentage,
+        }
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'Deployment':
         """Create from dictionary"""
         if isinstance(data.get('status'), str):
-            data['status'] = DeploymentStatus(data['status'])
+            data = {**data, 'status': DeploymentStatus(data['status'])}
         return cls(**data)
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
     """User account with settings"""
     id: str
@@ -83,15 +118,26 @@ class User:
     
     def to_dict(self) -> Dict:
         """Convert to dictionary"""
-        data = asdict(self)
-        data['plan_tier'] = self.plan_tier.value
-        return data
+        return {
+            'id': self.id,
+            'email': self.email,
+            'username': self.username,
+            'display_name': self.display_name,
+            'avatar_url': self.avatar_url,
+            'github_token': self.github_token,
+            'plan_tier': self.plan_tier.value,
+            'created_at': self.created_at,
+            'settings': self.settings,
+            'max_services': self.max_services,
+            'max_requests_per_day': self.max_requests_per_day,
+            'max_memory_mb': self.max_memory_mb,
+        }
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'User':
         """Create from dictionary"""
         if isinstance(data.get('plan_tier'), str):
-            data['plan_tier'] = PlanTier(data['plan_tier'])
+            data = {**data, 'plan_tier': PlanTier(data['plan_tier'])}
         return cls(**data)
     
     def can_deploy_more_services(self, current_count: int) -> bool:
@@ -106,7 +152,7 @@ class User:
         self.max_memory_mb = 2048
 
 
-@dataclass
+@dataclass(slots=True)
 class UsageMetrics:
     """Daily usage tracking"""
     user_id: str
@@ -118,7 +164,14 @@ class UsageMetrics:
     
     def to_dict(self) -> Dict:
         """Convert to dictionary"""
-        return asdict(self)
+        return {
+            'user_id': self.user_id,
+            'date': self.date,
+            'requests': self.requests,
+            'deployments': self.deployments,
+            'memory_used_mb': self.memory_used_mb,
+            'bandwidth_gb': self.bandwidth_gb,
+        }
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'UsageMetrics':
@@ -126,7 +179,7 @@ class UsageMetrics:
         return cls(**data)
 
 
-@dataclass
+@dataclass(slots=True)
 class DeploymentEvent:
     """Event log for deployments"""
     id: str
@@ -138,4 +191,11 @@ class DeploymentEvent:
     
     def to_dict(self) -> Dict:
         """Convert to dictionary"""
-        return asdict(self)
+        return {
+            'id': self.id,
+            'deployment_id': self.deployment_id,
+            'event_type': self.event_type,
+            'message': self.message,
+            'timestamp': self.timestamp,
+            'metadata': self.metadata,
+        }
@@ -5,7 +5,11 @@ FAANG-Level Implementation - Structured Progress Updates for Real-time UI
 
 from typing import Optional, Dict, List, Callable
 from datetime import datetime
-import asyncio
+import logging
+
+from utils.deployment_events import deployment_events
+
+logger = logging.getLogger(__name__)
 
 class DeploymentProgressTracker:
     """
@@ -20,37 +24,45 @@ class DeploymentProgressTracker:
         self.start_time = datetime.now()
         self.stages: Dict[str, Dict] = {}
         self.current_progress = 0
+        deployment_events.open(deployment_id)
         
-    async def emit(self, message: str, stage: Optional[str] = None, progress: Optional[int] = None):
+    async def emit(self, message: str, stage: Optional[str] = None, progress: Optional[int] = None, percentage: bool = False):
         """
         Emit a progress message to the frontend.
         Frontend parser will extract stage information from log patterns.
+        percentage=True marks a pure percentage update that a newer one for
+        the same stage supersedes (coalesced before sending).
         """
-        if not self.progress_callback:
-            return
-            
         # Update progress if provided
         if progress is not None:
             self.current_progress = progress
+        
+        event = {
+            'type': 'message',
+            'data': {
+                'content': message,
+                'timestamp': datetime.now().isoformat(),
+                'metadata': {
+                    'deployment_id': self.deployment_id,
+                    'service_name': self.service_name,
+                    'stage': stage,
+                    'progress': self.current_progress,
+                    'percentage': percentage
+                }
+            }
+        }
+        # SSE subscribers get every event, with or without a chat session
+        deployment_events.publish(self.deployment_id, event)
+        
+        if not self.progress_callback:
+            return
             
         # Emit structured message with error handling for disconnected clients
         try:
-            await self.progress_callback({
-                'type': 'message',
-                'data': {
-                    'content': message,
-                    'timestamp': datetime.now().isoformat(),
-                    'metadata': {
-                        'deployment_id': self.deployment_id,
-                        'service_name': self.service_name,
-                        'stage': stage,
-                        'progress': self.current_progress
-                    }
-                }
-            })
+            await self.progress_callback(event)
         except Exception as e:
             # Gracefully handle disconnected clients
-            print(f"[DeploymentProgress] Warning: Could not emit progress: {e}")
+            logger.warning("Could not emit progress: %s", e)
             pass
     
     # ========================================================================
@@ -72,7 +84,6 @@ class DeploymentProgressTracker:
             stage='repo_access',
             progress=15
         )
-        await asyncio.sleep(0.1)
         await self.emit(
             f"[GitHubService] Repository cloned successfully",
             stage='repo_access'
@@ -226,7 +237,8 @@ class DeploymentProgressTracker:
         await self.emit(
             f"[CloudBuild] Building {percentage}%",
             stage='container_build',
-            progress=build_progress
+            progress=build_progress,
+            percentage=True
         )
     
     async def complete_container_build(self, image_digest: str):
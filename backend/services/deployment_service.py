@@ -3,13 +3,38 @@ Deployment Management Service
 CRUD operations for deployments with persistent storage
 """
 
+from typing import List, Optional, Dict, Tuple
+from contextlib import contextmanager, nullcontext
+import base64
 import json
 import os
-from typing import List, Optional, Dict
 from datetime import datetime
 import uuid
 
 from models import Deployment, DeploymentStatus, DeploymentEvent
+from storage import (
+    StorageBackend,
+    InlineWriter,
+    get_storage_backend,
+    get_storage_writer,
+    COLLECTION_INDEXES,
+    SecondaryIndex,
+    SortedIndex,
+    EventStore,
+    BuildLogStore,
+    LazyModelMap,
+    apply_model_op,
+    multiprocess_enabled,
+    put_op,
+    patch_op,
+    delete_op,
+)
+from utils.deployment_events import deployment_events
+from utils.response_cache import entity_versions
+
+
+# Sort keys accepted by list_deployments ("-" prefix = descending)
+SORT_FIELDS = ('created_at', 'updated_at')
 
 
 class DeploymentService:
@@ -17,80 +42,189 @@ class DeploymentService:
     Production deployment management
     
     Features:
-    - Persistent JSON storage (upgrade to PostgreSQL in production)
-    - Atomic writes with backups
+    - Pluggable storage backend (JSON journal or SQLite)
+    - Append-only journal with periodic snapshot compaction
     - Query by user, status, date
-    - Event logging for audit trail
+    - In-memory secondary indexes (user, user+status) kept in sync on writes
+    - Cursor-paged listing with status / region / created_at filters, each
+      page served from sorted per-user indexes in O(log n + page size)
+    - Event logging for audit trail (per-deployment indexed event store,
+      bounded by retention with older events in compressed archives)
+    - Build logs in a separate chunked store, out of deployment records
+    - Records decoded lazily: startup reads only keys and indexed fields
+    - All disk I/O runs on the shared storage thread; async readers never
+      block the event loop
+    - Safe with several worker processes: writes run under the collection
+      lock and every call first replays other processes' changes
     """
     
-    def __init__(self, storage_path: str = "data/deployments.json"):
+    def __init__(
+        self,
+        storage_path: str = "data/deployments.json",
+        backend: Optional[StorageBackend] = None,
+        writer: Optional[InlineWriter] = None
+    ):
         self.storage_path = storage_path
-        self.events_path = "data/deployment_events.json"
-        self._ensure_storage()
-        self._deployments: Dict[str, Deployment] = self._load_deployments()
-        self._events: List[DeploymentEvent] = self._load_events()
-    
-    def _ensure_storage(self):
-        """Create storage directory if it doesn't exist"""
-        os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
-        os.makedirs(os.path.dirname(self.events_path), exist_ok=True)
-        
-        if not os.path.exists(self.storage_path):
-            with open(self.storage_path, 'w') as f:
-                json.dump({}, f)
-        
-        if not os.path.exists(self.events_path):
-            with open(self.events_path, 'w') as f:
-                json.dump([], f)
-    
-    def _load_deployments(self) -> Dict[str, Deployment]:
-        """Load deployments from disk"""
+        data_dir = os.path.dirname(storage_path)
+        self.events_path = os.path.join(data_dir, "deployment_events")
+        self.build_logs_path = os.path.join(data_dir, "build_logs")
+        self._io = writer or get_storage_writer()
+        shared = multiprocess_enabled()
+        self._logs = BuildLogStore(self.build_logs_path, shared=shared)
+        self._store = (backend or get_storage_backend()).collection(
+            'deployments',
+            COLLECTION_INDEXES['deployments'],
+            path=self.storage_path
+        )
+        self._deployments: LazyModelMap = self._load_deployments()
+        self._events = EventStore(self.events_path, shared=shared)
+        
+        # Secondary indexes: user_id -> ids, (user_id, status) -> ids
+        self._by_user = SecondaryIndex()
+        self._by_user_status = SecondaryIndex()
+        # Sort field -> SortedIndex partitioned by user, user+status, user+region
+        self._sorted = {name: SortedIndex() for name in SORT_FIELDS}
+        self._build_indexes()
+    
+    def _build_indexes(self):
+        """Index every deployment from stored fields (no record decoding)"""
+        self._by_user.clear()
+        self._by_user_status.clear()
+        for index in self._sorted.values():
+            index.clear()
+        for dep_id in self._deployments:
+            fields = self._deployments.raw_fields(dep_id, COLLECTION_INDEXES['deployments'])
+            fields['status'] = DeploymentStatus(fields['status'])
+            self._add_to_indexes(dep_id, fields)
+    
+    def _load_deployments(self) -> LazyModelMap:
+        """Load deployments from the storage backend (decoded on first access)"""
         try:
-            with open(self.storage_path, 'r') as f:
-                data = json.load(f)
-                return {
-                    dep_id: Deployment.from_dict(dep_data)
-                    for dep_id, dep_data in data.items()
-                }
+            records = self._store.load_records()
+            legacy_logs = False
+            if isinstance(records, dict):
+                # Older JSON records embedded build logs - move them to the log store
+                for dep_id, dep_data in records.items():
+                    lines = dep_data.pop('build_logs', None)
+                    if lines is not None:
+                        legacy_logs = True
+                        if lines and self._logs.count(dep_id) == 0:
+                            self._logs.append_many(dep_id, lines)
+            
+            deployments = LazyModelMap(records, self._decode)
         except Exception as e:
             print(f"Error loading deployments: {e}")
-            return {}
+            return LazyModelMap({}, Deployment.from_dict)
+        
+        # Fold a long journal (or embedded logs) into the snapshot so the next boot is cheap
+        if self._store.needs_compaction or legacy_logs:
+            self._deployments = deployments
+            self._save_deployments()
+        
+        return deployments
+    
+    @staticmethod
+    def _decode(dep_data: Dict) -> Deployment:
+        return Deployment.from_dict(dep_data)
+    
+    def _sync(self):
+        """Replay deployment changes made by other worker processes"""
+        if not self._store.shared:
+            return
+        ops = self._store.changes()
+        if ops is None:
+            # Another process compacted past our position - start over
+            self._deployments = self._load_deployments()
+            self._build_indexes()
+            entity_versions.reset()
+            return
+        for op in ops:
+            old, new = apply_model_op(self._deployments, op, Deployment.to_dict, self._decode)
+            if old is not None:
+                self._unindex(old)
+                self._changed(old)
+            if new is not None:
+                self._index(new)
+                self._changed(new)
+    
+    @contextmanager
+    def _writing(self, atomic: bool = False):
+        """
+        Catch up with other worker processes, then mutate and persist
+
+        Deployment writes replace whole records or single fields, so
+        concurrent writers converge (last write wins, in journal order)
+        and the write is simply queued for the storage thread. atomic=True
+        holds the cross-process lock for read-modify-write updates.
+        """
+        with self._store.lock() if atomic else nullcontext():
+            self._sync()
+            yield
     
     def _save_deployments(self):
-        """Save deployments to disk with atomic write"""
+        """Write a full snapshot (compacts the JSON journal)"""
+        # Serialize on the storage thread; later journal entries replay
+        # idempotently on top of whatever state the snapshot captures
         try:
-            # Write to temp file first
-            temp_path = f"{self.storage_path}.tmp"
-            with open(temp_path, 'w') as f:
-                data = {
-                    dep_id: dep.to_dict()
-                    for dep_id, dep in self._deployments.items()
-                }
-                json.dump(data, f, indent=2)
-            
-            # Atomic rename
-            os.replace(temp_path, self.storage_path)
+            self._store.compact(self._deployments.snapshot(Deployment.to_dict))
         except Exception as e:
             print(f"Error saving deployments: {e}")
     
-    def _load_events(self) -> List[DeploymentEvent]:
-        """Load events from disk"""
+    def _persist(self, op: Dict):
+        """Record a mutation in storage, compacting when the journal grows large"""
         try:
-            with open(self.events_path, 'r') as f:
-                data = json.load(f)
-                return [DeploymentEvent(**event) for event in data]
+            self._store.apply(op)
         except Exception as e:
-            print(f"Error loading events: {e}")
-            return []
+            print(f"Error journaling deployment change: {e}")
+            return
+        
+        if self._store.needs_compaction:
+            self._save_deployments()
     
-    def _save_events(self):
-        """Save events to disk"""
-        try:
-            with open(self.events_path, 'w') as f:
-                data = [event.to_dict() for event in self._events]
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            print(f"Error saving events: {e}")
+    @staticmethod
+    def _partitions(fields: Dict) -> Tuple:
+        """Sorted index partitions a deployment belongs to"""
+        user_id = fields['user_id']
+        return (
+            (user_id,),
+            (user_id, 'status', fields['status']),
+            (user_id, 'region', fields['region']),
+        )
+    
+    def _add_to_indexes(self, dep_id: str, fields: Dict):
+        self._by_user.add(fields['user_id'], dep_id)
+        self._by_user_status.add((fields['user_id'], fields['status']), dep_id)
+        for name, index in self._sorted.items():
+            for partition in self._partitions(fields):
+                index.add(partition, fields[name] or '', dep_id)
+    
+    def _index(self, deployment: Deployment):
+        """Add deployment to secondary indexes"""
+        self._add_to_indexes(deployment.id, self._index_fields(deployment))
+    
+    def _unindex(self, deployment: Deployment):
+        """Remove deployment from secondary indexes"""
+        fields = self._index_fields(deployment)
+        self._by_user.remove(deployment.user_id, deployment.id)
+        self._by_user_status.remove((deployment.user_id, deployment.status), deployment.id)
+        for name, index in self._sorted.items():
+            for partition in self._partitions(fields):
+                index.remove(partition, fields[name] or '', deployment.id)
+    
+    @staticmethod
+    def _index_fields(deployment: Deployment) -> Dict:
+        return {
+            'user_id': deployment.user_id,
+            'status': deployment.status,
+            'region': deployment.region,
+            'created_at': deployment.created_at,
+            'updated_at': deployment.updated_at,
+        }
+    
+    @staticmethod
+    def _changed(deployment: Deployment):
+        """Invalidate ETags / cached responses that include the deployment"""
+        entity_versions.bump(f"deployment:{deployment.id}", f"deployments:{deployment.user_id}")
     
     def _log_event(self, deployment_id: str, event_type: str, message: str, metadata: Dict = None):
         """Log deployment event"""
@@ -101,8 +235,28 @@ class DeploymentService:
             message=message,
             metadata=metadata or {}
         )
-        self._events.append(event)
-        self._save_events()
+        self._io.append(self._events.append_encoded, self._events.encode(event.to_dict()))
+    
+    @staticmethod
+    def _publish_status(deployment: Deployment, error_message: Optional[str] = None):
+        """Status change for the deployment's SSE subscribers, if any"""
+        channel = deployment_events.get(deployment.id)
+        if channel is None:
+            return
+        if channel.finished:
+            if deployment.status.is_terminal:
+                return
+            # Redeployed: subscribers from now on get a new stream
+            deployment_events.restart(deployment.id)
+        deployment_events.publish(deployment.id, {
+            'type': 'status_changed',
+            'deployment_id': deployment.id,
+            'status': deployment.status.value,
+            'error': error_message,
+            'timestamp': deployment.updated_at
+        })
+        if deployment.status.is_terminal:
+            deployment_events.finish(deployment.id, deployment.status.value)
     
     # ========================================================================
     # CRUD Operations
@@ -117,7 +271,7 @@ class DeploymentService:
         env_vars: Dict[str, str] = None
     ) -> Deployment:
         """Create new deployment record"""
-        deployment_id = f"dep_{uuid.uuid4().hex[:12]}"
+        deployment_id = Deployment.new_id()
         unique_service_name = f"{user_id}-{service_name}".lower().replace('_', '-')
         
         deployment = Deployment(
@@ -131,8 +285,11 @@ class DeploymentService:
             env_vars=env_vars or {}
         )
         
-        self._deployments[deployment_id] = deployment
-        self._save_deployments()
+        with self._writing():
+            self._deployments[deployment_id] = deployment
+            self._index(deployment)
+            self._changed(deployment)
+            self._persist(put_op(deployment_id, deployment.to_dict()))
         
         self._log_event(
             deployment_id,
@@ -142,16 +299,19 @@ class DeploymentService:
         
         return deployment
     
+    def refresh(self):
+        """Catch up with other worker processes before computing ETags"""
+        self._sync()
+    
     def get_deployment(self, deployment_id: str) -> Optional[Deployment]:
         """Get deployment by ID"""
+        self._sync()
         return self._deployments.get(deployment_id)
     
     def get_user_deployments(self, user_id: str) -> List[Deployment]:
         """Get all deployments for a user"""
-        return [
-            dep for dep in self._deployments.values()
-            if dep.user_id == user_id
-        ]
+        self._sync()
+        return [self._deployments[dep_id] for dep_id in self._by_user.get(user_id)]
     
     def update_deployment_status(
         self,
@@ -161,23 +321,34 @@ class DeploymentService:
         gcp_url: Optional[str] = None
     ) -> Optional[Deployment]:
         """Update deployment status"""
-        deployment = self._deployments.get(deployment_id)
-        if not deployment:
-            return None
-        
-        deployment.status = status
-        deployment.updated_at = datetime.utcnow().isoformat()
-        
-        if error_message:
-            deployment.error_message = error_message
-        
-        if gcp_url:
-            deployment.gcp_url = gcp_url
-        
-        if status == DeploymentStatus.LIVE:
-            deployment.last_deployed = datetime.utcnow().isoformat()
-        
-        self._save_deployments()
+        with self._writing():
+            deployment = self._deployments.get(deployment_id)
+            if not deployment:
+                return None
+            
+            self._unindex(deployment)
+            deployment.status = status
+            deployment.updated_at = datetime.utcnow().isoformat()
+            self._index(deployment)
+            changes = {
+                'status': status.value,
+                'updated_at': deployment.updated_at
+            }
+            
+            if error_message:
+                deployment.error_message = error_message
+                changes['error_message'] = error_message
+            
+            if gcp_url:
+                deployment.gcp_url = gcp_url
+                changes['gcp_url'] = gcp_url
+            
+            if status == DeploymentStatus.LIVE:
+                deployment.last_deployed = datetime.utcnow().isoformat()
+                changes['last_deployed'] = deployment.last_deployed
+            
+            self._changed(deployment)
+            self._persist(patch_op(deployment_id, changes))
         
         self._log_event(
             deployment_id,
@@ -185,29 +356,97 @@ class DeploymentService:
             f"Status changed to {status.value}",
             {"status": status.value, "error": error_message}
         )
+        self._publish_status(deployment, error_message)
         
         return deployment
     
-    def add_build_log(self, deployment_id: str, log_line: str):
-        """Add build log line"""
-        deployment = self._deployments.get(deployment_id)
-        if deployment:
-            deployment.build_logs.append(log_line)
-            self._save_deployments()
+    def add_build_log(self, deployment_id: str, log_line: str) -> bool:
+        """Add build log line (False if the deployment does not exist)"""
+        return self.add_build_logs(deployment_id, [log_line])
+    
+    def add_build_logs(self, deployment_id: str, lines: List[str]) -> bool:
+        """
+        Add a batch of build log lines with a single storage write
+        
+        Returns:
+            False if the deployment does not exist
+        """
+        self._sync()
+        if deployment_id not in self._deployments:
+            return False
+        if lines:
+            self._io.append(self._logs.append_batches, (deployment_id, self._logs.encode_lines(lines)))
+        return True
+    
+    def get_build_logs(
+        self,
+        deployment_id: str,
+        offset: int = 0,
+        limit: Optional[int] = 100
+    ) -> List[str]:
+        """Read a range of build log lines"""
+        return self._io.call(self._logs.read, deployment_id, offset, limit)
+    
+    def tail_build_logs(self, deployment_id: str, lines: int = 100) -> List[str]:
+        """Read the last N build log lines"""
+        return self._io.call(self._logs.tail, deployment_id, lines)
+    
+    def get_build_log_count(self, deployment_id: str) -> int:
+        """Total build log lines for a deployment"""
+        return self._io.call(self._logs.count, deployment_id)
+    
+    async def aget_build_logs(
+        self,
+        deployment_id: str,
+        offset: int = 0,
+        limit: int = 100,
+        tail: Optional[int] = None
+    ) -> Tuple[List[str], int, int]:
+        """
+        Read build logs without blocking the event loop
+        
+        Returns:
+            (lines, offset of the first line, total line count)
+        """
+        return await self._io.run(self._read_build_logs, deployment_id, offset, limit, tail)
+    
+    def _read_build_logs(
+        self,
+        deployment_id: str,
+        offset: int,
+        limit: int,
+        tail: Optional[int]
+    ) -> Tuple[List[str], int, int]:
+        total = self._logs.count(deployment_id)
+        if tail is not None:
+            offset = max(total - tail, 0)
+            limit = tail
+        return self._logs.read(deployment_id, offset, limit), offset, total
     
     def increment_request_count(self, deployment_id: str):
         """Increment request count for a deployment"""
-        deployment = self._deployments.get(deployment_id)
-        if deployment:
-            deployment.request_count += 1
-            self._save_deployments()
+        with self._writing(atomic=True):
+            deployment = self._deployments.get(deployment_id)
+            if deployment:
+                deployment.request_count += 1
+                self._changed(deployment)
+                self._persist(patch_op(
+                    deployment_id,
+                    {'request_count': deployment.request_count}
+                ))
     
     def delete_deployment(self, deployment_id: str) -> bool:
         """Delete deployment"""
-        if deployment_id in self._deployments:
-            deployment = self._deployments[deployment_id]
-            del self._deployments[deployment_id]
-            self._save_deployments()
+        with self._writing():
+            deployment = self._deployments.pop(deployment_id, None)
+            if deployment is not None:
+                self._unindex(deployment)
+                self._changed(deployment)
+                self._persist(delete_op(deployment_id))
+        
+        if deployment is not None:
+            self._io.submit(self._logs.delete, deployment_id)
+            deployment_events.finish(deployment_id, 'deleted')
             
             self._log_event(
                 deployment_id,
@@ -222,21 +461,171 @@ class DeploymentService:
     # Query Operations
     # ========================================================================
     
+    def list_deployments(
+        self,
+        user_id: str,
+        status: Optional[DeploymentStatus] = None,
+        region: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        sort: str = "-created_at",
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Deployment], Optional[str]]:
+        """
+        Get one page of a user's deployments
+        
+        Args:
+            user_id: Owner
+            status / region: Optional exact-match filters
+            created_after / created_before: Optional inclusive ISO bounds
+            sort: created_at or updated_at, "-" prefix for newest first
+            limit: Page size
+            cursor: Opaque cursor from a previous page (None = first page)
+        
+        Returns:
+            (deployments, cursor for the next page or None)
+        
+        Raises:
+            ValueError: Unknown sort key or malformed cursor
+        """
+        sort_field, descending, after = self.page_position(sort, cursor)
+        
+        # Narrowest partition the filters allow; a second filter is checked per row
+        if status is not None:
+            partition = (user_id, 'status', status)
+        elif region is not None:
+            partition = (user_id, 'region', region)
+        else:
+            partition = (user_id,)
+        
+        # A created_at range is a bound on the index itself when sorting by it
+        bounded = sort_field == 'created_at'
+        
+        self._sync()
+        page: List[Deployment] = []
+        last = None
+        for value, dep_id in self._sorted[sort_field].range(
+            partition,
+            low=created_after if bounded else None,
+            high=created_before if bounded else None,
+            after=after,
+            descending=descending
+        ):
+            if len(page) == limit:
+                return page, self._encode_cursor(sort, last)
+            deployment = self._deployments[dep_id]
+            last = (value, dep_id)
+            if region is not None and deployment.region != region:
+                continue
+            if not bounded and not (
+                (created_after is None or deployment.created_at >= created_after)
+                and (created_before is None or deployment.created_at <= created_before)
+            ):
+                continue
+            page.append(deployment)
+        return page, None
+    
+    @classmethod
+    def page_position(cls, sort: str, cursor: Optional[str] = None) -> Tuple[str, bool, Optional[Tuple[str, str]]]:
+        """
+        Parse list_deployments() paging arguments
+        
+        Returns:
+            (sort field, descending, position to continue after or None)
+        
+        Raises:
+            ValueError: Unknown sort key or malformed cursor
+        """
+        descending = sort.startswith('-')
+        sort_field = sort.lstrip('-')
+        if sort_field not in SORT_FIELDS:
+            raise ValueError(f"Invalid sort: {sort} (use {', '.join(SORT_FIELDS)})")
+        after = cls._decode_cursor(cursor, sort) if cursor else None
+        return sort_field, descending, after
+    
+    @staticmethod
+    def _encode_cursor(sort: str, position: Tuple[str, str]) -> str:
+        raw = json.dumps([sort, position[0], position[1]], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def _decode_cursor(cursor: str, sort: str) -> Tuple[str, str]:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            cursor_sort, value, dep_id = json.loads(base64.urlsafe_b64decode(padded))
+        except Exception:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        if cursor_sort != sort:
+            raise ValueError("Cursor was issued for a different sort order")
+        return value, dep_id
+    
     def get_active_deployments(self, user_id: str) -> List[Deployment]:
         """Get all active (live) deployments for user"""
+        self._sync()
         return [
-            dep for dep in self._deployments.values()
-            if dep.user_id == user_id and dep.status == DeploymentStatus.LIVE
+            self._deployments[dep_id]
+            for dep_id in self._by_user_status.get((user_id, DeploymentStatus.LIVE))
         ]
     
+    def get_active_deployment_count(self, user_id: str) -> int:
+        """Count active (live) deployments for user - O(1) quota checks"""
+        self._sync()
+        return self._by_user_status.count((user_id, DeploymentStatus.LIVE))
+    
+    def get_status_count(self, user_id: str, status: DeploymentStatus) -> int:
+        """Count a user's deployments in the given status"""
+        self._sync()
+        return self._by_user_status.count((user_id, status))
+    
     def get_deployment_events(self, deployment_id: str, limit: int = 50) -> List[DeploymentEvent]:
-        """Get events for a deployment"""
-        events = [e for e in self._events if e.deployment_id == deployment_id]
-        return sorted(events, key=lambda x: x.timestamp, reverse=True)[:limit]
+        """Get latest events for a deployment, newest first"""
+        events, _ = self.get_deployment_events_page(deployment_id, limit)
+        return events
+    
+    def get_deployment_events_page(
+        self,
+        deployment_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        event_type: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> Tuple[List[DeploymentEvent], Optional[str]]:
+        """
+        Get one page of events, newest first
+        
+        Args:
+            event_type: Only events of this type
+            since / until: Optional inclusive ISO timestamp bounds
+        
+        Returns:
+            (events, cursor for the next older page or None)
+        """
+        records, next_cursor = self._io.call(
+            self._events.latest, deployment_id, limit, cursor, event_type, since, until
+        )
+        return [DeploymentEvent(**record) for record in records], next_cursor
+    
+    async def aget_deployment_events_page(
+        self,
+        deployment_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        event_type: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> Tuple[List[DeploymentEvent], Optional[str]]:
+        """Async get_deployment_events_page - reads on the storage thread"""
+        records, next_cursor = await self._io.run(
+            self._events.latest, deployment_id, limit, cursor, event_type, since, until
+        )
+        return [DeploymentEvent(**record) for record in records], next_cursor
     
     def get_deployment_count(self, user_id: str) -> int:
         """Get total deployment count for user"""
-        return len([d for d in self._deployments.values() if d.user_id == user_id])
+        self._sync()
+        return self._by_user.count(user_id)
 
 
 # Global instance
@@ -28,11 +28,9 @@ from google.cloud import run_v2
 from google.api_core import retry
 from google.api_core import exceptions as google_exceptions
 
-# Configure structured logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] - %(message)s'
-)
+from utils.metrics import CLOUD_BUILDS
+
+# Log output (format, levels, correlation fields) is configured by utils.log.setup_logging
 
 
 class DeploymentStage(Enum):
@@ -94,12 +92,8 @@ class GCloudService:
         self.artifact_registry = f'{self.region}-docker.pkg.dev'
         self.correlation_id = correlation_id or self._generate_correlation_id()
         self.retry_strategy = RetryStrategy(max_retries=3)
-        self.metrics = {
-            'builds': {'total': 0, 'success': 0, 'failed': 0},
-            'deployments': {'total': 0, 'success': 0, 'failed': 0},
-            'build_times': [],
-            'deploy_times': []
-        }
+        # Build results are counted in the process-wide registry (utils.metrics);
+        # stage durations are recorded there by MonitoringService
         
         # Initialize Google Cloud API clients (no CLI required!)
         self.build_client = cloudbuild_v1.CloudBuildClient()
@@ -367,7 +361,6 @@ class GCloudService:
     ) -> Dict:
         """Internal build implementation with detailed error handling"""
         start_time = time.time()
-        self.metrics['builds']['total'] += 1
         
         try:
             project_path_obj = Path(project_path).resolve()
@@ -522,10 +515,9 @@ class GCloudService:
             result = operation.result()
             
             build_duration = time.time() - start_time
-            self.metrics['build_times'].append(build_duration)
             
             if result.status == cloudbuild_v1.Build.Status.SUCCESS:
-                self.metrics['builds']['success'] += 1
+                CLOUD_BUILDS.labels('success').inc()
                 
                 if progress_callback:
                     await progress_callback({
@@ -544,7 +536,7 @@ class GCloudService:
                     'message': f'Image built successfully: {image_tag}'
                 }
             else:
-                self.metrics['builds']['failed'] += 1
+                CLOUD_BUILDS.labels('failed').inc()
                 error_msg = f"Build failed with status: {result.status.name}"
                 
                 self.logger.error(error_msg)
@@ -555,7 +547,7 @@ class GCloudService:
                 }
                 
         except Exception as e:
-            self.metrics['builds']['failed'] += 1
+            CLOUD_BUILDS.labels('error').inc()
             self.logger.error(f"Build exception: {str(e)}")
             return {
                 'success': False,
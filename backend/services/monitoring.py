@@ -11,6 +11,9 @@ from datetime import datetime
 from dataclasses import dataclass, field
 import json
 
+from utils.deployment_events import deployment_events
+from utils.metrics import DEPLOYMENT_DURATION, DEPLOYMENT_STAGE_DURATION, DEPLOYMENTS_STARTED
+
 
 @dataclass
 class DeploymentMetrics:
@@ -83,12 +86,21 @@ class MonitoringService:
         )
         
         self.deployments: Dict[str, DeploymentMetrics] = {}
-        self.metrics = {
-            'total_deployments': 0,
-            'successful_deployments': 0,
-            'failed_deployments': 0,
-            'avg_deployment_time': 0,
-            'error_rate': 0
+    
+    @property
+    def metrics(self) -> Dict[str, float]:
+        """Deployment totals, derived from the process-wide Prometheus metrics"""
+        total = int(DEPLOYMENTS_STARTED.labels().value)
+        completed = DEPLOYMENT_DURATION.series()
+        finished = sum(series.count for _, series in completed)
+        successful = sum(series.count for (status,), series in completed if status == 'success')
+        failed = finished - successful
+        return {
+            'total_deployments': total,
+            'successful_deployments': successful,
+            'failed_deployments': failed,
+            'avg_deployment_time': sum(series.sum for _, series in completed) / finished if finished else 0,
+            'error_rate': failed / total if total else 0
         }
     
     def _generate_correlation_id(self) -> str:
@@ -102,7 +114,7 @@ class MonitoringService:
             service_name=service_name
         )
         self.deployments[deployment_id] = metrics
-        self.metrics['total_deployments'] += 1
+        DEPLOYMENTS_STARTED.inc()
         
         self.logger.info(f"[{deployment_id}] Started deployment for: {service_name}")
         return metrics
@@ -118,6 +130,7 @@ class MonitoringService:
         """Record deployment stage completion"""
         if deployment_id in self.deployments:
             self.deployments[deployment_id].record_stage(stage, status, duration, metadata)
+            DEPLOYMENT_STAGE_DURATION.labels(stage, status).observe(duration)
             self.logger.info(
                 f"[{deployment_id}] Stage {stage}: {status} ({duration:.2f}s)"
             )
@@ -129,22 +142,9 @@ class MonitoringService:
         
         deployment = self.deployments[deployment_id]
         deployment.complete(status)
-        
-        if status == "success":
-            self.metrics['successful_deployments'] += 1
-        else:
-            self.metrics['failed_deployments'] += 1
-        
-        # Update average deployment time
-        total = self.metrics['total_deployments']
-        current_avg = self.metrics['avg_deployment_time']
-        new_avg = ((current_avg * (total - 1)) + deployment.get_duration()) / total
-        self.metrics['avg_deployment_time'] = new_avg
-        
-        # Update error rate
-        self.metrics['error_rate'] = (
-            self.metrics['failed_deployments'] / self.metrics['total_deployments']
-        )
+        DEPLOYMENT_DURATION.labels(status).observe(deployment.get_duration())
+        # Ends the deployment's SSE stream
+        deployment_events.finish(deployment_id, status)
         
         self.logger.info(
             f"[{deployment_id}] Deployment completed: {status} "
@@ -0,0 +1,146 @@
+"""
+Usage Rollups
+Incrementally maintained aggregates behind the usage summary endpoints
+"""
+
+from typing import Dict, List, Optional, Tuple
+from datetime import date as Date, timedelta
+
+from models import UsageMetrics
+
+
+ROLLUP_FIELDS = ('requests', 'deployments', 'memory_used_mb', 'bandwidth_gb')
+ROLLUP_WINDOWS = (7, 30, 90)
+
+
+def _empty_totals() -> Dict[str, float]:
+    return {'requests': 0, 'deployments': 0, 'memory_used_mb': 0, 'bandwidth_gb': 0.0, 'days': 0}
+
+
+def _add(totals: Dict[str, float], metrics: UsageMetrics, sign: int = 1):
+    for name in ROLLUP_FIELDS:
+        totals[name] += sign * getattr(metrics, name)
+    totals['days'] += sign
+
+
+class UsageRollups:
+    """
+    Per-user usage aggregates
+
+    Features:
+    - Month buckets: 'YYYY-MM' -> {date: metrics} plus running totals
+    - Rolling window sums for the last 7/30/90 days (same inclusive
+      range as get_usage_range(today - N, today)); days sliding in and
+      out of a window are applied lazily, amortized O(1) per day
+    - Lifetime totals per user
+
+    Tracking only ever touches today's record, so every track_* call is
+    a constant number of additions here.
+    """
+
+    def __init__(self, usage: Dict[str, Dict[str, UsageMetrics]], windows=ROLLUP_WINDOWS):
+        self._usage = usage
+        self.windows = tuple(windows)
+        self._months: Dict[Tuple[str, str], Dict[str, UsageMetrics]] = {}
+        self._month_totals: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._lifetime: Dict[str, Dict[str, float]] = {}
+        # (user_id, window days) -> (first date, last date, totals)
+        self._window_state: Dict[Tuple[str, int], Tuple[Date, Date, Dict[str, float]]] = {}
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute month and lifetime aggregates from raw usage"""
+        self._months.clear()
+        self._month_totals.clear()
+        self._lifetime.clear()
+        self._window_state.clear()
+
+        for user_id, dates in self._usage.items():
+            for day in sorted(dates):
+                self.add_day(dates[day])
+
+    # ========================================================================
+    # Maintenance (called by UsageService)
+    # ========================================================================
+
+    def add_day(self, metrics: UsageMetrics):
+        """A user/day record was created (possibly with non-zero values)"""
+        key = (metrics.user_id, metrics.date[:7])
+        self._months.setdefault(key, {})[metrics.date] = metrics
+        _add(self._month_totals.setdefault(key, _empty_totals()), metrics)
+        _add(self._lifetime.setdefault(metrics.user_id, _empty_totals()), metrics)
+
+        day = Date.fromisoformat(metrics.date)
+        for days in self.windows:
+            state = self._window_state.get((metrics.user_id, days))
+            if state and state[0] <= day <= state[1]:
+                _add(state[2], metrics)
+
+    def add(self, user_id: str, day: str, **deltas):
+        """Apply counter increments to an existing user/day record"""
+        targets = [
+            self._month_totals.setdefault((user_id, day[:7]), _empty_totals()),
+            self._lifetime.setdefault(user_id, _empty_totals()),
+        ]
+        parsed = Date.fromisoformat(day)
+        for days in self.windows:
+            state = self._window_state.get((user_id, days))
+            if state and state[0] <= parsed <= state[1]:
+                targets.append(state[2])
+
+        for totals in targets:
+            for name, value in deltas.items():
+                totals[name] += value
+
+    # ========================================================================
+    # Queries
+    # ========================================================================
+
+    def month(self, user_id: str, month: str) -> List[UsageMetrics]:
+        """Daily records for 'YYYY-MM', oldest first"""
+        bucket = self._months.get((user_id, month), {})
+        return [bucket[day] for day in sorted(bucket)]
+
+    def month_totals(self, user_id: str, month: str) -> Dict[str, float]:
+        return dict(self._month_totals.get((user_id, month), _empty_totals()))
+
+    def lifetime(self, user_id: str) -> Dict[str, float]:
+        return dict(self._lifetime.get(user_id, _empty_totals()))
+
+    def window(self, user_id: str, days: int, today: Date) -> Optional[Dict[str, float]]:
+        """
+        Totals for [today - days, today], or None if days is not rolled up
+        """
+        if days not in self.windows:
+            return None
+
+        start = today - timedelta(days=days)
+        state = self._window_state.get((user_id, days))
+        dates = self._usage.get(user_id, {})
+
+        if state is None or start < state[0] or (start - state[0]).days > days:
+            # First use (or a long gap): sum the window's days directly
+            totals = _empty_totals()
+            for offset in range(days + 1):
+                metrics = dates.get((start + timedelta(days=offset)).isoformat())
+                if metrics is not None:
+                    _add(totals, metrics)
+        else:
+            old_start, old_end, totals = state
+            # Slide: subtract days that fell out, add days that came in
+            current = old_start
+            while current < start:
+                metrics = dates.get(current.isoformat())
+                if metrics is not None:
+                    _add(totals, metrics, -1)
+                current += timedelta(days=1)
+
+            current = old_end + timedelta(days=1)
+            while current <= today:
+                metrics = dates.get(current.isoformat())
+                if metrics is not None:
+                    _add(totals, metrics)
+                current += timedelta(days=1)
+
+        self._window_state[(user_id, days)] = (start, today, totals)
+        return dict(totals)
@@ -3,13 +3,25 @@ Usage Tracking Service
 Track API requests, deployments, and resource usage
 """
 
-import json
-import os
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from collections import defaultdict
+import asyncio
+import atexit
+import os
+import threading
 
 from models import UsageMetrics
+from services.usage_rollups import UsageRollups, ROLLUP_FIELDS
+from storage import (
+    StorageBackend,
+    get_storage_backend,
+    COLLECTION_INDEXES,
+    usage_key,
+    normalize_usage_records,
+    put_op,
+)
+from utils.response_cache import entity_versions
 
 
 class UsageService:
@@ -21,54 +33,245 @@ class UsageService:
     - Daily usage metrics
     - Resource usage tracking
     - Usage limits enforcement
+    - Pluggable storage backend (JSON journal or SQLite)
+    - Write coalescing: increments stay in memory and are flushed in
+      batches every flush_interval seconds or flush_threshold updates
+    - Precomputed monthly, rolling-window and lifetime rollups
+    - record_http_request() only bumps an in-memory counter; pending HTTP
+      counts are folded into the metrics on the next query or flush
+    - Safe with several worker processes: each flush replays other
+      processes' writes under the collection lock and re-applies this
+      process's unflushed increments on top, so no counts are lost; the
+      background flusher takes that lock on the storage thread, so the
+      event loop never waits for another process
     """
     
-    def __init__(self, storage_path: str = "data/usage.json"):
+    def __init__(
+        self,
+        storage_path: str = "data/usage.json",
+        backend: Optional[StorageBackend] = None,
+        flush_interval: float = None,
+        flush_threshold: int = None
+    ):
         self.storage_path = storage_path
-        self._ensure_storage()
+        self.flush_interval = flush_interval or float(os.getenv("USAGE_FLUSH_INTERVAL", "5"))
+        self.flush_threshold = flush_threshold or int(os.getenv("USAGE_FLUSH_THRESHOLD", "1000"))
+        self._store = (backend or get_storage_backend()).collection(
+            'usage',
+            COLLECTION_INDEXES['usage'],
+            path=self.storage_path
+        )
         self._usage: Dict[str, Dict[str, UsageMetrics]] = self._load_usage()
+        self._rollups = UsageRollups(self._usage)
         # In-memory counters for current day
         self._request_counts: Dict[str, int] = defaultdict(int)
-    
-    def _ensure_storage(self):
-        """Create storage directory"""
-        os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
-        if not os.path.exists(self.storage_path):
-            with open(self.storage_path, 'w') as f:
-                json.dump({}, f)
+        # user_id -> [requests, response bytes] handed over by the middleware
+        self._pending_http: Dict[str, List[int]] = {}
+        
+        # Metrics changed since the last flush, keyed by usage_key()
+        self._dirty: Dict[str, UsageMetrics] = {}
+        # Unflushed increments per key (multi-process mode only)
+        self._deltas: Dict[str, Dict[str, float]] = {}
+        self._pending_updates = 0
+        self._flush_lock = threading.Lock()
+        # Set by run_flusher(); wakes it early once flush_threshold is hit
+        self._flush_requested: Optional[asyncio.Event] = None
+        atexit.register(self.flush)
     
     def _load_usage(self) -> Dict[str, Dict[str, UsageMetrics]]:
-        """Load usage data from disk"""
+        """Load usage data from the storage backend"""
         try:
-            with open(self.storage_path, 'r') as f:
-                data = json.load(f)
-                result = {}
-                for user_id, dates in data.items():
-                    result[user_id] = {
-                        date: UsageMetrics.from_dict(metrics)
-                        for date, metrics in dates.items()
-                    }
-                return result
+            raw = self._store.load_records()
+            records = normalize_usage_records(raw)
+            result = {}
+            for metrics in records.values():
+                result.setdefault(metrics['user_id'], {})[metrics['date']] = (
+                    UsageMetrics.from_dict(metrics)
+                )
         except Exception as e:
             print(f"Error loading usage: {e}")
             return {}
+        
+        # Rewrite legacy nested files (and long journals) in the flat layout
+        if self._store.needs_compaction or records.keys() != raw.keys():
+            self._usage = result
+            self._save_usage()
+        
+        return result
     
     def _save_usage(self):
-        """Save usage data to disk"""
+        """Write a full snapshot (compacts the JSON journal)"""
+        rows = [metrics for dates in self._usage.values() for metrics in dates.values()]
         try:
-            temp_path = f"{self.storage_path}.tmp"
-            with open(temp_path, 'w') as f:
-                data = {}
-                for user_id, dates in self._usage.items():
-                    data[user_id] = {
-                        date: metrics.to_dict()
-                        for date, metrics in dates.items()
-                    }
-                json.dump(data, f, indent=2)
-            os.replace(temp_path, self.storage_path)
+            self._store.compact(lambda: {
+                usage_key(metrics.user_id, metrics.date): metrics.to_dict()
+                for metrics in rows
+            })
         except Exception as e:
             print(f"Error saving usage: {e}")
     
+    def _mark_dirty(self, metrics: UsageMetrics, **deltas):
+        """Queue metrics for the next batched flush"""
+        key = usage_key(metrics.user_id, metrics.date)
+        self._dirty[key] = metrics
+        entity_versions.bump(f"usage:{metrics.user_id}")
+        self._pending_updates += 1
+        
+        if self._store.shared:
+            pending = self._deltas.setdefault(key, {})
+            for name, value in deltas.items():
+                pending[name] = pending.get(name, 0) + value
+        
+        if self._pending_updates >= self.flush_threshold:
+            if self._store.shared and self._flush_requested is not None:
+                # The flusher waits for the cross-process lock off the loop
+                self._flush_requested.set()
+            else:
+                self.flush()
+    
+    def flush(self) -> int:
+        """
+        Write all dirty metrics in one batch
+        
+        Returns:
+            Number of user/day records written
+        """
+        self._fold_pending_http()
+        with self._flush_lock, self._store.lock():
+            written = self._flush_locked()
+        if written and self._store.needs_compaction:
+            self._save_usage()
+        return written
+    
+    async def aflush(self) -> int:
+        """
+        flush() for the background task
+
+        With several worker processes the collection lock is taken on the
+        storage thread, so waiting for another process's write never blocks
+        the event loop.
+        """
+        if not self._store.shared:
+            return self.flush()
+        self._fold_pending_http()
+        async with self._store.locked():
+            with self._flush_lock:
+                written = self._flush_locked()
+        if written and self._store.needs_compaction:
+            self._save_usage()
+        return written
+    
+    def _flush_locked(self) -> int:
+        """Body of flush(), inside the collection lock"""
+        if not self._dirty:
+            return 0
+        
+        # Fold in other processes' counts first; ours are re-added on top
+        self._replay()
+        dirty, self._dirty = self._dirty, {}
+        deltas, self._deltas = self._deltas, {}
+        self._pending_updates = 0
+        
+        try:
+            self._store.apply_many([
+                put_op(key, metrics.to_dict())
+                for key, metrics in dirty.items()
+            ])
+        except Exception as e:
+            print(f"Error flushing usage: {e}")
+            # Keep the changes for the next attempt (newer entries win)
+            self._dirty = {**dirty, **self._dirty}
+            for key, pending in deltas.items():
+                merged = self._deltas.setdefault(key, {})
+                for name, value in pending.items():
+                    merged[name] = merged.get(name, 0) + value
+            return 0
+        
+        return len(dirty)
+    
+    async def run_flusher(self):
+        """Background task: flush dirty metrics every flush_interval seconds"""
+        self._flush_requested = asyncio.Event()
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_requested.clear()
+                await self.aflush()
+            except asyncio.CancelledError:
+                self.flush()
+                raise
+            except Exception as e:
+                print(f"[Usage] Error in flush task: {e}")
+    
+    def _fold_pending_http(self):
+        """Apply HTTP counters recorded since the last query or flush"""
+        if not self._pending_http:
+            return
+        pending, self._pending_http = self._pending_http, {}
+        for user_id, (requests, response_bytes) in pending.items():
+            metrics = self._get_or_create_metrics(user_id)
+            metrics.requests += requests
+            self._request_counts[user_id] += requests
+            gigabytes = response_bytes / (1024 ** 3)
+            metrics.bandwidth_gb += gigabytes
+            self._rollups.add(user_id, metrics.date, requests=requests, bandwidth_gb=gigabytes)
+            self._mark_dirty(metrics, requests=requests, bandwidth_gb=gigabytes)
+    
+    def _sync(self):
+        """Bring metrics up to date before a query"""
+        self._fold_pending_http()
+        self._replay()
+    
+    def _replay(self):
+        """Replay usage records other worker processes flushed"""
+        if not self._store.shared:
+            return
+        ops = self._store.changes()
+        if ops is None:
+            # Another process compacted past our position - start over,
+            # keeping our unflushed increments
+            self._usage = self._load_usage()
+            for key, pending in self._deltas.items():
+                user_id, date = key.rsplit(':', 1)
+                metrics = self._usage.setdefault(user_id, {}).setdefault(
+                    date, UsageMetrics(user_id=user_id, date=date)
+                )
+                for name, value in pending.items():
+                    setattr(metrics, name, getattr(metrics, name) + value)
+                self._dirty[key] = metrics
+            self._rollups = UsageRollups(self._usage)
+            entity_versions.reset()
+            return
+        
+        for op in ops:
+            record = op.get('record')
+            if op.get('op') != 'put' or not record:
+                continue
+            key = op['key']
+            entity_versions.bump(f"usage:{record['user_id']}")
+            pending = self._deltas.get(key, {})
+            values = {
+                name: record.get(name, 0) + pending.get(name, 0)
+                for name in ROLLUP_FIELDS
+            }
+            
+            dates = self._usage.setdefault(record['user_id'], {})
+            metrics = dates.get(record['date'])
+            if metrics is None:
+                metrics = UsageMetrics.from_dict(dict(record, **values))
+                dates[metrics.date] = metrics
+                self._rollups.add_day(metrics)
+                continue
+            
+            # Update in place - rollup buckets hold this object
+            diff = {name: values[name] - getattr(metrics, name) for name in ROLLUP_FIELDS}
+            for name, value in values.items():
+                setattr(metrics, name, value)
+            self._rollups.add(metrics.user_id, metrics.date, **diff)
+    
     def _get_today_date(self) -> str:
         """Get today's date string"""
         return datetime.utcnow().date().isoformat()
@@ -82,10 +285,12 @@ class UsageService:
             self._usage[user_id] = {}
         
         if date not in self._usage[user_id]:
-            self._usage[user_id][date] = UsageMetrics(
+            metrics = UsageMetrics(
                 user_id=user_id,
                 date=date
             )
+            self._usage[user_id][date] = metrics
+            self._rollups.add_day(metrics)
         
         return self._usage[user_id][date]
     
@@ -98,20 +303,38 @@ class UsageService:
         metrics = self._get_or_create_metrics(user_id)
         metrics.requests += 1
         self._request_counts[user_id] += 1
-        self._save_usage()
+        self._rollups.add(user_id, metrics.date, requests=1)
+        self._mark_dirty(metrics, requests=1)
+    
+    def record_http_request(self, user_id: str, response_bytes: int):
+        """
+        Count one API request and its response size - O(1), never touches storage
+        
+        Called by the usage middleware on every request; the counts reach
+        the daily metrics on the next query or flush.
+        """
+        pending = self._pending_http.get(user_id)
+        if pending is None:
+            self._pending_http[user_id] = [1, response_bytes]
+        else:
+            pending[0] += 1
+            pending[1] += response_bytes
     
     def track_deployment(self, user_id: str, memory_mb: int = 512):
         """Track deployment"""
         metrics = self._get_or_create_metrics(user_id)
         metrics.deployments += 1
         metrics.memory_used_mb += memory_mb
-        self._save_usage()
+        self._rollups.add(user_id, metrics.date, deployments=1, memory_used_mb=memory_mb)
+        self._mark_dirty(metrics, deployments=1, memory_used_mb=memory_mb)
     
     def track_bandwidth(self, user_id: str, bytes_transferred: int):
         """Track bandwidth usage"""
         metrics = self._get_or_create_metrics(user_id)
-        metrics.bandwidth_gb += bytes_transferred / (1024 ** 3)
-        self._save_usage()
+        gigabytes = bytes_transferred / (1024 ** 3)
+        metrics.bandwidth_gb += gigabytes
+        self._rollups.add(user_id, metrics.date, bandwidth_gb=gigabytes)
+        self._mark_dirty(metrics, bandwidth_gb=gigabytes)
     
     # ========================================================================
     # Query Operations
@@ -119,6 +342,7 @@ class UsageService:
     
     def get_today_usage(self, user_id: str) -> UsageMetrics:
         """Get today's usage for user"""
+        self._sync()
         return self._get_or_create_metrics(user_id)
     
     def get_usage_range(
@@ -128,6 +352,7 @@ class UsageService:
         end_date: str
     ) -> List[UsageMetrics]:
         """Get usage metrics for date range"""
+        self._sync()
         if user_id not in self._usage:
             return []
         
@@ -139,17 +364,25 @@ class UsageService:
     
     def get_monthly_usage(self, user_id: str, year: int, month: int) -> List[UsageMetrics]:
         """Get usage for a specific month"""
-        start_date = f"{year:04d}-{month:02d}-01"
-        
-        # Calculate last day of month
-        if month == 12:
-            end_date = f"{year:04d}-{month:02d}-31"
-        else:
-            next_month = datetime(year, month + 1, 1)
-            last_day = (next_month - timedelta(days=1)).day
-            end_date = f"{year:04d}-{month:02d}-{last_day:02d}"
-        
-        return self.get_usage_range(user_id, start_date, end_date)
+        self._sync()
+        return self._rollups.month(user_id, f"{year:04d}-{month:02d}")
+    
+    def get_monthly_totals(self, user_id: str, year: int, month: int) -> Dict:
+        """Get aggregated usage for a specific month"""
+        self._sync()
+        return self._rollups.month_totals(user_id, f"{year:04d}-{month:02d}")
+    
+    def get_lifetime_totals(self, user_id: str) -> Dict:
+        """Get aggregated usage across all recorded days"""
+        self._sync()
+        return self._rollups.lifetime(user_id)
+    
+    def peek_today_requests(self, user_id: str) -> Tuple[str, int]:
+        """(today's date, requests so far) without creating a usage record"""
+        self._sync()
+        date = self._get_today_date()
+        metrics = self._usage.get(user_id, {}).get(date)
+        return date, metrics.requests if metrics is not None else 0
     
     def get_total_requests_today(self, user_id: str) -> int:
         """Get total requests for today"""
@@ -168,28 +401,31 @@ class UsageService:
     
     def get_usage_summary(self, user_id: str, days: int = 30) -> Dict:
         """Get usage summary for last N days"""
+        self._sync()
         end_date = datetime.utcnow().date()
-        start_date = end_date - timedelta(days=days)
         
-        usage_list = self.get_usage_range(
-            user_id,
-            start_date.isoformat(),
-            end_date.isoformat()
-        )
+        totals = self._rollups.window(user_id, days, end_date)
+        if totals is None:
+            # Not a rolled-up window - aggregate the range directly
+            start_date = end_date - timedelta(days=days)
+            usage_list = self.get_usage_range(
+                user_id,
+                start_date.isoformat(),
+                end_date.isoformat()
+            )
+            totals = {name: sum(getattr(m, name) for m in usage_list) for name in (
+                'requests', 'deployments', 'memory_used_mb', 'bandwidth_gb'
+            )}
+            totals['days'] = len(usage_list)
         
-        total_requests = sum(m.requests for m in usage_list)
-        total_deployments = sum(m.deployments for m in usage_list)
-        total_bandwidth = sum(m.bandwidth_gb for m in usage_list)
-        avg_memory = (
-            sum(m.memory_used_mb for m in usage_list) / len(usage_list)
-            if usage_list else 0
-        )
+        total_requests = totals['requests']
+        avg_memory = totals['memory_used_mb'] / totals['days'] if totals['days'] else 0
         
         return {
             "period_days": days,
             "total_requests": total_requests,
-            "total_deployments": total_deployments,
-            "total_bandwidth_gb": round(total_bandwidth, 2),
+            "total_deployments": totals['deployments'],
+            "total_bandwidth_gb": round(totals['bandwidth_gb'], 2),
             "avg_memory_mb": round(avg_memory, 0),
             "daily_average_requests": round(total_requests / days, 1) if days > 0 else 0
         }
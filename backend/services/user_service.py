@@ -3,12 +3,26 @@ User Management Service
 User accounts, authentication, and settings
 """
 
-import json
-import os
 from typing import Optional, Dict
+from contextlib import contextmanager
+from dataclasses import fields, replace
+import threading
 import uuid
 
 from models import User, PlanTier
+from storage import (
+    StorageBackend,
+    get_storage_backend,
+    COLLECTION_INDEXES,
+    UniqueIndex,
+    DuplicateKeyError,
+    LazyModelMap,
+    apply_model_op,
+    put_op,
+    patch_op,
+    delete_op,
+)
+from utils.response_cache import entity_versions
 
 
 class UserService:
@@ -20,47 +34,182 @@ class UserService:
     - Plan tier management
     - Settings persistence
     - Token management
+    - Pluggable storage backend (JSON journal or SQLite)
+    - Unique email / username hash indexes (O(1) lookups, no duplicates)
+    - Records decoded lazily: startup reads only keys and indexed fields
+    - Safe with several worker processes: uniqueness checks and writes run
+      under the collection lock after replaying other processes' changes
     """
     
-    def __init__(self, storage_path: str = "data/users.json"):
+    def __init__(
+        self,
+        storage_path: str = "data/users.json",
+        backend: Optional[StorageBackend] = None
+    ):
         self.storage_path = storage_path
-        self._ensure_storage()
-        self._users: Dict[str, User] = self._load_users()
-    
-    def _ensure_storage(self):
-        """Create storage directory"""
-        os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
-        if not os.path.exists(self.storage_path):
-            with open(self.storage_path, 'w') as f:
-                json.dump({}, f)
-    
-    def _load_users(self) -> Dict[str, User]:
-        """Load users from disk"""
+        self._store = (backend or get_storage_backend()).collection(
+            'users',
+            COLLECTION_INDEXES['users'],
+            path=self.storage_path
+        )
+        self._users: LazyModelMap = self._load_users()
+        
+        # Unique indexes; the lock makes check + claim atomic across threads
+        self._lock = threading.RLock()
+        self._by_email = UniqueIndex('email')
+        self._by_username = UniqueIndex('username')
+        self._build_indexes()
+    
+    def _build_indexes(self):
+        """Claim every stored email / username (no record decoding)"""
+        self._by_email.clear()
+        self._by_username.clear()
+        for user_id in self._users:
+            fields = self._users.raw_fields(user_id, ('email', 'username'))
+            try:
+                self._claim(user_id, fields['email'], fields['username'])
+            except DuplicateKeyError as e:
+                print(f"Warning: user {user_id} not indexed: {e}")
+    
+    def _load_users(self) -> LazyModelMap:
+        """Load users from the storage backend (decoded on first access)"""
         try:
-            with open(self.storage_path, 'r') as f:
-                data = json.load(f)
-                return {
-                    user_id: User.from_dict(user_data)
-                    for user_id, user_data in data.items()
-                }
+            records = self._store.load_records()
+            users = LazyModelMap(records, self._decode)
         except Exception as e:
             print(f"Error loading users: {e}")
-            return {}
+            return LazyModelMap({}, User.from_dict)
+        
+        if self._store.needs_compaction:
+            self._users = users
+            self._save_users()
+        
+        return users
+    
+    @staticmethod
+    def _decode(user_data: Dict) -> User:
+        return User.from_dict(user_data)
+    
+    def _sync(self):
+        """Replay user changes made by other worker processes"""
+        if not self._store.shared:
+            return
+        with self._lock:
+            ops = self._store.changes()
+            if ops is not None:
+                for op in ops:
+                    old, new = apply_model_op(self._users, op, User.to_dict, self._decode)
+                    entity_versions.bump(f"user:{op['key']}")
+                    if old is not None:
+                        self._unindex(old)
+                    if new is not None:
+                        try:
+                            self._index(new)
+                        except DuplicateKeyError as e:
+                            print(f"Warning: user {new.id} not indexed: {e}")
+                return
+        
+        # Another process compacted past our position - start over. Loaded
+        # outside self._lock: writers hold the collection lock first
+        users = self._load_users()
+        with self._lock:
+            self._users = users
+            self._build_indexes()
+            entity_versions.reset()
+    
+    @contextmanager
+    def _writing(self):
+        """
+        Cross-process critical section: catch up, then check, mutate and persist
+
+        The collection lock is taken before self._lock, so readers on the
+        event loop never wait while a writer waits for another process.
+        """
+        with self._store.lock(), self._lock:
+            self._sync()
+            yield
     
     def _save_users(self):
-        """Save users to disk"""
+        """Write a full snapshot (compacts the JSON journal)"""
         try:
-            temp_path = f"{self.storage_path}.tmp"
-            with open(temp_path, 'w') as f:
-                data = {
-                    user_id: user.to_dict()
-                    for user_id, user in self._users.items()
-                }
-                json.dump(data, f, indent=2)
-            os.replace(temp_path, self.storage_path)
+            self._store.compact(self._users.snapshot(User.to_dict))
         except Exception as e:
             print(f"Error saving users: {e}")
     
+    # Dataclass fields update_user may set (the ID is the storage key)
+    _UPDATABLE = frozenset(f.name for f in fields(User)) - {'id'}
+    _INT_FIELDS = frozenset({'max_services', 'max_requests_per_day', 'max_memory_mb'})
+    _OPTIONAL_STR_FIELDS = frozenset({'avatar_url', 'github_token'})
+    
+    @classmethod
+    def _coerce_updates(cls, updates: Dict) -> Dict:
+        """
+        Updatable fields of updates, converted to the types User holds
+        
+        Raises:
+            ValueError: a value has the wrong type or is not a plan tier
+        """
+        changes = {}
+        for key, value in updates.items():
+            if key not in cls._UPDATABLE:
+                continue
+            if key == 'plan_tier':
+                # PlanTier(PlanTier.PRO) is PlanTier.PRO; unknown strings raise
+                try:
+                    value = PlanTier(value)
+                except ValueError:
+                    raise ValueError(
+                        f"plan_tier must be one of {[tier.value for tier in PlanTier]}"
+                    )
+            elif key in cls._INT_FIELDS:
+                if isinstance(value, bool) or not isinstance(value, int):
+                    raise ValueError(f"{key} must be an integer")
+            elif key == 'settings':
+                if not isinstance(value, dict):
+                    raise ValueError("settings must be an object")
+            elif key in ('email', 'username'):
+                if not isinstance(value, str) or not value.strip():
+                    raise ValueError(f"{key} must be a non-empty string")
+            elif not isinstance(value, str) and not (
+                value is None and key in cls._OPTIONAL_STR_FIELDS
+            ):
+                raise ValueError(f"{key} must be a string")
+            changes[key] = value
+        return changes
+    
+    @staticmethod
+    def _email_key(email: str) -> str:
+        """Emails are unique case-insensitively"""
+        return email.strip().lower()
+    
+    def _index(self, user: User):
+        """Claim user's email and username in the unique indexes"""
+        self._claim(user.id, user.email, user.username)
+    
+    def _claim(self, user_id: str, email: str, username: str):
+        email_key = self._email_key(email)
+        self._by_email.check(email_key, user_id)
+        self._by_username.check(username, user_id)
+        self._by_email.add(email_key, user_id)
+        self._by_username.add(username, user_id)
+    
+    def _unindex(self, user: User):
+        """Release user's email and username"""
+        self._by_email.remove(self._email_key(user.email), user.id)
+        self._by_username.remove(user.username, user.id)
+    
+    def _persist(self, op: Dict):
+        """Record a mutation in storage, compacting when the journal grows large"""
+        entity_versions.bump(f"user:{op['key']}")
+        try:
+            self._store.apply(op)
+        except Exception as e:
+            print(f"Error persisting user change: {e}")
+            return
+        
+        if self._store.needs_compaction:
+            self._save_users()
+    
     # ========================================================================
     # User Operations
     # ========================================================================
@@ -73,7 +222,12 @@ class UserService:
         avatar_url: Optional[str] = None,
         github_token: Optional[str] = None
     ) -> User:
-        """Create new user"""
+        """
+        Create new user
+        
+        Raises:
+            DuplicateKeyError: email or username already belongs to another user
+        """
         user_id = f"user_{uuid.uuid4().hex[:12]}"
         
         user = User(
@@ -85,45 +239,75 @@ class UserService:
             github_token=github_token
         )
         
-        self._users[user_id] = user
-        self._save_users()
+        with self._writing():
+            self._index(user)
+            self._users[user_id] = user
+            self._persist(put_op(user_id, user.to_dict()))
         
         return user
     
     def get_user(self, user_id: str) -> Optional[User]:
         """Get user by ID"""
+        self._sync()
         return self._users.get(user_id)
     
     def get_user_by_email(self, email: str) -> Optional[User]:
-        """Get user by email"""
-        for user in self._users.values():
-            if user.email == email:
-                return user
-        return None
+        """Get user by email (case-insensitive)"""
+        self._sync()
+        user_id = self._by_email.get(self._email_key(email))
+        return self._users.get(user_id) if user_id else None
     
     def get_user_by_username(self, username: str) -> Optional[User]:
         """Get user by username"""
-        for user in self._users.values():
-            if user.username == username:
-                return user
-        return None
+        self._sync()
+        user_id = self._by_username.get(username)
+        return self._users.get(user_id) if user_id else None
     
     def update_user(
         self,
         user_id: str,
         **updates
     ) -> Optional[User]:
-        """Update user fields"""
-        user = self._users.get(user_id)
-        if not user:
-            return None
+        """
+        Update user fields
         
-        for key, value in updates.items():
-            if hasattr(user, key):
-                setattr(user, key, value)
+        Changes are made on a copy that replaces the stored user only once
+        its email and username are claimed and its record is built, so a
+        failed update leaves the user and the indexes as they were.
         
-        self._save_users()
-        return user
+        Raises:
+            ValueError: a value does not fit the field (e.g. an unknown
+                plan tier or a non-integer limit)
+            DuplicateKeyError: new email or username belongs to another user
+        """
+        changes = self._coerce_updates(updates)
+        
+        with self._writing():
+            user = self._users.get(user_id)
+            if not user:
+                return None
+            
+            # Validate unique fields before touching anything
+            if 'email' in changes:
+                self._by_email.check(self._email_key(changes['email']), user_id)
+            if 'username' in changes:
+                self._by_username.check(changes['username'], user_id)
+            
+            if not changes:
+                return user
+            updated = replace(user, **changes)
+            data = updated.to_dict()
+            
+            self._unindex(user)
+            try:
+                self._index(updated)
+            except Exception:
+                self._index(user)
+                raise
+            self._users[user_id] = updated
+            
+            self._persist(patch_op(user_id, {key: data[key] for key in changes}))
+        return updated
     
     def update_github_token(self, user_id: str, token: str) -> Optional[User]:
         """Update GitHub token"""
@@ -131,38 +315,47 @@ class UserService:
     
     def upgrade_user_plan(self, user_id: str, tier: PlanTier) -> Optional[User]:
         """Upgrade user to new plan tier"""
-        user = self._users.get(user_id)
-        if not user:
-            return None
-        
-        if tier == PlanTier.PRO:
-            user.upgrade_to_pro()
-        elif tier == PlanTier.ENTERPRISE:
-            user.plan_tier = PlanTier.ENTERPRISE
-            user.max_services = -1  # unlimited
-            user.max_requests_per_day = -1
-            user.max_memory_mb = 8192
-        
-        self._save_users()
+        with self._writing():
+            user = self._users.get(user_id)
+            if not user:
+                return None
+            
+            if tier == PlanTier.PRO:
+                user.upgrade_to_pro()
+            elif tier == PlanTier.ENTERPRISE:
+                user.plan_tier = PlanTier.ENTERPRISE
+                user.max_services = -1  # unlimited
+                user.max_requests_per_day = -1
+                user.max_memory_mb = 8192
+            
+            data = user.to_dict()
+            self._persist(patch_op(user_id, {
+                key: data[key]
+                for key in ('plan_tier', 'max_services', 'max_requests_per_day', 'max_memory_mb')
+            }))
         return user
     
     def update_settings(self, user_id: str, settings: Dict) -> Optional[User]:
         """Update user settings"""
-        user = self._users.get(user_id)
-        if not user:
-            return None
-        
-        user.settings.update(settings)
-        self._save_users()
+        with self._writing():
+            user = self._users.get(user_id)
+            if not user:
+                return None
+            
+            # Replace rather than mutate: earlier to_dict() results share the old dict
+            user.settings = {**user.settings, **settings}
+            self._persist(patch_op(user_id, {'settings': user.settings}))
         return user
     
     def delete_user(self, user_id: str) -> bool:
         """Delete user"""
-        if user_id in self._users:
-            del self._users[user_id]
-            self._save_users()
-            return True
-        return False
+        with self._writing():
+            user = self._users.pop(user_id, None)
+            if user is None:
+                return False
+            self._unindex(user)
+            self._persist(delete_op(user_id))
+        return True
 
 
 # Global instance
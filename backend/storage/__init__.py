@@ -0,0 +1,121 @@
+"""
+ServerGem Storage - Persistence primitives for the service layer
+
+Backend selection (environment):
+- STORAGE_BACKEND: "json" (default) or "sqlite"
+- STORAGE_DIR: directory for JSON collections (default "data")
+- SQLITE_PATH: database file for the SQLite backend (default "data/servergem.db")
+- SNAPSHOT_FORMAT: "binary" (default, lazily decoded .snap files) or "json"
+  for JSON collection snapshots; convert with python -m storage.convert
+- STORAGE_MULTIPROCESS: "true" when several worker processes share the
+  data directory (default: on when WEB_CONCURRENCY > 1)
+- STORAGE_SYNC_WRITES: "true" to do disk I/O on the calling thread instead
+  of the dedicated storage thread (scripts, debugging)
+"""
+
+import os
+from typing import Optional
+
+from .journal import (
+    JournaledStore,
+    apply_op,
+    put_op,
+    patch_op,
+    append_op,
+    delete_op,
+)
+from .base import Collection, StorageBackend
+from .snapshot import SnapshotReader, LazyRecords, load_snapshot, write_snapshot
+from .lazy import LazyModelMap
+from .json_backend import JsonBackend, JsonCollection
+from .sqlite_backend import SqliteBackend, SqliteCollection
+from .schema import COLLECTION_INDEXES, usage_key, normalize_usage_records
+from .indexes import SecondaryIndex, SortedIndex, UniqueIndex, DuplicateKeyError
+from .event_store import EventStore
+from .event_archive import EventArchive
+from .log_store import BuildLogStore
+from .writer import StorageWriter, InlineWriter, QueuedCollection
+from .shared import FileLock, file_stamp, apply_model_op
+
+
+_backend: Optional[StorageBackend] = None
+_writer: Optional[InlineWriter] = None
+
+
+def multiprocess_enabled() -> bool:
+    """True when storage must coordinate with other worker processes"""
+    default = "true" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "false"
+    return os.getenv("STORAGE_MULTIPROCESS", default).lower() == "true"
+
+
+def get_storage_writer() -> InlineWriter:
+    """Process-wide storage I/O thread shared by all services"""
+    global _writer
+    if _writer is None:
+        if os.getenv("STORAGE_SYNC_WRITES", "false").lower() == "true":
+            _writer = InlineWriter()
+        else:
+            _writer = StorageWriter()
+    return _writer
+
+
+def create_storage_backend(kind: Optional[str] = None, writer: Optional[InlineWriter] = None) -> StorageBackend:
+    """Build a backend from an explicit kind or the environment"""
+    kind = (kind or os.getenv("STORAGE_BACKEND", "json")).lower()
+    shared = multiprocess_enabled()
+
+    if kind == "json":
+        return JsonBackend(os.getenv("STORAGE_DIR", "data"), writer=writer, shared=shared)
+    if kind == "sqlite":
+        return SqliteBackend(os.getenv("SQLITE_PATH", "data/servergem.db"), writer=writer, shared=shared)
+
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def get_storage_backend() -> StorageBackend:
+    """Process-wide backend shared by all services"""
+    global _backend
+    if _backend is None:
+        _backend = create_storage_backend(writer=get_storage_writer())
+    return _backend
+
+
+__all__ = [
+    'JournaledStore',
+    'apply_op',
+    'put_op',
+    'patch_op',
+    'append_op',
+    'delete_op',
+    'Collection',
+    'StorageBackend',
+    'JsonBackend',
+    'JsonCollection',
+    'SqliteBackend',
+    'SqliteCollection',
+    'SnapshotReader',
+    'LazyRecords',
+    'load_snapshot',
+    'write_snapshot',
+    'LazyModelMap',
+    'COLLECTION_INDEXES',
+    'usage_key',
+    'normalize_usage_records',
+    'SecondaryIndex',
+    'SortedIndex',
+    'UniqueIndex',
+    'DuplicateKeyError',
+    'EventStore',
+    'EventArchive',
+    'BuildLogStore',
+    'StorageWriter',
+    'InlineWriter',
+    'QueuedCollection',
+    'FileLock',
+    'file_stamp',
+    'apply_model_op',
+    'multiprocess_enabled',
+    'create_storage_backend',
+    'get_storage_backend',
+    'get_storage_writer',
+]
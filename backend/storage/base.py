@@ -0,0 +1,140 @@
+"""
+Storage Backend Interface
+Pluggable persistence for the service layer
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, nullcontext
+from typing import Callable, Dict, List, Tuple, Any, Sequence, Optional, Union
+
+
+Records = Union[Dict[str, Dict[str, Any]], Callable[[], Dict[str, Dict[str, Any]]]]
+
+
+def resolve_records(records: Records) -> Dict[str, Dict[str, Any]]:
+    """Materialize a snapshot passed as a dict or as a builder callable"""
+    return records() if callable(records) else records
+
+
+class Collection(ABC):
+    """
+    A keyed set of JSON-compatible records
+
+    Services keep their working set in memory and hand every mutation to
+    the collection as a journal operation (see storage.journal). Backends
+    decide how that operation becomes durable.
+    """
+
+    name: str
+    indexes: Sequence[str] = ()
+    # True when several processes may write this collection concurrently
+    shared: bool = False
+
+    @abstractmethod
+    def load(self) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return (records, operations to replay on top of them)"""
+
+    @abstractmethod
+    def apply(self, op: Dict[str, Any]):
+        """Durably record one mutation"""
+
+    def apply_many(self, ops: List[Dict[str, Any]]):
+        """Durably record a batch of mutations"""
+        for op in ops:
+            self.apply(op)
+
+    def encode_op(self, op: Dict[str, Any]) -> Any:
+        """
+        Serialize an operation for apply_encoded()
+
+        Called on the caller's thread, so the storage thread only writes.
+        """
+        return op
+
+    def apply_encoded(self, encoded: List[Any]):
+        """Durably record a batch of operations from encode_op()"""
+        self.apply_many(encoded)
+
+    @property
+    def needs_compaction(self) -> bool:
+        """True when the caller should hand over a full snapshot"""
+        return False
+
+    def compact(self, records: "Records"):
+        """
+        Replace persisted state with a full snapshot
+
+        Args:
+            records: Snapshot dict, or a zero-arg callable building it (lets
+                the storage thread do the serialization work)
+        """
+
+    def lock(self):
+        """
+        Cross-process critical section for read-modify-write sequences
+
+        Services hold it around "sync, mutate, persist" so no other worker
+        process can write the collection in between. No-op unless shared.
+        """
+        return nullcontext()
+
+    @asynccontextmanager
+    async def locked(self):
+        """lock() for coroutines: waiting for other processes does not block the event loop"""
+        with self.lock():
+            yield
+
+    def changes(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Operations other processes applied since load() / the last call
+
+        Returns:
+            Operations to replay on the caller's working set ([] if none),
+            or None when the caller must reload the whole collection
+        """
+        return []
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Read a single record straight from storage"""
+        return self.load_records().get(key)
+
+    def find(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        """Read all records whose field equals value"""
+        return [r for r in self.load_records().values() if r.get(field) == value]
+
+    def load_records(self) -> Dict[str, Dict[str, Any]]:
+        """Return records with pending operations already applied"""
+        from .journal import apply_op
+
+        records, ops = self.load()
+        for op in ops:
+            apply_op(records, op)
+        return records
+
+    def close(self):
+        """Release file handles / connections"""
+
+
+class StorageBackend(ABC):
+    """Factory for collections sharing one storage medium"""
+
+    name: str
+
+    @abstractmethod
+    def collection(
+        self,
+        name: str,
+        indexes: Sequence[str] = (),
+        path: Optional[str] = None
+    ) -> Collection:
+        """
+        Open (or create) a collection
+
+        Args:
+            name: Collection name (table / file stem)
+            indexes: Record fields that queries filter on
+            path: Explicit file location, for file-based backends
+        """
+
+    def close(self):
+        """Close every open collection"""
@@ -0,0 +1,90 @@
+"""
+Snapshot Converter
+JSON import / export for binary collection snapshots
+
+Usage:
+    python -m storage.convert export data/deployments.json -o deployments.export.json
+    python -m storage.convert import deployments.export.json -o data/deployments.snap
+    python -m storage.convert inspect data/deployments.snap
+"""
+
+import argparse
+import json
+import os
+from typing import Optional, Sequence
+
+from .journal import JournaledStore
+from .schema import COLLECTION_INDEXES
+from .snapshot import CODEC_JSON, CODEC_MSGPACK, SnapshotReader, write_snapshot
+
+
+
+def export_json(collection_path: str, output_path: str) -> int:
+    """
+    Write a collection's current state (snapshot + journal) as a JSON object
+
+    Returns:
+        Number of records exported
+    """
+    store = JournaledStore(collection_path)
+    records = store.load_records()
+    store.close()
+
+    with open(output_path, 'w') as f:
+        json.dump({key: records[key] for key in records}, f, indent=2)
+    return len(records)
+
+
+def import_json(
+    json_path: str,
+    snapshot_path: str,
+    index_fields: Sequence[str] = (),
+    codec: Optional[int] = None
+) -> int:
+    """
+    Convert a JSON object of records into a binary snapshot
+
+    Returns:
+        Number of records imported
+    """
+    with open(json_path, 'r') as f:
+        records = json.load(f)
+    write_snapshot(snapshot_path, records, index_fields, codec)
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert ServerGem snapshots to and from JSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="Dump a collection (snapshot + journal) as JSON")
+    export_cmd.add_argument("collection", help="Collection path, e.g. data/deployments.json")
+    export_cmd.add_argument("-o", "--output", required=True, help="JSON file to write")
+
+    import_cmd = sub.add_parser("import", help="Build a binary snapshot from a JSON file")
+    import_cmd.add_argument("source", help="JSON object of records keyed by id")
+    import_cmd.add_argument("-o", "--output", required=True, help="Snapshot file, e.g. data/deployments.snap")
+    import_cmd.add_argument("--json-payloads", action="store_true", help="Encode records as JSON instead of msgpack")
+
+    inspect_cmd = sub.add_parser("inspect", help="Show snapshot header and index summary")
+    inspect_cmd.add_argument("snapshot")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        count = export_json(args.collection, args.output)
+        print(f"✅ Exported {count} records to {args.output}")
+    elif args.command == "import":
+        name = os.path.splitext(os.path.basename(args.output))[0]
+        codec = CODEC_JSON if args.json_payloads else None
+        count = import_json(args.source, args.output, COLLECTION_INDEXES.get(name, ()), codec)
+        print(f"✅ Imported {count} records into {args.output}")
+    else:
+        reader = SnapshotReader(args.snapshot)
+        codec = "msgpack" if reader.codec == CODEC_MSGPACK else "json"
+        print(f"version={reader.version} codec={codec} records={len(reader)} fields={reader.fields}")
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Deployment Event Archive
+Compressed, time-partitioned segments for events expired from the hot log
+"""
+
+import gzip
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+
+class EventArchive:
+    """
+    Cold storage for deployment events
+
+    Layout (for root data/deployment_events_archive):
+    - YYYY-MM.jsonl.gz: events from that month; each compaction appends
+      one gzip member, so segments are never rewritten
+    - manifest.json: per deployment, the number of archived events, the
+      last archived event id and the segments holding its events
+
+    Features:
+    - Archived events of a deployment always form a prefix of its history,
+      so positions stay stable when events move out of the hot log
+    - Reads decompress only the segments that mention the deployment
+    - Re-archiving after a crash mid-compaction is detected via last_id;
+      `compacting` records the hot log size while a compaction is in
+      flight so the event store can finish it on the next start
+    """
+
+    def __init__(self, root: str = "data/deployment_events_archive"):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self._deployments: Dict[str, Dict[str, Any]] = {}
+        self.compacting: Optional[int] = None
+        # (deployment_id, archived count) -> events, for paging through one history
+        self._cache: Optional[tuple] = None
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+            self._deployments = manifest.get("deployments", {})
+            self.compacting = manifest.get("compacting")
+
+    def segment_path(self, segment: str) -> str:
+        return os.path.join(self.root, f"{segment}.jsonl.gz")
+
+    def count(self, deployment_id: str) -> int:
+        """Number of archived events for a deployment"""
+        entry = self._deployments.get(deployment_id)
+        return entry["count"] if entry else 0
+
+    # ========================================================================
+    # Writes
+    # ========================================================================
+
+    def add(self, events: List[Dict[str, Any]], compacting: Optional[int] = None) -> int:
+        """
+        Archive expired events
+
+        Args:
+            events: Oldest events of each deployment, in log order
+            compacting: Size of the hot log they are being removed from;
+                cleared by finish_compaction() once the log is rewritten
+
+        Returns:
+            Number of events written (already archived ones are skipped)
+        """
+        by_deployment: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            by_deployment.setdefault(event['deployment_id'], []).append(event)
+
+        by_segment: Dict[str, List[Dict[str, Any]]] = {}
+        for deployment_id, dep_events in by_deployment.items():
+            entry = self._deployments.setdefault(
+                deployment_id, {"count": 0, "last_id": None, "segments": []}
+            )
+            # A crash after archiving but before the hot log was rewritten
+            # leaves the same prefix expired again - skip what we already have
+            ids = [event['id'] for event in dep_events]
+            if entry["last_id"] in ids:
+                dep_events = dep_events[ids.index(entry["last_id"]) + 1:]
+            if not dep_events:
+                continue
+
+            for event in dep_events:
+                segment = event.get('timestamp', '')[:7] or "undated"
+                by_segment.setdefault(segment, []).append(event)
+                if segment not in entry["segments"]:
+                    entry["segments"].append(segment)
+            entry["count"] += len(dep_events)
+            entry["last_id"] = dep_events[-1]['id']
+
+        self.compacting = compacting
+        if not by_segment:
+            self._save_manifest()
+            return 0
+
+        os.makedirs(self.root, exist_ok=True)
+        written = 0
+        for segment, seg_events in by_segment.items():
+            with gzip.open(self.segment_path(segment), 'ab') as f:
+                f.write(b''.join(
+                    (json.dumps(event, separators=(',', ':')) + "\n").encode('utf-8')
+                    for event in seg_events
+                ))
+            written += len(seg_events)
+
+        self._save_manifest()
+        self._cache = None
+        return written
+
+    def finish_compaction(self):
+        """The hot log no longer holds the archived events"""
+        if self.compacting is not None:
+            self.compacting = None
+            self._save_manifest()
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(
+                {"deployments": self._deployments, "compacting": self.compacting},
+                f,
+                separators=(',', ':')
+            )
+        os.replace(temp_path, self.manifest_path)
+
+    # ========================================================================
+    # Reads
+    # ========================================================================
+
+    def read(
+        self,
+        deployment_id: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Archived events of a deployment, oldest first
+
+        Args:
+            deployment_id: Deployment to read
+            since / until: Optional inclusive ISO timestamp bounds
+        """
+        entry = self._deployments.get(deployment_id)
+        if not entry:
+            return []
+
+        cache_key = (deployment_id, entry["count"])
+        if self._cache and self._cache[0] == cache_key:
+            events = self._cache[1]
+        else:
+            events = []
+            seen = set()
+            needle = f'"deployment_id":{json.dumps(deployment_id)}'.encode('utf-8')
+            for segment in sorted(entry["segments"]):
+                path = self.segment_path(segment)
+                if not os.path.exists(path):
+                    continue
+                with gzip.open(path, 'rb') as f:
+                    for raw in f:
+                        if needle not in raw:
+                            continue
+                        event = json.loads(raw)
+                        # A segment write that never reached the manifest gets repeated
+                        if event['id'] not in seen:
+                            seen.add(event['id'])
+                            events.append(event)
+            self._cache = (cache_key, events)
+
+        if since is None and until is None:
+            return list(events)
+        return [
+            event for event in events
+            if (since is None or event.get('timestamp', '') >= since)
+            and (until is None or event.get('timestamp', '') <= until)
+        ]
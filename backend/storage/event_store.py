@@ -0,0 +1,539 @@
+"""
+Deployment Event Store
+Append-only event log with a per-deployment on-disk offset index
+"""
+
+import json
+import os
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple, Any, Optional
+
+from .event_archive import EventArchive
+from .shared import FileLock, file_stamp
+
+
+def _index_columns(event: Dict[str, Any]) -> Tuple[str, str]:
+    """Timestamp and type of an event as space-free index columns"""
+    return _timestamp_column(event.get('timestamp')), _type_column(event.get('event_type'))
+
+
+def _timestamp_column(timestamp: Optional[str]) -> str:
+    return (timestamp or '-').replace(' ', 'T')
+
+
+def _type_column(event_type: Optional[str]) -> str:
+    return (event_type or '-').replace(' ', '_')
+
+
+class EventStore:
+    """
+    Per-deployment, time-ordered event storage
+
+    Files (for base path data/deployment_events):
+    - deployment_events.log: one JSON event per line, append-only
+    - deployment_events.idx: "<deployment_id> <offset> <length> <timestamp> <type>"
+      per event, so type / time filters never touch the log
+
+    Features:
+    - O(1) appends (one line to each file)
+    - Only the index is read at startup, never the events themselves
+    - Latest-N reads seek directly to the needed lines
+    - Cursor paging towards older events, continuing into the archive,
+      with optional event type and time range filters
+    - One-time import of the legacy deployment_events.json array
+    - Retention: the hot log keeps at most retention_per_deployment events
+      per deployment and nothing older than retention_days; compaction
+      moves the rest to an EventArchive. It runs every compact_every
+      appends, and on open, read or append whenever the oldest hot event
+      has passed retention_days (checked at most once a minute), so an
+      idle store still ages out
+
+    Cursors are absolute positions in a deployment's history (archived
+    events first), so they stay valid across compactions.
+
+    shared=True (several worker processes): appends and compaction hold
+    <base>.lock, every operation first indexes what other processes
+    appended, and a compaction elsewhere (<base>.gen) triggers a reload.
+    """
+
+    # Minimum seconds between checks for events past retention_days
+    RETENTION_CHECK_SECONDS = 60
+
+    def __init__(
+        self,
+        base_path: str = "data/deployment_events",
+        retention_per_deployment: int = None,
+        retention_days: float = None,
+        compact_every: int = None,
+        shared: bool = False
+    ):
+        self.log_path = f"{base_path}.log"
+        self.index_path = f"{base_path}.idx"
+        self.legacy_path = f"{base_path}.json"
+        self.gen_path = f"{base_path}.gen"
+        self.archive = EventArchive(f"{base_path}_archive")
+        self.shared = shared
+        self._file_lock = FileLock(f"{base_path}.lock") if shared else None
+
+        # 0 disables a limit
+        if retention_per_deployment is None:
+            retention_per_deployment = int(os.getenv("EVENT_RETENTION_PER_DEPLOYMENT", "200"))
+        if retention_days is None:
+            retention_days = float(os.getenv("EVENT_RETENTION_DAYS", "30"))
+        self.retention_per_deployment = retention_per_deployment
+        self.retention_days = retention_days
+        self.compact_every = compact_every or int(os.getenv("EVENT_COMPACT_EVERY", "5000"))
+
+        # deployment_id -> [(offset, length, timestamp, event_type), ...] oldest first
+        self._offsets: Dict[str, List[Tuple[int, int, str, str]]] = {}
+        self._log_file = None
+        self._index_file = None
+        self._log_end = 0
+        self._index_size = 0
+        self._gen_stamp = None
+        self._appends_since_compaction = 0
+        self._retention_checked_at = float('-inf')
+        # Oldest hot timestamp a retention pass could not move (out-of-order events)
+        self._retention_stuck: Optional[str] = None
+
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock():
+            fresh = not os.path.exists(self.log_path)
+            self._gen_stamp = file_stamp(self.gen_path)
+            self._load_index()
+            if self.archive.compacting is not None:
+                self._finish_interrupted_compaction()
+            if fresh:
+                self._import_legacy()
+            elif self.hot_count >= self.compact_every:
+                self.compact()
+            else:
+                self._expire_if_due()
+
+    def _lock(self):
+        return self._file_lock if self._file_lock is not None else nullcontext()
+
+    # ========================================================================
+    # Startup
+    # ========================================================================
+
+    def _load_index(self):
+        """Read the offset index and index any log tail it is missing"""
+        legacy = self._read_index()
+
+        log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        if log_size > self._log_end and not legacy:
+            self._reindex_tail(log_size)
+        elif log_size < self._log_end or legacy:
+            # Index points past the log (log lost / truncated), or predates
+            # timestamp / type columns - rebuild it
+            self._offsets.clear()
+            self._log_end = 0
+            open(self.index_path, 'w').close()
+            self._index_size = 0
+            self._reindex_tail(log_size)
+
+    def _read_index(self) -> bool:
+        """
+        Index lines from _index_size on (complete lines only)
+
+        Returns:
+            True if the index has lines in the older 3-column format
+        """
+        if not os.path.exists(self.index_path):
+            return False
+        legacy = False
+        with open(self.index_path, 'rb') as f:
+            f.seek(self._index_size)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # another process is mid-append
+                self._index_size += len(line)
+                parts = line.decode('utf-8').split()
+                if len(parts) == 3:
+                    legacy = True
+                    continue
+                if len(parts) != 5:
+                    continue  # torn index line
+                deployment_id, offset, length = parts[0], int(parts[1]), int(parts[2])
+                self._offsets.setdefault(deployment_id, []).append(
+                    (offset, length, parts[3], parts[4])
+                )
+                self._log_end = max(self._log_end, offset + length)
+        return legacy
+
+    def _refresh(self):
+        """Pick up what other processes appended or compacted (shared mode)"""
+        if not self.shared:
+            return
+        stamp = file_stamp(self.gen_path)
+        if stamp != self._gen_stamp:
+            # Compacted elsewhere: offsets and archive manifest are stale
+            self.close()
+            self._offsets.clear()
+            self._log_end = 0
+            self._index_size = 0
+            self._gen_stamp = stamp
+            self.archive = EventArchive(self.archive.root)
+        self._read_index()
+
+    def _reindex_tail(self, log_size: int):
+        """Index events written to the log but not to the index (crash gap)"""
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_end)
+            offset = self._log_end
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    event = json.loads(raw)
+                except json.JSONDecodeError:
+                    break
+                self._index_event(event, offset, len(raw))
+                offset += len(raw)
+
+        # Drop any torn trailing bytes so future appends start on a clean line
+        if offset < log_size:
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(offset)
+        self._log_end = offset
+
+    def _finish_interrupted_compaction(self):
+        """A crash hit between archiving events and rewriting the hot log"""
+        if self.archive.compacting == self._log_end:
+            # Old log still in place - compact again (the archive skips
+            # events it already holds)
+            self.compact()
+        else:
+            self.archive.finish_compaction()
+
+    def _import_legacy(self):
+        """Move events from the original JSON array into the log"""
+        if not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, 'r') as f:
+                events = json.load(f)
+        except Exception as e:
+            print(f"Error loading legacy events: {e}")
+            return
+
+        for event in sorted(events, key=lambda e: e.get('timestamp', '')):
+            self.append(event)
+
+    # ========================================================================
+    # Writes
+    # ========================================================================
+
+    def _index_event(self, event: Dict[str, Any], offset: int, length: int):
+        if self._index_file is None:
+            self._index_file = open(self.index_path, 'a')
+        deployment_id = event['deployment_id']
+        timestamp, event_type = _index_columns(event)
+        line = f"{deployment_id} {offset} {length} {timestamp} {event_type}\n"
+        self._index_file.write(line)
+        self._index_file.flush()
+        self._index_size += len(line.encode('utf-8'))
+        self._offsets.setdefault(deployment_id, []).append((offset, length, timestamp, event_type))
+
+    @staticmethod
+    def encode(event: Dict[str, Any]) -> Tuple[bytes, str, str, str]:
+        """(log line, deployment_id, timestamp, type) for append_encoded()"""
+        line = (json.dumps(event, separators=(',', ':')) + "\n").encode('utf-8')
+        return (line, event['deployment_id']) + _index_columns(event)
+
+    def append(self, event: Dict[str, Any]):
+        """Append one event (must carry deployment_id)"""
+        self.append_encoded([self.encode(event)])
+
+    def append_encoded(self, entries: List[Tuple[bytes, str, str, str]]):
+        """Append events from encode() - one write to the log and one to the index"""
+        with self._lock():
+            self._refresh()
+            self._append(entries)
+
+        self._appends_since_compaction += len(entries)
+        if self._appends_since_compaction >= self.compact_every:
+            self.compact()
+        else:
+            self._expire_if_due()
+
+    def _append(self, entries: List[Tuple[bytes, str, str, str]]):
+        if self._log_file is None:
+            self._log_file = open(self.log_path, 'ab')
+        if self._index_file is None:
+            self._index_file = open(self.index_path, 'a')
+
+        index_lines = []
+        offset = self._log_end
+        for line, deployment_id, timestamp, event_type in entries:
+            index_lines.append(f"{deployment_id} {offset} {len(line)} {timestamp} {event_type}\n")
+            self._offsets.setdefault(deployment_id, []).append((offset, len(line), timestamp, event_type))
+            offset += len(line)
+
+        self._log_file.write(b''.join(line for line, *_ in entries))
+        self._log_file.flush()
+        self._log_end = offset
+
+        index = ''.join(index_lines)
+        self._index_file.write(index)
+        self._index_file.flush()
+        self._index_size += len(index.encode('utf-8'))
+
+    # ========================================================================
+    # Retention
+    # ========================================================================
+
+    def compact(self) -> int:
+        """
+        Move expired events to the archive and rewrite the hot log
+
+        Crash safety: events are archived (with a compaction marker) before
+        the log is replaced, and the index is removed before the swap so a
+        torn compaction just triggers a full reindex; startup finishes any
+        compaction the marker shows was interrupted.
+
+        Returns:
+            Number of events moved out of the hot log
+        """
+        with self._lock():
+            self._refresh()
+            moved = self._compact()
+            if moved and self.shared:
+                self._write_generation()
+            return moved
+
+    def _oldest_hot_timestamp(self) -> Optional[str]:
+        return min(
+            (positions[0][2] for positions in self._offsets.values() if positions),
+            default=None
+        )
+
+    def _expire_if_due(self) -> int:
+        """
+        Compact when the oldest hot event has passed retention_days
+
+        Checked at most every RETENTION_CHECK_SECONDS; the check itself
+        only looks at each deployment's first index entry.
+        """
+        if not self.retention_days:
+            return 0
+        now = time.monotonic()
+        if now - self._retention_checked_at < self.RETENTION_CHECK_SECONDS:
+            return 0
+        self._retention_checked_at = now
+
+        oldest = self._oldest_hot_timestamp()
+        if oldest is None or oldest == self._retention_stuck:
+            return 0
+        cutoff = (datetime.utcnow() - timedelta(days=self.retention_days)).isoformat()
+        if oldest >= cutoff:
+            return 0
+
+        moved = self.compact()
+        if not moved:
+            self._retention_stuck = oldest
+        return moved
+
+    def _write_generation(self):
+        """Tell other processes their offsets are stale"""
+        temp_path = f"{self.gen_path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(datetime.utcnow().isoformat())
+        os.replace(temp_path, self.gen_path)
+        self._gen_stamp = file_stamp(self.gen_path)
+
+    def _compact(self) -> int:
+        self._appends_since_compaction = 0
+        if self._log_end == 0:
+            return 0
+
+        cutoff = None
+        if self.retention_days:
+            cutoff = (datetime.utcnow() - timedelta(days=self.retention_days)).isoformat()
+        limit = self.retention_per_deployment
+
+        self.close()
+        temp_log, temp_index = f"{self.log_path}.tmp", f"{self.index_path}.tmp"
+        seen: Dict[str, int] = {}
+        retained = set()
+        expired: List[Dict[str, Any]] = []
+        offsets: Dict[str, List[Tuple[int, int, str, str]]] = {}
+        offset = 0
+
+        with open(self.log_path, 'rb') as src, \
+                open(temp_log, 'wb') as log_out, \
+                open(temp_index, 'w') as index_out:
+            for raw in src:
+                if not raw.endswith(b"\n"):
+                    break
+                event = json.loads(raw)
+                deployment_id = event['deployment_id']
+                position = seen.get(deployment_id, 0)
+                seen[deployment_id] = position + 1
+
+                # Expire only a prefix of each deployment's history
+                if deployment_id not in retained:
+                    too_many = limit and position < len(self._offsets[deployment_id]) - limit
+                    too_old = cutoff is not None and event.get('timestamp', '') < cutoff
+                    if too_many or too_old:
+                        expired.append(event)
+                        continue
+                    retained.add(deployment_id)
+
+                timestamp, event_type = _index_columns(event)
+                log_out.write(raw)
+                index_out.write(f"{deployment_id} {offset} {len(raw)} {timestamp} {event_type}\n")
+                offsets.setdefault(deployment_id, []).append(
+                    (offset, len(raw), timestamp, event_type)
+                )
+                offset += len(raw)
+
+        if not expired:
+            os.remove(temp_log)
+            os.remove(temp_index)
+            return 0
+
+        self.archive.add(expired, compacting=self._log_end)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        os.replace(temp_log, self.log_path)
+        os.replace(temp_index, self.index_path)
+        self.archive.finish_compaction()
+
+        self._offsets = offsets
+        self._log_end = offset
+        self._index_size = os.path.getsize(self.index_path)
+        return len(expired)
+
+    # ========================================================================
+    # Reads
+    # ========================================================================
+
+    @property
+    def hot_count(self) -> int:
+        """Events currently held in the hot log"""
+        return sum(len(positions) for positions in self._offsets.values())
+
+    def count(self, deployment_id: str) -> int:
+        """Number of events stored for a deployment (hot + archived)"""
+        self._refresh()
+        self._expire_if_due()
+        return self.archive.count(deployment_id) + len(self._offsets.get(deployment_id, ()))
+
+    def latest(
+        self,
+        deployment_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        event_type: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Newest-first page of events
+
+        Args:
+            deployment_id: Deployment to read
+            limit: Page size
+            cursor: Opaque cursor from a previous page (None = newest)
+            event_type: Only events of this type
+            since / until: Optional inclusive ISO timestamp bounds
+
+        Returns:
+            (events newest first, cursor for the next older page or None);
+            pages older than the hot log are read from the archive
+        """
+        self._refresh()
+        self._expire_if_due()
+        positions = self._offsets.get(deployment_id, [])
+        archived = self.archive.count(deployment_id)
+        end = archived + len(positions)
+        if cursor is not None:
+            try:
+                end = max(0, min(int(cursor), end))
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {cursor}")
+        limit = max(limit, 0)
+
+        # Filters compare against the index columns, so normalize them alike
+        if event_type is not None:
+            event_type = _type_column(event_type)
+        if since is not None:
+            since = _timestamp_column(since)
+        if until is not None:
+            until = _timestamp_column(until)
+
+        if event_type is None and since is None and until is None:
+            start = max(0, end - limit)
+            events = []
+            if start < archived:
+                events.extend(self.archive.read(deployment_id)[start:min(end, archived)])
+            if end > archived:
+                events.extend(self._read(positions[max(start - archived, 0):end - archived]))
+            events.reverse()
+            return events, (str(start) if start > 0 else None)
+
+        # Walk back from the cursor: hot events are filtered on index
+        # columns alone, the archive is read only if the walk reaches it
+        hits: List[Tuple[int, Any]] = []
+        history = None
+        position = end
+        past_since = False
+        while position > 0 and len(hits) < limit:
+            position -= 1
+            if position >= archived:
+                entry = positions[position - archived]
+                timestamp, kind = entry[2], entry[3]
+            else:
+                if history is None:
+                    history = self.archive.read(deployment_id)
+                entry = history[position]
+                timestamp, kind = _index_columns(entry)
+            if since is not None and timestamp < since:
+                past_since = True
+                break
+            if (event_type is None or kind == event_type) and (until is None or timestamp <= until):
+                hits.append((position, entry))
+
+        decoded = iter(self._read([entry for _, entry in hits if isinstance(entry, tuple)]))
+        events = [next(decoded) if isinstance(entry, tuple) else entry for _, entry in hits]
+
+        more = len(hits) == limit and position > 0 and not past_since
+        return events, (str(position) if more else None)
+
+    def _read(self, positions: List[Tuple]) -> List[Dict[str, Any]]:
+        """Decode events at the given log positions"""
+        if not positions:
+            return []
+        events = []
+        with open(self.log_path, 'rb') as f:
+            for offset, length, *_ in positions:
+                f.seek(offset)
+                events.append(json.loads(f.read(length)))
+        return events
+
+    def archived(
+        self,
+        deployment_id: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Archived events of a deployment in a time range, oldest first"""
+        self._refresh()
+        self._expire_if_due()
+        return self.archive.read(deployment_id, since, until)
+
+    def close(self):
+        for handle in (self._log_file, self._index_file):
+            if handle is not None:
+                handle.close()
+        self._log_file = None
+        self._index_file = None
@@ -0,0 +1,168 @@
+"""
+In-memory Secondary Indexes
+Keep lookups by non-primary fields O(1) instead of full scans
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class SecondaryIndex:
+    """
+    Non-unique index: field value -> ordered set of record ids
+
+    Ids are kept in insertion order (a dict used as an ordered set), so
+    results come back in creation order like a scan of the primary map.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Dict[str, None]] = {}
+
+    def add(self, value: Hashable, record_id: str):
+        """Index record_id under value"""
+        self._entries.setdefault(value, {})[record_id] = None
+
+    def remove(self, value: Hashable, record_id: str):
+        """Drop record_id from value's bucket"""
+        bucket = self._entries.get(value)
+        if bucket is None:
+            return
+        bucket.pop(record_id, None)
+        if not bucket:
+            del self._entries[value]
+
+    def move(self, old_value: Hashable, new_value: Hashable, record_id: str):
+        """Re-index a record whose field changed"""
+        if old_value == new_value:
+            return
+        self.remove(old_value, record_id)
+        self.add(new_value, record_id)
+
+    def get(self, value: Hashable) -> List[str]:
+        """Ids indexed under value, oldest first"""
+        return list(self._entries.get(value, ()))
+
+    def count(self, value: Hashable) -> int:
+        """Number of ids indexed under value - O(1)"""
+        return len(self._entries.get(value, ()))
+
+    def clear(self):
+        self._entries.clear()
+
+
+class SortedIndex:
+    """
+    Ordered index: partition -> (sort value, record id) pairs kept sorted
+
+    Features:
+    - Range bounds and page starts found by binary search
+    - Pages walk the list in either direction from a (value, id) position,
+      so a cursor page costs O(log n + page size) however deep it is
+    - Record id breaks ties, so every position is unique and stable
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, List[Tuple[Any, str]]] = {}
+
+    def add(self, partition: Hashable, value: Any, record_id: str):
+        """Index record_id under partition at sort position value"""
+        insort(self._entries.setdefault(partition, []), (value, record_id))
+
+    def remove(self, partition: Hashable, value: Any, record_id: str):
+        """Drop record_id from partition"""
+        entries = self._entries.get(partition)
+        if not entries:
+            return
+        i = bisect_left(entries, (value, record_id))
+        if i < len(entries) and entries[i] == (value, record_id):
+            del entries[i]
+        if not entries:
+            del self._entries[partition]
+
+    def range(
+        self,
+        partition: Hashable,
+        low: Any = None,
+        high: Any = None,
+        after: Optional[Tuple[Any, str]] = None,
+        descending: bool = False
+    ):
+        """
+        Iterate (value, id) pairs of a partition in sort order
+
+        Args:
+            partition: Partition to walk
+            low / high: Optional inclusive bounds on the sort value
+            after: Resume strictly past this (value, id) position
+            descending: Walk from the highest value down
+        """
+        entries = self._entries.get(partition)
+        if not entries:
+            return
+        start = 0 if low is None else bisect_left(entries, (low,))
+        # (high, chr(0x10ffff)) sorts after every (high, id) pair
+        stop = len(entries) if high is None else bisect_right(entries, (high, chr(0x10ffff)))
+
+        if descending:
+            if after is not None:
+                stop = min(stop, bisect_left(entries, tuple(after)))
+            for i in range(stop - 1, start - 1, -1):
+                yield entries[i]
+        else:
+            if after is not None:
+                start = max(start, bisect_right(entries, tuple(after)))
+            for i in range(start, stop):
+                yield entries[i]
+
+    def count(self, partition: Hashable) -> int:
+        """Number of ids in a partition - O(1)"""
+        return len(self._entries.get(partition, ()))
+
+    def clear(self):
+        self._entries.clear()
+
+
+class DuplicateKeyError(ValueError):
+    """Raised when a write would violate a unique index"""
+
+    def __init__(self, field: str, value: Hashable, existing_id: str):
+        super().__init__(f"{field} already in use: {value}")
+        self.field = field
+        self.value = value
+        self.existing_id = existing_id
+
+
+class UniqueIndex:
+    """
+    Unique index: field value -> single record id
+
+    Callers check() before mutating and add() after, under the same lock,
+    so two writers can never claim the same value.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self._entries: Dict[Hashable, str] = {}
+
+    def check(self, value: Hashable, record_id: str = None):
+        """Raise DuplicateKeyError if value belongs to another record"""
+        owner = self._entries.get(value)
+        if owner is not None and owner != record_id:
+            raise DuplicateKeyError(self.field, value, owner)
+
+    def add(self, value: Hashable, record_id: str):
+        """Claim value for record_id"""
+        self.check(value, record_id)
+        self._entries[value] = record_id
+
+    def remove(self, value: Hashable, record_id: str):
+        """Release value if record_id owns it"""
+        if self._entries.get(value) == record_id:
+            del self._entries[value]
+
+    def get(self, value: Hashable) -> Optional[str]:
+        """Id owning value, or None - O(1)"""
+        return self._entries.get(value)
+
+    def clear(self):
+        self._entries.clear()
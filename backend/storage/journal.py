@@ -0,0 +1,455 @@
+"""
+Append-only Journal Storage
+Snapshot + write-ahead log persistence for record collections
+"""
+
+import json
+import os
+import threading
+from contextlib import nullcontext
+from typing import Dict, List, Tuple, Any, Sequence, Optional
+
+from .shared import FileLock, file_stamp
+from .snapshot import load_snapshot, write_snapshot
+
+
+# ============================================================================
+# Journal Operations
+# ============================================================================
+#
+# Every mutation is recorded as one small JSON object. All operations are
+# idempotent so replaying a journal on top of a snapshot that already
+# contains it (crash between snapshot write and journal truncate) is safe:
+#
+#   {"op": "put",    "key": k, "record": {...}}          full record
+#   {"op": "patch",  "key": k, "fields": {...}}          shallow field update
+#   {"op": "append", "key": k, "field": f, "value": v, "index": n}
+#   {"op": "delete", "key": k}
+
+def put_op(key: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a full-record write operation"""
+    return {"op": "put", "key": key, "record": record}
+
+
+def patch_op(key: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a partial field update operation"""
+    return {"op": "patch", "key": key, "fields": fields}
+
+
+def append_op(key: str, field: str, value: Any, index: int) -> Dict[str, Any]:
+    """Build a list append operation (index makes replay idempotent)"""
+    return {"op": "append", "key": key, "field": field, "value": value, "index": index}
+
+
+def delete_op(key: str) -> Dict[str, Any]:
+    """Build a delete operation"""
+    return {"op": "delete", "key": key}
+
+
+def apply_op(records: Dict[str, Dict[str, Any]], op: Dict[str, Any]):
+    """Apply a journal operation to a dict of raw records in place"""
+    kind = op.get("op")
+    key = op.get("key")
+
+    if kind == "put":
+        records[key] = op["record"]
+    elif kind == "patch":
+        if key in records:
+            records[key].update(op["fields"])
+    elif kind == "append":
+        record = records.get(key)
+        if record is not None:
+            values = record.setdefault(op["field"], [])
+            # Skip entries already present in the snapshot
+            if len(values) <= op["index"]:
+                values.append(op["value"])
+    elif kind == "delete":
+        records.pop(key, None)
+
+
+class JournaledStore:
+    """
+    Snapshot + append-only journal persistence
+
+    Features:
+    - O(size of change) writes: one JSON line appended per mutation
+    - Periodic compaction of the journal into an atomic snapshot
+    - Startup rebuild from snapshot plus journal tail
+    - Torn trailing lines (crash mid-write) are ignored on replay
+    - Binary snapshots (<stem>.snap, see storage.snapshot) decoded lazily;
+      the JSON snapshot stays readable so existing data imports itself
+
+    snapshot_format (env SNAPSHOT_FORMAT) picks what compaction writes:
+    "binary" (default) or "json". Loading always uses whichever of the
+    two snapshot files is newer.
+
+    shared=True makes the store safe for several processes: writes hold
+    <stem>.lock, compaction builds the snapshot outside it and only takes
+    it to swap files and bump <stem>.gen, and changes() returns what other
+    processes journaled since we last looked.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: str,
+        journal_path: str = None,
+        compact_threshold: int = None,
+        fsync: bool = False,
+        snapshot_format: str = None,
+        index_fields: Sequence[str] = (),
+        shared: bool = False
+    ):
+        stem = os.path.splitext(snapshot_path)[0]
+        self.snapshot_path = snapshot_path
+        self.binary_path = f"{stem}.snap"
+        self.journal_path = journal_path or f"{stem}.journal"
+        self.gen_path = f"{stem}.gen"
+        self.compact_threshold = compact_threshold or int(
+            os.getenv("JOURNAL_COMPACT_THRESHOLD", "1000")
+        )
+        self.snapshot_format = (snapshot_format or os.getenv("SNAPSHOT_FORMAT", "binary")).lower()
+        if self.snapshot_format not in ("binary", "json"):
+            raise ValueError(f"Unknown snapshot format: {self.snapshot_format}")
+        self.index_fields = tuple(index_fields)
+        self.fsync = fsync
+        self._journal_file = None
+        self._pending_ops = 0
+        # Set when the snapshot on disk is not in snapshot_format yet
+        self._convert_pending = False
+        self._ensure_storage()
+
+        self.shared = shared
+        self._file_lock = FileLock(f"{stem}.lock") if shared else None
+        # Journal bytes (and snapshot generation) reflected in the caller's state
+        self._offset = 0
+        self._gen_stamp = None
+        # Guards _offset/_gen_stamp: changes() runs on the event loop while
+        # the storage thread appends and compacts
+        self._state_lock = threading.Lock()
+
+    def lock(self):
+        """Exclusive cross-process lock (no-op unless shared)"""
+        return self._file_lock if self._file_lock is not None else nullcontext()
+
+    def _ensure_storage(self):
+        """Create storage directory and empty snapshot if missing"""
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if self.snapshot_format == "json" and not os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'w') as f:
+                json.dump({}, f)
+
+    def _current_snapshot(self) -> str:
+        """'binary', 'json' or '' - whichever snapshot file was written last"""
+        mtimes = {}
+        for kind, path in (("binary", self.binary_path), ("json", self.snapshot_path)):
+            if os.path.exists(path):
+                mtimes[kind] = os.path.getmtime(path)
+        if not mtimes:
+            return ""
+        return max(mtimes, key=mtimes.get)
+
+    # ========================================================================
+    # Loading
+    # ========================================================================
+
+    def load(self) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Read snapshot and journal tail
+
+        Returns:
+            (snapshot records, journal operations not yet compacted); binary
+            snapshots come back as a lazily decoded LazyRecords mapping
+        """
+        with self.lock():
+            return self._load()
+
+    def _load(self) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        records, ops, gen_stamp, offset = self._read_state()
+        with self._state_lock:
+            self._gen_stamp, self._offset = gen_stamp, offset
+        self._pending_ops = len(ops)
+        return records, ops
+
+    def _read_state(self) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]], Any, int]:
+        """(snapshot records, journal ops, generation stamp, journal offset) as on disk"""
+        current = self._current_snapshot()
+        records = {}
+        gen_stamp = file_stamp(self.gen_path)
+        try:
+            if current == "binary":
+                records = load_snapshot(self.binary_path)
+            elif current == "json":
+                with open(self.snapshot_path, 'r') as f:
+                    records = json.load(f)
+        except Exception as e:
+            print(f"Error loading snapshot for {self.snapshot_path}: {e}")
+            records = {}
+
+        self._convert_pending = bool(current) and current != self.snapshot_format
+
+        ops, offset = self._read_journal()
+        return records, ops, gen_stamp, offset
+
+    def load_records(self) -> Dict[str, Dict[str, Any]]:
+        """Read snapshot and replay the journal into raw records"""
+        records, ops = self.load()
+        for op in ops:
+            apply_op(records, op)
+        return records
+
+    def _read_journal(self, start: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Read complete operations from the journal
+
+        Returns:
+            (operations, offset just past the last complete line)
+        """
+        ops = []
+        if not os.path.exists(self.journal_path):
+            return ops, 0
+
+        end = start
+        with open(self.journal_path, 'rb') as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # still being written (or torn) - read it next time
+                if line.strip():
+                    try:
+                        ops.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Torn write from a crash - everything after it is suspect
+                        print(f"Ignoring truncated journal entry in {self.journal_path}")
+                        break
+                end += len(line)
+        return ops, end
+
+    def changes(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Operations other processes journaled since the last load/changes()
+
+        Returns:
+            New operations ([] when nothing changed), or None when another
+            process compacted and the caller must reload everything
+        """
+        if not self.shared:
+            return []
+        with self._state_lock:
+            if file_stamp(self.gen_path) != self._gen_stamp:
+                return None
+            try:
+                size = os.path.getsize(self.journal_path)
+            except FileNotFoundError:
+                size = 0
+            if size == self._offset:
+                return []
+
+            ops, self._offset = self._read_journal(self._offset)
+            if file_stamp(self.gen_path) != self._gen_stamp:
+                return None  # compacted while we were reading
+            return ops
+
+    # ========================================================================
+    # Writing
+    # ========================================================================
+
+    @staticmethod
+    def encode(op: Dict[str, Any]) -> str:
+        """One journal line for an operation"""
+        return json.dumps(op, separators=(',', ':')) + "\n"
+
+    def append(self, op: Dict[str, Any]):
+        """Append one operation to the journal"""
+        self.append_lines([self.encode(op)])
+
+    def append_lines(self, lines: List[str]):
+        """Append operations already encoded by encode(), with one write"""
+        # Ops written inside the caller's own locked section are already in
+        # its state; queued ones are not, and are replayed by changes()
+        in_callers_section = self._file_lock is not None and self._file_lock.owned
+        with self.lock():
+            if self.shared and self._journal_file is not None and self._journal_replaced():
+                self._journal_file.close()
+                self._journal_file = None
+            if self._journal_file is None:
+                self._drop_torn_tail()
+                self._journal_file = open(self.journal_path, 'a')
+
+            before = os.fstat(self._journal_file.fileno()).st_size if self.shared else 0
+            self._journal_file.write(''.join(lines))
+            self._journal_file.flush()
+            if self.fsync:
+                os.fsync(self._journal_file.fileno())
+
+            if self.shared and in_callers_section:
+                with self._state_lock:
+                    if before == self._offset:
+                        # Caught up - our own ops need no replay. Otherwise
+                        # leave the offset so changes() returns the foreign
+                        # ops (and, harmlessly, these idempotent ones).
+                        self._offset = os.fstat(self._journal_file.fileno()).st_size
+
+        self._pending_ops += len(lines)
+
+    def _drop_torn_tail(self):
+        """
+        Cut a partial last line (crash mid-write) off the journal
+
+        Appending after it would glue the next operation onto the torn
+        line, and replay stops at the first line it cannot parse.
+        """
+        try:
+            f = open(self.journal_path, 'rb+')
+        except FileNotFoundError:
+            return
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 65536)
+                f.seek(start)
+                block = f.read(position - start)
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position != end:
+                print(f"Dropping truncated journal entry in {self.journal_path}")
+                f.truncate(position)
+
+    def _journal_replaced(self) -> bool:
+        """True when another process swapped in a new journal file"""
+        try:
+            return os.stat(self.journal_path).st_ino != os.fstat(self._journal_file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    @property
+    def needs_compaction(self) -> bool:
+        """True once the journal has grown past the compaction threshold
+        (or the snapshot still has to be converted to snapshot_format)"""
+        return self._convert_pending or self._pending_ops >= self.compact_threshold
+
+    def compact(self, records: Dict[str, Dict[str, Any]]):
+        """
+        Write a full snapshot and truncate the journal
+
+        Args:
+            records: Current state of every record, keyed by id (ignored
+                when shared - the snapshot is rebuilt from disk so other
+                processes' journal entries are never lost)
+        """
+        if self.shared:
+            self._compact_shared()
+            return
+        self._compact(records)
+
+    def _compact_shared(self):
+        """
+        Rebuild the snapshot from disk without holding the lock
+
+        Other processes keep appending while the snapshot is built. Only
+        the swap is locked: journal lines written meanwhile are carried into
+        a fresh journal, the generation is bumped, then both files are
+        renamed into place. The build is dropped if another process
+        compacted in the meantime.
+        """
+        with self.lock():
+            # Not mid-swap: files on disk match this generation
+            generation = file_stamp(self.gen_path)
+        records, ops, _, end = self._read_state()
+        for op in ops:
+            apply_op(records, op)
+        target = self.binary_path if self.snapshot_format == "binary" else self.snapshot_path
+        build_path = f"{target}.{os.getpid()}.build"
+        self._write_snapshot(records, build_path)
+
+        try:
+            with self.lock():
+                if file_stamp(self.gen_path) != generation:
+                    return  # compacted by another process meanwhile
+
+                tail = b""
+                if os.path.exists(self.journal_path):
+                    with open(self.journal_path, 'rb') as f:
+                        f.seek(end)
+                        tail = f.read()
+                with self._state_lock:
+                    caught_up = self._gen_stamp == generation and self._offset == end + len(tail)
+                tail = tail[:tail.rfind(b"\n") + 1]  # a torn last line dies with the old journal
+
+                journal_temp = f"{self.journal_path}.tmp"
+                with open(journal_temp, 'wb') as f:
+                    f.write(tail)
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+
+                # Generation first: a reader that sees the new files also
+                # sees the new stamp and reloads
+                self._write_generation()
+                os.replace(build_path, target)
+                os.replace(journal_temp, self.journal_path)
+
+                if self._journal_file is not None:
+                    self._journal_file.close()
+                    self._journal_file = None
+                self._convert_pending = False
+                self._pending_ops = tail.count(b"\n")
+                with self._state_lock:
+                    # A caller that missed foreign ops keeps its old stamp,
+                    # so its next changes() asks for a full reload
+                    if caught_up:
+                        self._gen_stamp = file_stamp(self.gen_path)
+                        self._offset = len(tail)
+        finally:
+            if os.path.exists(build_path):
+                os.remove(build_path)
+
+    def _write_generation(self):
+        try:
+            with open(self.gen_path, 'r') as f:
+                generation = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            generation = 0
+        temp_path = f"{self.gen_path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(str(generation + 1))
+        os.replace(temp_path, self.gen_path)
+
+    def _write_snapshot(self, records: Dict[str, Dict[str, Any]], path: str):
+        # Write to temp file first, then atomically rename
+        if self.snapshot_format == "binary":
+            write_snapshot(path, records, self.index_fields, fsync=self.fsync)
+        else:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(records, f, separators=(',', ':'))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(temp_path, path)
+
+    def _compact(self, records: Dict[str, Dict[str, Any]]):
+        # If we crash before truncating, replay is idempotent
+        target = self.binary_path if self.snapshot_format == "binary" else self.snapshot_path
+        self._write_snapshot(records, target)
+        self._convert_pending = False
+
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+        open(self.journal_path, 'w').close()
+        self._pending_ops = 0
+
+    def close(self):
+        """Close the journal file handle"""
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+        if self._file_lock is not None:
+            self._file_lock.close()
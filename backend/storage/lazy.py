@@ -0,0 +1,96 @@
+"""
+Lazy Model Map
+Service working sets that decode stored records only when touched
+"""
+
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Mapping, Sequence
+
+
+class LazyModelMap(MutableMapping):
+    """
+    id -> model mapping over raw records
+
+    Features:
+    - Startup only collects keys; a record becomes a model on first access
+    - Indexed fields are read from the snapshot index when available
+    - snapshot() hands untouched records back in their stored form, so
+      compaction never decodes what the service never used
+    """
+
+    def __init__(self, raw: Mapping[str, Dict[str, Any]], decode: Callable[[Dict[str, Any]], Any]):
+        self._raw = raw
+        self._decode = decode
+        # LazyRecords.peek() decodes without caching the raw dict
+        self._read_raw = getattr(raw, 'peek', raw.__getitem__)
+        self._keys: Dict[str, None] = dict.fromkeys(raw)
+        self._models: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        model = self._models.get(key)
+        if model is None:
+            if key not in self._keys:
+                raise KeyError(key)
+            model = self._decode(self._read_raw(key))
+            self._models[key] = model
+        return model
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self._keys:
+            return default
+        return self[key]
+
+    def __setitem__(self, key: str, model: Any):
+        self._keys[key] = None
+        self._models[key] = model
+
+    def __delitem__(self, key: str):
+        del self._keys[key]
+        self._models.pop(key, None)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def decoded_count(self) -> int:
+        """Number of records materialized as models so far"""
+        return len(self._models)
+
+    def raw_fields(self, key: str, names: Sequence[str]) -> Dict[str, Any]:
+        """
+        Stored values of the given fields for a record not yet decoded
+
+        Uses the snapshot offset index when it covers the fields, so
+        rebuilding secondary indexes at startup decodes nothing.
+        """
+        index_fields = getattr(self._raw, 'index_fields', None)
+        if index_fields is not None:
+            values = index_fields(key)
+            if all(name in values for name in names):
+                return {name: values[name] for name in names}
+        record = self._read_raw(key)
+        return {name: record.get(name) for name in names}
+
+    def snapshot(self, encode: Callable[[Any], Dict[str, Any]]) -> Callable[[], Dict[str, Dict[str, Any]]]:
+        """
+        Capture the current set of records for compaction
+
+        Returns a zero-arg builder (see storage.base.Records): decoded
+        models are encoded with encode(), untouched records are copied from
+        the raw mapping - both on whichever thread runs the builder.
+        """
+        entries = [(key, self._models.get(key)) for key in self._keys]
+
+        def build() -> Dict[str, Dict[str, Any]]:
+            return {
+                key: encode(model) if model is not None else self._read_raw(key)
+                for key, model in entries
+            }
+
+        return build
@@ -0,0 +1,261 @@
+"""
+Build Log Store
+Append-optimized, chunked per-deployment build logs with range reads
+"""
+
+import gzip
+import json
+import os
+import shutil
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+
+from .shared import FileLock, file_stamp
+
+
+class _DeploymentLog:
+    """Chunk bookkeeping for one deployment's log directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        # Line counts of sealed chunks, in order
+        self.sealed: List[int] = []
+        self.compressed: List[bool] = []
+        self.active_lines = 0
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                meta = json.load(f)
+            self.sealed = meta.get("sealed", [])
+            self.compressed = meta.get("compressed", [False] * len(self.sealed))
+
+        active = self.chunk_path(len(self.sealed))
+        if os.path.exists(active):
+            with open(active, 'rb') as f:
+                self.active_lines = sum(1 for _ in f)
+        self.loaded_stamp = self.stamp()
+
+    def stamp(self):
+        """Changes whenever any process appends, seals or deletes"""
+        return file_stamp(self.index_path), file_stamp(self.chunk_path(len(self.sealed)))
+
+    @property
+    def total(self) -> int:
+        return sum(self.sealed) + self.active_lines
+
+    def chunk_path(self, number: int, compressed: bool = False) -> str:
+        name = f"{number:06d}.log"
+        return os.path.join(self.directory, name + (".gz" if compressed else ""))
+
+    def save_index(self):
+        """Atomically persist sealed chunk metadata"""
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({"sealed": self.sealed, "compressed": self.compressed}, f)
+        os.replace(temp_path, self.index_path)
+
+
+class BuildLogStore:
+    """
+    Per-deployment build log storage
+
+    Layout (data/build_logs/<deployment_id>/):
+    - 000000.log[.gz], 000001.log[.gz], ...: JSON-encoded line per entry
+    - index.json: line count (and compression flag) of each sealed chunk
+
+    Features:
+    - Appends touch only the active chunk
+    - Chunks rotate after chunk_lines entries and are gzip-compressed
+      when sealed (optional)
+    - offset/limit and tail reads open only the chunks they need
+    - Chunk bookkeeping is cached for the BUILD_LOG_CACHE_SIZE (default
+      256) most recently used deployments; reads of deployments without
+      a log directory are not cached
+    - shared=True (several worker processes): writes hold <root>/.lock and
+      chunk bookkeeping is re-read when another process changed the files
+    """
+
+    def __init__(
+        self,
+        root: str = "data/build_logs",
+        chunk_lines: int = None,
+        compress: bool = None,
+        shared: bool = False,
+        cache_size: int = None
+    ):
+        self.root = root
+        self.chunk_lines = chunk_lines or int(os.getenv("BUILD_LOG_CHUNK_LINES", "1000"))
+        if compress is None:
+            compress = os.getenv("BUILD_LOG_COMPRESS", "true").lower() == "true"
+        self.compress = compress
+        self.cache_size = cache_size or int(os.getenv("BUILD_LOG_CACHE_SIZE", "256"))
+        self._logs: "OrderedDict[str, _DeploymentLog]" = OrderedDict()
+        os.makedirs(root, exist_ok=True)
+        self.shared = shared
+        self._file_lock = FileLock(os.path.join(root, ".lock")) if shared else None
+
+    def _lock(self):
+        return self._file_lock if self._file_lock is not None else nullcontext()
+
+    def _log(self, deployment_id: str, create: bool = False) -> _DeploymentLog:
+        """
+        Chunk bookkeeping for a deployment
+
+        With create=False (reads) a deployment that has no log directory
+        gets an empty, uncached log, so lookups of unknown IDs don't fill
+        the cache.
+        """
+        log = self._logs.get(deployment_id)
+        if log is not None and self.shared and log.stamp() != log.loaded_stamp:
+            log = None  # written by another process since we cached it
+        if log is not None:
+            self._logs.move_to_end(deployment_id)
+            return log
+
+        if os.sep in deployment_id or deployment_id in ('.', '..'):
+            raise ValueError(f"Invalid deployment id: {deployment_id}")
+        directory = os.path.join(self.root, deployment_id)
+        log = _DeploymentLog(directory)
+        if create or os.path.isdir(directory):
+            self._logs[deployment_id] = log
+            while len(self._logs) > self.cache_size:
+                self._logs.popitem(last=False)
+        return log
+
+    # ========================================================================
+    # Writes
+    # ========================================================================
+
+    def append(self, deployment_id: str, line: str):
+        """Append one log line"""
+        self.append_many(deployment_id, [line])
+
+    def append_many(self, deployment_id: str, lines: List[str]):
+        """Append lines, rotating chunks as they fill up"""
+        self.append_batches([(deployment_id, self.encode_lines(lines))])
+
+    @staticmethod
+    def encode_lines(lines: List[str]) -> List[str]:
+        """Chunk file lines for append_batches() (JSON string + newline each)"""
+        return [json.dumps(line) + "\n" for line in lines]
+
+    def append_batches(self, batches: List[Tuple[str, List[str]]]):
+        """
+        Append (deployment_id, encode_lines(...)) batches
+
+        Consecutive batches are merged per deployment, so each one costs a
+        single write to its active chunk.
+        """
+        merged: Dict[str, List[str]] = {}
+        for deployment_id, encoded in batches:
+            merged.setdefault(deployment_id, []).extend(encoded)
+
+        with self._lock():
+            for deployment_id, encoded in merged.items():
+                if not encoded:
+                    continue
+                log = self._log(deployment_id, create=True)
+                self._append_locked(log, encoded)
+                if self.shared:
+                    log.loaded_stamp = log.stamp()
+
+    def _append_locked(self, log: _DeploymentLog, encoded: List[str]):
+        os.makedirs(log.directory, exist_ok=True)
+
+        remaining = encoded
+        while remaining:
+            room = self.chunk_lines - log.active_lines
+            batch, remaining = remaining[:room], remaining[room:]
+
+            with open(log.chunk_path(len(log.sealed)), 'a') as f:
+                f.write(''.join(batch))
+            log.active_lines += len(batch)
+
+            if log.active_lines >= self.chunk_lines:
+                self._seal(log)
+
+    def _seal(self, log: _DeploymentLog):
+        """Close the active chunk (compressing it) and start a new one"""
+        number = len(log.sealed)
+        path = log.chunk_path(number)
+
+        if self.compress:
+            with open(path, 'rb') as src, gzip.open(log.chunk_path(number, True), 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+
+        log.sealed.append(log.active_lines)
+        log.compressed.append(self.compress)
+        log.active_lines = 0
+        log.save_index()
+
+        if self.compress:
+            os.remove(path)
+
+    def delete(self, deployment_id: str):
+        """Remove all logs for a deployment"""
+        with self._lock():
+            log = self._logs.pop(deployment_id, None)
+            directory = log.directory if log else os.path.join(self.root, deployment_id)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    # ========================================================================
+    # Reads
+    # ========================================================================
+
+    def count(self, deployment_id: str) -> int:
+        """Total number of lines logged for a deployment"""
+        return self._log(deployment_id).total
+
+    def read(self, deployment_id: str, offset: int = 0, limit: Optional[int] = 100) -> List[str]:
+        """
+        Read a range of log lines
+
+        Args:
+            deployment_id: Deployment to read
+            offset: Index of the first line (0-based)
+            limit: Maximum number of lines (None = to the end)
+        """
+        log = self._log(deployment_id)
+        offset = max(offset, 0)
+        end = log.total if limit is None else min(log.total, offset + max(limit, 0))
+        if offset >= end:
+            return []
+
+        lines = []
+        chunk_counts = log.sealed + [log.active_lines]
+        chunk_start = 0
+
+        for number, count in enumerate(chunk_counts):
+            chunk_end = chunk_start + count
+            if chunk_end > offset and chunk_start < end:
+                compressed = number < len(log.sealed) and log.compressed[number]
+                lines.extend(self._read_chunk(
+                    log.chunk_path(number, compressed),
+                    compressed,
+                    max(offset - chunk_start, 0),
+                    min(end, chunk_end) - chunk_start
+                ))
+            if chunk_end >= end:
+                break
+            chunk_start = chunk_end
+
+        return lines
+
+    def tail(self, deployment_id: str, lines: int = 100) -> List[str]:
+        """Read the last N log lines"""
+        total = self.count(deployment_id)
+        return self.read(deployment_id, max(total - lines, 0), lines)
+
+    def _read_chunk(self, path: str, compressed: bool, start: int, stop: int) -> List[str]:
+        """Decode lines [start, stop) of one chunk"""
+        opener = gzip.open if compressed else open
+        lines = []
+        with opener(path, 'rt') as f:
+            for i, raw in enumerate(f):
+                if i >= stop:
+                    break
+                if i >= start:
+                    lines.append(json.loads(raw))
+        return lines
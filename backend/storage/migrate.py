@@ -0,0 +1,83 @@
+"""
+One-shot Storage Migrator
+Copy data/*.json collections into the SQLite backend
+
+Usage:
+    python -m storage.migrate --data-dir data --db data/servergem.db
+"""
+
+import argparse
+import os
+from typing import Dict
+
+from .journal import JournaledStore, put_op
+from .sqlite_backend import SqliteBackend
+from .schema import COLLECTION_INDEXES, normalize_usage_records
+
+
+def migrate_json_to_sqlite(
+    data_dir: str = "data",
+    db_path: str = "data/servergem.db",
+    overwrite: bool = False
+) -> Dict[str, int]:
+    """
+    Import every file collection (JSON/binary snapshot + journal) into SQLite
+
+    Args:
+        data_dir: Directory holding deployments.json, users.json, usage.json
+        db_path: Target SQLite database
+        overwrite: Replace existing rows instead of upserting into them
+
+    Returns:
+        Number of records migrated per collection
+    """
+    backend = SqliteBackend(db_path)
+    counts = {}
+
+    try:
+        for name, indexes in COLLECTION_INDEXES.items():
+            path = os.path.join(data_dir, f"{name}.json")
+            # A collection never compacted has only its journal
+            if not any(
+                os.path.exists(os.path.join(data_dir, f"{name}{ext}"))
+                for ext in (".json", ".snap", ".journal")
+            ):
+                counts[name] = 0
+                continue
+
+            store = JournaledStore(path)
+            records = store.load_records()
+            store.close()
+
+            if name == 'usage':
+                records = normalize_usage_records(records)
+
+            collection = backend.collection(name, indexes)
+            if overwrite:
+                collection.compact(records)
+            else:
+                collection.apply_many([
+                    put_op(key, record) for key, record in records.items()
+                ])
+            counts[name] = len(records)
+    finally:
+        backend.close()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate ServerGem JSON data to SQLite")
+    parser.add_argument("--data-dir", default="data", help="Directory with the JSON files")
+    parser.add_argument("--db", default="data/servergem.db", help="Target SQLite database")
+    parser.add_argument("--overwrite", action="store_true", help="Replace existing rows")
+    args = parser.parse_args()
+
+    counts = migrate_json_to_sqlite(args.data_dir, args.db, args.overwrite)
+    for name, count in counts.items():
+        print(f"✅ {name}: {count} records")
+    print(f"Set STORAGE_BACKEND=sqlite SQLITE_PATH={args.db} to use the migrated data")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Collection Schema
+Names and indexed fields of every persisted collection
+"""
+
+from typing import Dict, Any
+
+
+# collection name -> record fields that lookups filter on
+COLLECTION_INDEXES = {
+    'deployments': ('user_id', 'status', 'region', 'created_at', 'updated_at'),
+    'users': ('email', 'username'),
+    'usage': ('user_id', 'date'),
+}
+
+
+def usage_key(user_id: str, date: str) -> str:
+    """Record key for one user's usage on one day"""
+    return f"{user_id}:{date}"
+
+
+def normalize_usage_records(records: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Flatten legacy usage data
+
+    The original usage.json nested metrics as {user_id: {date: metrics}};
+    collections store one record per (user, day) keyed by usage_key().
+    """
+    flat = {}
+    for key, value in records.items():
+        if 'date' in value and 'user_id' in value:
+            flat[key] = value
+            continue
+        for date, metrics in value.items():
+            flat[usage_key(metrics.get('user_id', key), date)] = metrics
+    return flat
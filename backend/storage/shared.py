@@ -0,0 +1,130 @@
+"""
+Cross-process Coordination
+File locks and change replay for running several worker processes
+"""
+
+import asyncio
+import os
+import threading
+from typing import Any, Callable, Dict, MutableMapping, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows - locks only serialize threads of one process
+    fcntl = None
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a file
+
+    Features:
+    - flock() based, so the OS releases it if the process dies
+    - Re-entrant: nested `with lock:` blocks in one process are free
+    - Threads of one process serialize on an internal condition first
+    - Held by an asyncio task when taken on an event loop thread, else by
+      the thread, so other coroutines on the loop never share it
+    - acquire(owner=...) lets a worker thread wait for the lock on the
+      owner's behalf (see QueuedCollection.locked); the owner then
+      re-enters it freely and releases it itself
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._cond = threading.Condition()
+        self._depth = 0
+        self._owner: Any = None
+        self._fd: Optional[int] = None
+
+    @staticmethod
+    def current_owner() -> Any:
+        """The running asyncio task, or the thread ident outside a task"""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:  # no event loop running in this thread
+            task = None
+        return task if task is not None else threading.get_ident()
+
+    @property
+    def owned(self) -> bool:
+        """True when the calling task (or thread) holds the lock"""
+        return self._depth > 0 and self._owner == self.current_owner()
+
+    def acquire(self, owner: Any = None):
+        owner = self.current_owner() if owner is None else owner
+        with self._cond:
+            while self._depth and self._owner != owner:
+                self._cond.wait()
+            if self._depth == 0:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX)
+                self._owner = owner
+            self._depth += 1
+
+    def release(self):
+        with self._cond:
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                self._cond.notify()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def close(self):
+        if self._fd is not None and self._depth == 0:
+            os.close(self._fd)
+            self._fd = None
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    """(inode, size, mtime) of a file, None if missing - changes on every atomic replace"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def apply_model_op(
+    models: MutableMapping[str, Any],
+    op: Dict[str, Any],
+    encode: Callable[[Any], Dict[str, Any]],
+    decode: Callable[[Dict[str, Any]], Any]
+) -> Tuple[Any, Any]:
+    """
+    Apply a journal operation written by another process to a model map
+
+    Returns:
+        (model before, model after) - either may be None
+    """
+    kind = op.get("op")
+    key = op.get("key")
+    old = models.get(key)
+
+    if kind == "put":
+        new = decode(dict(op["record"]))
+    elif kind == "patch":
+        if old is None:
+            return None, None
+        data = encode(old)
+        data.update(op["fields"])
+        new = decode(data)
+    elif kind == "delete":
+        if old is not None:
+            del models[key]
+        return old, None
+    else:
+        # append ops only touched legacy embedded lists
+        return old, old
+
+    models[key] = new
+    return old, new
@@ -0,0 +1,229 @@
+"""
+Binary Snapshot Format
+Compact, versioned collection snapshots with lazily decoded records
+
+Layout (little endian):
+    header   magic "SGSNAP", version u16, codec u8, pad, count u64, index offset u64
+    records  one encoded payload per record, back to back
+    index    encoded {"fields": [...], "entries": [[key, offset, length, [values]], ...]}
+
+The index carries each record's indexed field values, so services can
+rebuild their secondary indexes without decoding a single record.
+
+JSON stays the import / export format (see storage.convert).
+"""
+
+import json
+import mmap
+import os
+import struct
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import msgpack
+except ImportError:  # JSON payloads are used instead
+    msgpack = None
+
+
+MAGIC = b"SGSNAP"
+VERSION = 1
+HEADER = struct.Struct("<6sHBxQQ")
+
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+
+
+def default_codec() -> int:
+    """msgpack when installed, compact JSON otherwise"""
+    return CODEC_MSGPACK if msgpack is not None else CODEC_JSON
+
+
+def _encoder(codec: int) -> Callable[[Any], bytes]:
+    if codec == CODEC_MSGPACK:
+        return lambda obj: msgpack.packb(obj, use_bin_type=True)
+    return lambda obj: json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def _decoder(codec: int) -> Callable[[bytes], Any]:
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Snapshot is msgpack-encoded but msgpack is not installed")
+        return lambda data: msgpack.unpackb(data, raw=False)
+    return json.loads
+
+
+# ============================================================================
+# Writing
+# ============================================================================
+
+def write_snapshot(
+    path: str,
+    records: Dict[str, Dict[str, Any]],
+    index_fields: Sequence[str] = (),
+    codec: Optional[int] = None,
+    fsync: bool = False
+):
+    """
+    Atomically write records as a binary snapshot
+
+    Args:
+        path: Target file (replaced via a temp file + rename)
+        records: Raw records keyed by id
+        index_fields: Record fields copied into the offset index
+        codec: CODEC_JSON or CODEC_MSGPACK (default: best available)
+        fsync: fsync the file before the rename
+    """
+    codec = default_codec() if codec is None else codec
+    encode = _encoder(codec)
+    index_fields = list(index_fields)
+    entries = []
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(b"\0" * HEADER.size)
+        offset = HEADER.size
+        for key, record in records.items():
+            payload = encode(record)
+            f.write(payload)
+            entries.append([key, offset, len(payload), [record.get(name) for name in index_fields]])
+            offset += len(payload)
+
+        f.write(encode({"fields": index_fields, "entries": entries}))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, codec, len(entries), offset))
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+
+    os.replace(temp_path, path)
+
+
+# ============================================================================
+# Reading
+# ============================================================================
+
+class SnapshotReader:
+    """
+    Memory-mapped view of a binary snapshot
+
+    Opening reads only the header and the offset index; record payloads
+    are decoded one at a time by read().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, codec, count, index_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a ServerGem snapshot")
+        if version > VERSION:
+            raise ValueError(f"{path} has unsupported snapshot version {version}")
+
+        self.version = version
+        self.codec = codec
+        self._decode = _decoder(codec)
+
+        index = self._decode(self._mmap[index_offset:])
+        self.fields: List[str] = index["fields"]
+        # key -> (offset, length, indexed field values)
+        self._entries: Dict[str, Tuple[int, int, List[Any]]] = {
+            key: (offset, length, values)
+            for key, offset, length, values in index["entries"]
+        }
+        if len(self._entries) != count:
+            raise ValueError(f"{path} index is corrupt ({len(self._entries)} of {count} entries)")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def index_fields(self, key: str) -> Dict[str, Any]:
+        """Indexed field values of a record, without decoding it"""
+        return dict(zip(self.fields, self._entries[key][2]))
+
+    def read(self, key: str) -> Dict[str, Any]:
+        """Decode one record"""
+        offset, length, _ = self._entries[key]
+        return self._decode(self._mmap[offset:offset + length])
+
+    def close(self):
+        self._mmap.close()
+
+
+class LazyRecords(MutableMapping):
+    """
+    Raw records backed by a snapshot, decoded on first access
+
+    Behaves like the dict JournaledStore.load() used to return, so journal
+    operations replay on top of it unchanged: records touched by replay
+    are decoded and kept, everything else stays encoded in the snapshot.
+    """
+
+    def __init__(self, reader: SnapshotReader):
+        self._reader = reader
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._added: Dict[str, None] = {}
+        self._deleted = set()
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        record = self._cache.get(key)
+        if record is None:
+            record = self.peek(key)
+            self._cache[key] = record
+        return record
+
+    def peek(self, key: str) -> Dict[str, Any]:
+        """Read a record without keeping the decoded copy"""
+        record = self._cache.get(key)
+        if record is not None:
+            return record
+        if key in self._deleted or key not in self._reader:
+            raise KeyError(key)
+        return self._reader.read(key)
+
+    def __setitem__(self, key: str, record: Dict[str, Any]):
+        self._cache[key] = record
+        self._deleted.discard(key)
+        if key not in self._reader:
+            self._added[key] = None
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        self._cache.pop(key, None)
+        self._added.pop(key, None)
+        if key in self._reader:
+            self._deleted.add(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._added or (key in self._reader and key not in self._deleted)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._reader.keys():
+            if key not in self._deleted:
+                yield key
+        yield from list(self._added)
+
+    def __len__(self) -> int:
+        return len(self._reader) - len(self._deleted) + len(self._added)
+
+    def index_fields(self, key: str) -> Dict[str, Any]:
+        """Indexed field values of a record, decoding only if it changed since the snapshot"""
+        record = self._cache.get(key)
+        if record is None and key in self:
+            return self._reader.index_fields(key)
+        record = self[key]
+        return {name: record.get(name) for name in self._reader.fields}
+
+
+def load_snapshot(path: str) -> LazyRecords:
+    """Open a binary snapshot as a lazily decoded record mapping"""
+    return LazyRecords(SnapshotReader(path))
@@ -0,0 +1,301 @@
+"""
+SQLite Storage Backend
+Embedded, indexed storage for deployments, users and usage
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import nullcontext
+from typing import Dict, List, Tuple, Any, Sequence, Optional
+
+from .base import Collection, StorageBackend, Records, resolve_records
+from .journal import put_op, delete_op
+from .shared import FileLock
+from .writer import QueuedCollection
+
+
+# Change feed rows kept for lagging processes (older ones force a reload)
+CHANGE_LOG_RETAIN = 10000
+
+
+def _index_value(value: Any) -> Any:
+    """Normalize a record field for an indexed column"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+class SqliteCollection(Collection):
+    """
+    One table per collection
+
+    Schema: key TEXT PRIMARY KEY, data TEXT (JSON record), plus one
+    indexed column per declared index field, kept in sync on every write.
+
+    With a file_lock (several worker processes) every write also records
+    the changed key in the shared _changes table, which changes() reads
+    to tell other processes what to refresh.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        conn: sqlite3.Connection,
+        lock: threading.RLock,
+        indexes: Sequence[str] = (),
+        file_lock: Optional[FileLock] = None
+    ):
+        if not name.isidentifier():
+            raise ValueError(f"Invalid collection name: {name}")
+        for column in indexes:
+            if not column.isidentifier() or column in ('key', 'data'):
+                raise ValueError(f"Invalid index column: {column}")
+
+        self.name = name
+        self.indexes = tuple(indexes)
+        self._conn = conn
+        self._lock = lock
+        self._file_lock = file_lock
+        self.shared = file_lock is not None
+        # Change feed position and the sequence numbers of our own writes
+        self._seq = 0
+        self._own_seqs = set()
+        self._writes = 0
+        self._create_schema()
+
+        # Statements are built once and reused; sqlite3 caches the
+        # compiled form keyed by SQL text.
+        columns = ', '.join(('key', 'data') + self.indexes)
+        placeholders = ', '.join('?' * (2 + len(self.indexes)))
+        self._sql_upsert = f"INSERT OR REPLACE INTO {name} ({columns}) VALUES ({placeholders})"
+        self._sql_get = f"SELECT data FROM {name} WHERE key = ?"
+        self._sql_delete = f"DELETE FROM {name} WHERE key = ?"
+        self._sql_all = f"SELECT key, data FROM {name}"
+
+    def _create_schema(self):
+        """Create table and indexes if missing"""
+        index_columns = ''.join(f", {column}" for column in self.indexes)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.name} "
+                f"(key TEXT PRIMARY KEY, data TEXT NOT NULL{index_columns})"
+            )
+            # Index fields added after the table was created get a column,
+            # backfilled from the stored JSON
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({self.name})")}
+            for column in self.indexes:
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE {self.name} ADD COLUMN {column}")
+                    self._conn.execute(
+                        f"UPDATE {self.name} SET {column} = json_extract(data, '$.{column}')"
+                    )
+            for column in self.indexes:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{self.name}_{column} "
+                    f"ON {self.name} ({column})"
+                )
+            if self.shared:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS _changes "
+                    "(seq INTEGER PRIMARY KEY AUTOINCREMENT, collection TEXT NOT NULL, key TEXT NOT NULL)"
+                )
+
+    def _row_params(self, key: str, record: Dict[str, Any]) -> Tuple:
+        return (key, json.dumps(record, separators=(',', ':'))) + tuple(
+            _index_value(record.get(column)) for column in self.indexes
+        )
+
+    # ========================================================================
+    # Reads
+    # ========================================================================
+
+    def load(self) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        with self._lock:
+            if self.shared:
+                # Read the feed position first: anything committed after it
+                # is refetched by changes(), never missed
+                self._seq = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM _changes"
+                ).fetchone()[0]
+                self._own_seqs.clear()
+            rows = self._conn.execute(self._sql_all).fetchall()
+        return {key: json.loads(data) for key, data in rows}, []
+
+    def lock(self):
+        return self._file_lock if self._file_lock is not None else nullcontext()
+
+    def changes(self) -> Optional[List[Dict[str, Any]]]:
+        if not self.shared:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, key FROM _changes WHERE seq > ? AND collection = ? ORDER BY seq",
+                (self._seq, self.name)
+            ).fetchall()
+            if not rows:
+                return []
+            oldest = self._conn.execute("SELECT MIN(seq) FROM _changes").fetchone()[0]
+
+            lagging = oldest is not None and oldest > self._seq + 1
+            self._seq = rows[-1][0]
+            if lagging:
+                return None  # feed was trimmed past our position
+
+            keys = {}
+            for seq, key in rows:
+                if seq in self._own_seqs:
+                    self._own_seqs.discard(seq)
+                    continue
+                keys[key] = None
+
+            ops = []
+            for key in keys:
+                row = self._conn.execute(self._sql_get, (key,)).fetchone()
+                ops.append(put_op(key, json.loads(row[0])) if row else delete_op(key))
+            return ops
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(self._sql_get, (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        if field not in self.indexes:
+            return super().find(field, value)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM {self.name} WHERE {field} = ?",
+                (_index_value(value),)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    # ========================================================================
+    # Writes
+    # ========================================================================
+
+    def _apply_locked(self, op: Dict[str, Any]):
+        kind = op.get("op")
+        key = op.get("key")
+
+        if kind == "put":
+            self._conn.execute(self._sql_upsert, self._row_params(key, op["record"]))
+        elif kind == "delete":
+            self._conn.execute(self._sql_delete, (key,))
+        elif kind in ("patch", "append"):
+            row = self._conn.execute(self._sql_get, (key,)).fetchone()
+            if row is None:
+                return
+            record = json.loads(row[0])
+            if kind == "patch":
+                record.update(op["fields"])
+            else:
+                values = record.setdefault(op["field"], [])
+                if len(values) <= op["index"]:
+                    values.append(op["value"])
+            self._conn.execute(self._sql_upsert, self._row_params(key, record))
+
+    def apply(self, op: Dict[str, Any]):
+        self.apply_many([op])
+
+    def apply_many(self, ops: List[Dict[str, Any]]):
+        # Writes made inside the caller's own locked section are already in
+        # its state; queued ones are refetched by changes() like foreign ones
+        in_callers_section = self._file_lock is not None and self._file_lock.owned
+        with self.lock(), self._lock, self._conn:
+            for op in ops:
+                self._apply_locked(op)
+            if self.shared:
+                self._record_changes([op.get("key") for op in ops], in_callers_section)
+
+    def _record_changes(self, keys: List[str], own: bool):
+        """Publish changed keys to the other processes (inside the write transaction)"""
+        for key in keys:
+            cursor = self._conn.execute(
+                "INSERT INTO _changes (collection, key) VALUES (?, ?)",
+                (self.name, key)
+            )
+            if own:
+                self._own_seqs.add(cursor.lastrowid)
+
+        self._writes += len(keys)
+        if self._writes >= CHANGE_LOG_RETAIN // 10:
+            self._writes = 0
+            self._conn.execute(
+                "DELETE FROM _changes WHERE seq <= (SELECT MAX(seq) FROM _changes) - ?",
+                (CHANGE_LOG_RETAIN,)
+            )
+
+    def compact(self, records: Records):
+        """Rows are always current - rewrite only if explicitly asked"""
+        if self.shared:
+            return  # another process may hold newer rows than our snapshot
+        records = resolve_records(records)
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.name}")
+            self._conn.executemany(
+                self._sql_upsert,
+                [self._row_params(key, record) for key, record in records.items()]
+            )
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Embedded SQLite backend
+
+    Features:
+    - WAL journal mode (readers never block the writer)
+    - Parameterized, cached statements
+    - Indexed columns per collection (user_id, status, email, date, ...)
+    - Optional storage thread (writer) so commits never block the caller
+    - shared=True for several worker processes: per-collection file locks
+      and a _changes feed for cache invalidation
+
+    Scope: services still load a collection's rows at startup and answer
+    lookups from their in-memory indexes (records decode lazily); SQLite
+    is the durable store they write through. The indexed get() / find()
+    queries serve scripts and ad-hoc reads - services do not route their
+    lookups through them, so a collection must still fit in memory.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str = "data/servergem.db", writer=None, shared: bool = False):
+        self.db_path = db_path
+        self.shared = shared
+        self.writer = writer
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            db_path,
+            check_same_thread=False,
+            cached_statements=256
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if shared:
+            # Wait for another process's write transaction instead of failing
+            self._conn.execute("PRAGMA busy_timeout=5000")
+        self._collections: Dict[str, Collection] = {}
+
+    def collection(
+        self,
+        name: str,
+        indexes: Sequence[str] = (),
+        path: Optional[str] = None
+    ) -> Collection:
+        if name not in self._collections:
+            file_lock = FileLock(f"{self.db_path}.{name}.lock") if self.shared else None
+            collection = SqliteCollection(name, self._conn, self._lock, indexes, file_lock)
+            if self.writer is not None:
+                collection = QueuedCollection(collection, self.writer)
+            self._collections[name] = collection
+        return self._collections[name]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
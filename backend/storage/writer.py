@@ -0,0 +1,341 @@
+"""
+Storage I/O Thread
+Runs every disk write (and ordered read) off the asyncio event loop
+"""
+
+import asyncio
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.metrics import STORAGE_FLUSH_DURATION
+
+from .base import Collection, Records
+
+
+class InlineWriter:
+    """
+    Synchronous stand-in for StorageWriter
+
+    Used by scripts (migrator, benchmarks) and when STORAGE_SYNC_WRITES
+    is set: every task runs immediately on the calling thread.
+    """
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            print(f"[Storage] ❌ I/O task failed: {e}")
+            future.set_exception(e)
+        return future
+
+    def append(self, sink: Callable[[List[Any]], Any], item: Any):
+        """Hand item to sink, which takes a list of items"""
+        try:
+            sink([item])
+        except Exception as e:
+            print(f"[Storage] ❌ I/O task failed: {e}")
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        return fn(*args, **kwargs)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        return fn(*args, **kwargs)
+
+    def flush(self, timeout: Optional[float] = None):
+        pass
+
+    async def drain(self):
+        pass
+
+    @property
+    def pending(self) -> int:
+        return 0
+
+    def close(self):
+        pass
+
+
+class StorageWriter(InlineWriter):
+    """
+    Single dedicated storage thread fed by a FIFO queue
+
+    Features:
+    - Writes are fire-and-forget for the event loop (submit returns a Future)
+    - append() buffers already-encoded items per sink; the thread writes
+      each sink's batch with one call every STORAGE_FLUSH_INTERVAL_MS
+      (default 5), so it wakes (and takes the GIL) once per batch rather
+      than once per record
+    - Reads submitted through the same queue see every earlier write:
+      submit() queues the buffered batches ahead of its task
+    - On Linux the thread runs at a lower CPU priority (niceness
+      STORAGE_WRITER_NICE, default 10): it shares the GIL and often a
+      core with the event loop, and write-behind work can wait a little
+      where request handling cannot
+    - run() / drain() are awaitable, so handlers never block on disk
+    - Remaining tasks are drained at interpreter exit
+    """
+
+    _STOP = object()
+    _FLUSH_LATER = object()
+
+    def __init__(self, name: str = "storage-writer", flush_interval_ms: float = None, nice: int = None):
+        if flush_interval_ms is None:
+            flush_interval_ms = float(os.getenv("STORAGE_FLUSH_INTERVAL_MS", "5"))
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.nice = nice if nice is not None else int(os.getenv("STORAGE_WRITER_NICE", "10"))
+        self._queue: "queue.Queue[Tuple]" = queue.Queue()
+        # sink -> items appended since the last batch was queued
+        self._buffer: Dict[Callable, List[Any]] = {}
+        self._buffer_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _lower_priority(self):
+        if not self.nice or not sys.platform.startswith("linux"):
+            return  # elsewhere PRIO_PROCESS would name a process, not this thread
+        try:
+            # Linux applies PRIO_PROCESS to a single thread given its native id
+            tid = threading.get_native_id()
+            os.setpriority(os.PRIO_PROCESS, tid, os.getpriority(os.PRIO_PROCESS, tid) + self.nice)
+        except OSError as e:
+            print(f"[Storage] Could not lower storage thread priority: {e}")
+
+    def _run(self):
+        self._lower_priority()
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                deadline = None
+                self._write_batches(self._take_buffer())
+                continue
+
+            if item is self._STOP:
+                self._write_batches(self._take_buffer())
+                self._queue.task_done()
+                return
+            if item is self._FLUSH_LATER:
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                self._queue.task_done()
+                continue
+
+            future, fn, args, kwargs = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except Exception as e:
+                    print(f"[Storage] ❌ I/O task failed: {e}")
+                    future.set_exception(e)
+            self._queue.task_done()
+
+    def _take_buffer(self) -> Dict[Callable, List[Any]]:
+        with self._buffer_lock:
+            buffer, self._buffer = self._buffer, {}
+        return buffer
+
+    @staticmethod
+    def _write_batches(buffer: Dict[Callable, List[Any]]):
+        for sink, items in buffer.items():
+            try:
+                sink(items)
+            except Exception as e:
+                print(f"[Storage] ❌ I/O task failed: {e}")
+
+    @property
+    def on_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn to run on the storage thread"""
+        if self.on_writer_thread or not self._thread.is_alive():
+            # Nested submit from a task (or after close) - run in place
+            return super().submit(fn, *args, **kwargs)
+
+        future = Future()
+        with self._buffer_lock:
+            # Buffered appends were made before this task - keep them first
+            if self._buffer:
+                batches, self._buffer = self._buffer, {}
+                self._queue.put((Future(), self._write_batches, (batches,), {}))
+            self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def append(self, sink: Callable[[List[Any]], Any], item: Any):
+        """
+        Buffer item for sink; the batch is written within flush_interval
+
+        Encode on the calling thread and pass only what the sink writes
+        (bytes / lines), so the storage thread does as little Python work
+        as possible.
+        """
+        if self.on_writer_thread or not self._thread.is_alive():
+            return super().append(sink, item)
+
+        with self._buffer_lock:
+            wake = not self._buffer
+            self._buffer.setdefault(sink, []).append(item)
+        if wake:
+            self._queue.put(self._FLUSH_LATER)
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn on the storage thread and block for the result"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn on the storage thread and await the result"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def flush(self, timeout: Optional[float] = None):
+        """Block until every task queued so far has finished"""
+        self.submit(lambda: None).result(timeout)
+
+    async def drain(self):
+        """Await completion of every task queued so far"""
+        await self.run(lambda: None)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self):
+        """Finish queued work and stop the thread"""
+        if self._thread.is_alive() and not self.on_writer_thread:
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+
+class QueuedCollection(Collection):
+    """
+    Collection wrapper that performs all I/O on the storage thread
+
+    load() stays synchronous - it only runs at service startup, before
+    any write has been queued. Operations are encoded by the caller
+    (Collection.encode_op) and reach the storage thread in batches.
+
+    Shared collections: writes made while the caller holds lock() are
+    written in place, so they are on disk before the lock is released;
+    locked() lets our queued writes land, then waits for the lock on an
+    executor thread and hands it to the calling task, so neither the
+    event loop nor the storage thread waits on another process. changes()
+    waits until our own queued writes have landed, so replaying the
+    journal never rolls the caller's state back to an older write.
+    """
+
+    def __init__(self, inner: Collection, writer: InlineWriter):
+        self.inner = inner
+        self.name = inner.name
+        self.indexes = inner.indexes
+        self.shared = inner.shared
+        self._writer = writer
+        self._compaction_queued = False
+        # Own queued writes not on disk yet (queued - written)
+        self._queued = 0
+        self._written = 0
+        self._count_lock = threading.Lock()
+
+    def load(self) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        return self.inner.load()
+
+    def apply(self, op: Dict[str, Any]):
+        self.apply_many([op])
+
+    def apply_many(self, ops: List[Dict[str, Any]]):
+        if self.shared and self._in_locked_section():
+            self.inner.apply_many(ops)
+            return
+        if self.shared:
+            with self._count_lock:
+                self._queued += len(ops)
+        for op in ops:
+            self._writer.append(self._write, self.inner.encode_op(op))
+
+    def _in_locked_section(self) -> bool:
+        return getattr(self.inner.lock(), "owned", False)
+
+    def _write(self, encoded: List[Any]):
+        """Storage thread: write one batch of encoded operations"""
+        try:
+            self._timed("apply_many", self.inner.apply_encoded, encoded)
+        finally:
+            if self.shared:
+                with self._count_lock:
+                    self._written += len(encoded)
+
+    def _timed(self, operation: str, fn: Callable, *args):
+        """Run fn on the writer thread, recording its duration"""
+        with STORAGE_FLUSH_DURATION.labels(self.name, operation).time():
+            return fn(*args)
+
+    @property
+    def needs_compaction(self) -> bool:
+        return not self._compaction_queued and self.inner.needs_compaction
+
+    def compact(self, records: Records):
+        self._compaction_queued = True
+        future = self._writer.submit(self._timed, "compact", self.inner.compact, records)
+        future.add_done_callback(self._compaction_done)
+
+    def _compaction_done(self, future: Future):
+        self._compaction_queued = False
+
+    def lock(self):
+        return self.inner.lock()
+
+    @asynccontextmanager
+    async def locked(self):
+        if not self.shared:
+            yield  # lock() is a no-op
+            return
+        lock = self.inner.lock()
+        owner = lock.current_owner()
+        if self._pending_writes():
+            # Our queued writes land first, so the section sees them
+            await self._writer.drain()
+        # Waited for on a worker thread of its own, so neither the event
+        # loop nor the storage thread stalls behind another process
+        acquired = asyncio.get_running_loop().run_in_executor(None, lock.acquire, owner)
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            # The worker takes the lock anyway - give it back
+            def release_if_taken(future: asyncio.Future):
+                if not future.cancelled() and future.exception() is None:
+                    lock.release()
+            acquired.add_done_callback(release_if_taken)
+            raise
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def _pending_writes(self) -> bool:
+        with self._count_lock:
+            return self._queued != self._written
+
+    def changes(self) -> Optional[List[Dict[str, Any]]]:
+        if not self.shared:
+            return []  # nothing else writes this collection - don't wait on the queue
+        if self._pending_writes():
+            return []  # catch up once our own writes are on disk
+        return self.inner.changes()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._writer.call(self.inner.get, key)
+
+    def find(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        return self._writer.call(self.inner.find, field, value)
+
+    def close(self):
+        self._writer.submit(self.inner.close)
@@ -0,0 +1,15 @@
+"""
+Test configuration - makes the backend packages importable
+
+Run from backend/: python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import use_scratch_data_dir  # noqa: E402
+
+# Global service instances are created on import - keep them out of backend/data
+use_scratch_data_dir(prefix="servergem-tests-")
@@ -0,0 +1,124 @@
+"""
+Deployment SSE stream tests: Last-Event-ID resume, gaps and stream end
+"""
+
+import asyncio
+import json
+
+from utils.deployment_events import DeploymentEventHub
+
+
+def _parse(messages):
+    """(event, id, data) of each SSE message; comments and retry are skipped"""
+    parsed = []
+    for message in messages:
+        fields = {}
+        for line in message.strip().split("\n"):
+            name, _, value = line.partition(": ")
+            fields[name] = value
+        if "data" in fields:
+            parsed.append((fields.get("event"), fields.get("id"), json.loads(fields["data"])))
+    return parsed
+
+
+def _collect(hub, channel, last_event_id=None):
+    async def main():
+        return [message async for message in hub.stream(channel, last_event_id)]
+    return _parse(asyncio.run(main()))
+
+
+def _progress(n):
+    return {"type": "deployment_progress", "n": n}
+
+
+def _finished_hub(events: int, size: int = 100):
+    hub = DeploymentEventHub(size=size)
+    for n in range(events):
+        hub.publish("dep_1", _progress(n))
+    hub.finish("dep_1", "live")
+    return hub, hub.get("dep_1")
+
+
+def test_stream_replays_everything_then_ends():
+    hub, channel = _finished_hub(3)
+    messages = _collect(hub, channel)
+
+    assert [event for event, _, _ in messages] == ["deployment_progress"] * 3 + ["deployment_finished"]
+    assert [event_id for _, event_id, _ in messages] == [f"{channel.stream_id}-{n}" for n in range(1, 5)]
+    assert messages[-1][2]["status"] == "live"
+
+
+def test_last_event_id_resumes_after_that_event():
+    hub, channel = _finished_hub(5)
+    messages = _collect(hub, channel, f"{channel.stream_id}-3")
+
+    assert [data.get("n") for _, _, data in messages] == [3, 4, None]
+    assert messages[0][1] == f"{channel.stream_id}-4"
+
+
+def test_id_from_another_stream_resets():
+    hub, channel = _finished_hub(2)
+    messages = _collect(hub, channel, "oldstream-7")
+
+    assert messages[0][0] == "reset"
+    assert [data.get("n") for _, _, data in messages[1:]] == [0, 1, None]
+
+
+def test_resume_behind_the_buffer_reports_a_gap():
+    hub, channel = _finished_hub(10, size=4)
+    messages = _collect(hub, channel, f"{channel.stream_id}-2")
+
+    assert messages[0][0] == "gap"
+    assert messages[0][2]["after"] == 2
+    # Ring of 4 holds events 8-11 (the last is deployment_finished)
+    assert [event_id for _, event_id, _ in messages[1:]] == [f"{channel.stream_id}-{n}" for n in range(8, 12)]
+
+
+def test_live_events_reach_a_waiting_subscriber():
+    async def main():
+        hub = DeploymentEventHub()
+        channel = hub.open("dep_1")
+        hub.publish("dep_1", _progress(0))
+        received = []
+
+        async def subscribe():
+            async for message in hub.stream(channel):
+                received.append(message)
+
+        task = asyncio.create_task(subscribe())
+        await asyncio.sleep(0.01)
+        hub.publish("dep_1", _progress(1))
+        hub.finish("dep_1", "failed")
+        await asyncio.wait_for(task, 1)
+        return _parse(received)
+
+    messages = asyncio.run(main())
+    assert [data.get("n") for _, _, data in messages] == [0, 1, None]
+
+
+def test_restart_ends_old_streams_and_starts_a_new_stream_id():
+    async def main():
+        hub = DeploymentEventHub()
+        old = hub.open("dep_1")
+        hub.publish("dep_1", _progress(0))
+        task = asyncio.create_task(_drain(hub, old))
+        await asyncio.sleep(0.01)
+        new = hub.restart("dep_1")
+        await asyncio.wait_for(task, 1)
+        return old, new
+
+    old, new = asyncio.run(main())
+    assert old.expired
+    assert new.stream_id != old.stream_id
+    assert new.resume_point(f"{old.stream_id}-1") == 0
+
+
+async def _drain(hub, channel):
+    return [message async for message in hub.stream(channel)]
+
+
+def test_publishing_after_finish_is_ignored():
+    hub, channel = _finished_hub(1)
+    hub.publish("dep_1", _progress(99))
+    hub.finish("dep_1", "live")
+    assert channel.last_id == 2
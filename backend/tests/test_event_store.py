@@ -0,0 +1,101 @@
+"""
+Deployment event store tests: filters, retention and the archive
+"""
+
+from datetime import datetime, timedelta
+
+from storage.event_store import EventStore
+
+
+def _store(tmp_path, **kwargs) -> EventStore:
+    # Test events carry fixed dates, so age-based expiry is opt-in here
+    kwargs.setdefault("retention_days", 0)
+    return EventStore(str(tmp_path / "deployment_events"), **kwargs)
+
+
+def _event(n: int, deployment_id: str = "dep_a", event_type: str = "progress", timestamp: str = None):
+    return {
+        "id": f"evt_{deployment_id}_{n}",
+        "deployment_id": deployment_id,
+        "timestamp": timestamp or f"2026-01-01T00:00:{n:02d}",
+        "event_type": event_type,
+        "message": f"event {n}",
+    }
+
+
+def test_event_type_filter_matches_types_with_spaces(tmp_path):
+    store = _store(tmp_path)
+    store.append(_event(1, event_type="build started"))
+    store.append(_event(2, event_type="progress"))
+    store.append(_event(3, event_type="build started"))
+
+    events, _ = store.latest("dep_a", event_type="build started")
+    assert [event["id"] for event in events] == ["evt_dep_a_3", "evt_dep_a_1"]
+
+
+def test_time_filters_accept_space_separated_timestamps(tmp_path):
+    store = _store(tmp_path)
+    for n in range(1, 6):
+        store.append(_event(n))
+
+    events, _ = store.latest("dep_a", since="2026-01-01 00:00:02", until="2026-01-01 00:00:04")
+    assert [event["id"] for event in events] == ["evt_dep_a_4", "evt_dep_a_3", "evt_dep_a_2"]
+
+
+def test_compaction_moves_oldest_events_to_the_archive(tmp_path):
+    store = _store(tmp_path, retention_per_deployment=3)
+    for n in range(1, 9):
+        store.append(_event(n))
+    store.append(_event(1, deployment_id="dep_b"))
+
+    assert store.compact() == 5
+    assert store.count("dep_a") == 8
+    assert store.archive.count("dep_a") == 5
+    assert store.archive.count("dep_b") == 0
+    assert [event["id"] for event in store.archived("dep_a")] == [
+        f"evt_dep_a_{n}" for n in range(1, 6)
+    ]
+
+
+def test_paging_continues_into_the_archive(tmp_path):
+    store = _store(tmp_path, retention_per_deployment=2)
+    for n in range(1, 7):
+        store.append(_event(n))
+    store.compact()
+
+    seen = []
+    cursor = None
+    while True:
+        events, cursor = store.latest("dep_a", limit=4, cursor=cursor)
+        seen.extend(event["id"] for event in events)
+        if cursor is None:
+            break
+    assert seen == [f"evt_dep_a_{n}" for n in range(6, 0, -1)]
+
+
+def test_archive_survives_reopen(tmp_path):
+    store = _store(tmp_path, retention_per_deployment=1)
+    for n in range(1, 4):
+        store.append(_event(n))
+    store.compact()
+    store.close()
+
+    reopened = _store(tmp_path, retention_per_deployment=1)
+    assert reopened.count("dep_a") == 3
+    events, _ = reopened.latest("dep_a", limit=10)
+    assert [event["id"] for event in events] == ["evt_dep_a_3", "evt_dep_a_2", "evt_dep_a_1"]
+
+
+def test_retention_days_expires_old_events_on_read(tmp_path):
+    old = (datetime.utcnow() - timedelta(days=10)).isoformat()
+    fresh = datetime.utcnow().isoformat()
+    store = _store(tmp_path)
+    store.append(_event(1, timestamp=old))
+    store.append(_event(2, timestamp=fresh))
+    store.close()
+
+    reopened = _store(tmp_path, retention_days=1)
+    events, _ = reopened.latest("dep_a")
+    assert [event["id"] for event in events] == ["evt_dep_a_2", "evt_dep_a_1"]
+    assert reopened.archive.count("dep_a") == 1
+    assert [event["id"] for event in reopened.archived("dep_a")] == ["evt_dep_a_1"]
@@ -0,0 +1,111 @@
+"""
+Heartbeat scheduler tests: pings, pongs and dead-peer detection
+"""
+
+import asyncio
+
+from utils.heartbeat import HeartbeatScheduler
+
+INTERVAL = 0.1
+TIMEOUT = 0.1
+
+
+def _scheduler() -> HeartbeatScheduler:
+    return HeartbeatScheduler(interval=INTERVAL, timeout=TIMEOUT, tick=0.02)
+
+
+class _Connection:
+    def __init__(self):
+        self.frames = []
+        self.closed = 0
+
+    def send(self, frame):
+        self.frames.append(frame)
+
+    async def close(self):
+        self.closed += 1
+
+    @property
+    def pings(self):
+        return [frame for frame in self.frames if frame["type"] == "ping"]
+
+
+def test_silent_peer_is_closed_after_the_timeout():
+    async def main():
+        scheduler = _scheduler()
+        connection = _Connection()
+        scheduler.register("s1", connection, connection.send, connection.close)
+        await asyncio.sleep(INTERVAL + TIMEOUT + 0.1)
+        await scheduler.stop()
+        return scheduler, connection
+
+    scheduler, connection = asyncio.run(main())
+    assert len(connection.pings) == 1
+    assert connection.closed == 1
+    assert len(scheduler) == 0
+
+
+def test_pong_keeps_the_connection_and_records_latency():
+    async def main():
+        scheduler = _scheduler()
+        connection = _Connection()
+        scheduler.register("s1", connection, connection.send, connection.close)
+        answered = 0
+        for _ in range(40):
+            await asyncio.sleep(0.01)
+            if len(connection.pings) > answered:
+                answered = len(connection.pings)
+                assert scheduler.pong("s1", connection.pings[-1]["id"]) is not None
+        await scheduler.stop()
+        return scheduler, connection
+
+    scheduler, connection = asyncio.run(main())
+    assert len(connection.pings) >= 2
+    assert connection.closed == 0
+    assert scheduler.latency("s1") is not None
+
+
+def test_any_inbound_frame_counts_as_alive():
+    async def main():
+        scheduler = _scheduler()
+        connection = _Connection()
+        scheduler.register("s1", connection, connection.send, connection.close)
+        for _ in range(40):
+            await asyncio.sleep(0.01)
+            scheduler.seen("s1")
+        await scheduler.stop()
+        return connection
+
+    connection = asyncio.run(main())
+    # Steady traffic makes pings unnecessary and never closes the peer
+    assert connection.pings == []
+    assert connection.closed == 0
+
+
+def test_stale_pong_does_not_count_as_an_answer():
+    async def main():
+        scheduler = _scheduler()
+        connection = _Connection()
+        scheduler.register("s1", connection, connection.send, connection.close)
+        await asyncio.sleep(INTERVAL + 0.05)
+        assert scheduler.pong("s1", ping_id=99) is None
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_unregister_after_reconnect_keeps_the_new_connection():
+    async def main():
+        scheduler = _scheduler()
+        old, new = _Connection(), _Connection()
+        scheduler.register("s1", old, old.send, old.close)
+        scheduler.register("s1", new, new.send, new.close)
+        scheduler.unregister("s1", old)
+        assert len(scheduler) == 1
+        await asyncio.sleep(INTERVAL + 0.05)
+        await scheduler.stop()
+        return old, new
+
+    old, new = asyncio.run(main())
+    assert old.frames == []
+    assert len(new.pings) == 1
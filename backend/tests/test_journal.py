@@ -0,0 +1,68 @@
+"""
+Journal replay tests
+"""
+
+from storage.journal import JournaledStore, append_op, delete_op, patch_op, put_op
+
+
+def _store(tmp_path, **kwargs) -> JournaledStore:
+    return JournaledStore(str(tmp_path / "items.json"), **kwargs)
+
+
+def _tear_last_line(store: JournaledStore):
+    """Simulate a crash in the middle of writing a journal line"""
+    with open(store.journal_path, 'a') as f:
+        f.write('{"op":"put","key":"torn","rec')
+
+
+def test_replay_applies_every_operation(tmp_path):
+    store = _store(tmp_path)
+    store.append(put_op("a", {"name": "a", "tags": []}))
+    store.append(patch_op("a", {"name": "renamed"}))
+    store.append(append_op("a", "tags", "x", 0))
+    store.append(put_op("b", {"name": "b"}))
+    store.append(delete_op("b"))
+    store.close()
+
+    assert _store(tmp_path).load_records() == {"a": {"name": "renamed", "tags": ["x"]}}
+
+
+def test_replay_ignores_torn_last_line(tmp_path):
+    store = _store(tmp_path)
+    store.append(put_op("a", {"v": 1}))
+    store.append(patch_op("a", {"v": 2}))
+    store.close()
+    _tear_last_line(store)
+
+    reopened = _store(tmp_path)
+    records, ops = reopened.load()
+    assert len(ops) == 2
+    assert reopened.load_records() == {"a": {"v": 2}}
+
+
+def test_append_after_torn_line_is_replayed(tmp_path):
+    store = _store(tmp_path)
+    store.append(put_op("a", {"v": 1}))
+    store.close()
+    _tear_last_line(store)
+
+    reopened = _store(tmp_path)
+    reopened.load()
+    reopened.append(put_op("b", {"v": 2}))
+    reopened.close()
+
+    assert _store(tmp_path).load_records() == {"a": {"v": 1}, "b": {"v": 2}}
+
+
+def test_replay_on_top_of_snapshot_is_idempotent(tmp_path):
+    store = _store(tmp_path)
+    ops = [put_op("a", {"tags": []}), append_op("a", "tags", "x", 0)]
+    for op in ops:
+        store.append(op)
+    store.compact(store.load_records())
+    # Crash between snapshot write and journal truncation: the same ops again
+    for op in ops:
+        store.append(op)
+    store.close()
+
+    assert _store(tmp_path).load_records() == {"a": {"tags": ["x"]}}
@@ -0,0 +1,101 @@
+"""
+Chunked build log store tests
+"""
+
+import os
+
+import pytest
+
+from storage.log_store import BuildLogStore
+
+
+def _store(tmp_path, **kwargs) -> BuildLogStore:
+    kwargs.setdefault("chunk_lines", 4)
+    return BuildLogStore(str(tmp_path / "build_logs"), **kwargs)
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_reads_span_chunks(tmp_path, compress):
+    store = _store(tmp_path, compress=compress)
+    store.append_many("dep_a", [f"line {n}" for n in range(10)])
+
+    assert store.count("dep_a") == 10
+    assert store.read("dep_a", 0, None) == [f"line {n}" for n in range(10)]
+    assert store.read("dep_a", 3, 4) == ["line 3", "line 4", "line 5", "line 6"]
+    assert store.read("dep_a", 9, 5) == ["line 9"]
+    assert store.read("dep_a", 10) == []
+    assert store.tail("dep_a", 3) == ["line 7", "line 8", "line 9"]
+
+
+def test_chunks_rotate_and_compress_when_sealed(tmp_path):
+    store = _store(tmp_path, compress=True)
+    store.append_many("dep_a", [f"line {n}" for n in range(6)])
+    store.append("dep_a", "line 6")
+    store.append("dep_a", "line 7")
+    store.append("dep_a", "line 8")
+
+    directory = tmp_path / "build_logs" / "dep_a"
+    assert sorted(os.listdir(directory)) == ["000000.log.gz", "000001.log.gz", "000002.log", "index.json"]
+    assert store.read("dep_a", 0, None) == [f"line {n}" for n in range(9)]
+
+
+def test_bookkeeping_survives_reopen(tmp_path):
+    _store(tmp_path).append_many("dep_a", [f"line {n}" for n in range(6)])
+
+    reopened = _store(tmp_path)
+    assert reopened.count("dep_a") == 6
+    reopened.append("dep_a", "line 6")
+    assert reopened.tail("dep_a", 2) == ["line 5", "line 6"]
+
+
+def test_lines_keep_newlines_and_unicode(tmp_path):
+    store = _store(tmp_path)
+    lines = ["multi\nline", "tab\tand ✅", ""]
+    store.append_many("dep_a", lines)
+    assert store.read("dep_a") == lines
+
+
+def test_batches_merge_per_deployment(tmp_path):
+    store = _store(tmp_path)
+    store.append_batches([
+        ("dep_a", store.encode_lines(["a1"])),
+        ("dep_b", store.encode_lines(["b1"])),
+        ("dep_a", store.encode_lines(["a2", "a3"])),
+    ])
+    assert store.read("dep_a") == ["a1", "a2", "a3"]
+    assert store.read("dep_b") == ["b1"]
+
+
+def test_unknown_deployments_are_not_cached(tmp_path):
+    store = _store(tmp_path, cache_size=2)
+    assert store.count("missing") == 0
+    assert store.read("missing") == []
+    assert "missing" not in store._logs
+
+    for name in ("dep_a", "dep_b", "dep_c"):
+        store.append(name, "x")
+    assert list(store._logs) == ["dep_b", "dep_c"]
+    assert store.read("dep_a") == ["x"]
+
+
+def test_delete_and_invalid_ids(tmp_path):
+    store = _store(tmp_path)
+    store.append_many("dep_a", ["x"] * 5)
+    store.delete("dep_a")
+    assert store.count("dep_a") == 0
+    assert not (tmp_path / "build_logs" / "dep_a").exists()
+
+    with pytest.raises(ValueError):
+        store.read("..")
+    with pytest.raises(ValueError):
+        store.append(f"a{os.sep}b", "x")
+
+
+def test_shared_stores_see_each_others_appends(tmp_path):
+    first = _store(tmp_path, shared=True)
+    second = _store(tmp_path, shared=True)
+    first.append_many("dep_a", ["a", "b", "c"])
+    assert second.count("dep_a") == 3
+
+    second.append_many("dep_a", ["d", "e"])
+    assert first.read("dep_a", 0, None) == ["a", "b", "c", "d", "e"]
@@ -0,0 +1,110 @@
+"""
+Rate limiter tests: token buckets, daily quotas and the 429 response
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from middleware.rate_limiter import PLAN_RATE_LIMITS, RateLimiter, RateLimitExceeded
+from middleware.usage_tracker import UsageTrackingMiddleware
+from models import PlanTier
+from services.user_service import user_service
+
+FREE_API_BURST = PLAN_RATE_LIMITS[PlanTier.FREE]["api"].burst
+FREE_CHAT_BURST = PLAN_RATE_LIMITS[PlanTier.FREE]["chat"].burst
+
+
+def _limiter(**kwargs) -> RateLimiter:
+    return RateLimiter(enabled=True, **kwargs)
+
+
+def _new_user(**updates):
+    name = uuid.uuid4().hex[:10]
+    user = user_service.create_user(f"{name}@example.com", name, name)
+    if updates:
+        user = user_service.update_user(user.id, **updates)
+    return user
+
+
+def test_burst_then_retry_after():
+    limiter = _limiter()
+    user = _new_user()
+    for _ in range(FREE_API_BURST):
+        limiter.hit(user.id)
+
+    with pytest.raises(RateLimitExceeded) as raised:
+        limiter.hit(user.id)
+    # 60 requests a minute: the next token is a second away
+    assert raised.value.retry_after_header == "1"
+
+
+def test_plan_tier_sets_bucket_size():
+    limiter = _limiter()
+    user = _new_user(plan_tier="pro")
+    for _ in range(PLAN_RATE_LIMITS[PlanTier.PRO]["api"].burst):
+        limiter.hit(user.id)
+    with pytest.raises(RateLimitExceeded):
+        limiter.hit(user.id)
+
+
+def test_daily_quota():
+    limiter = _limiter()
+    user = _new_user(max_requests_per_day=3)
+    for _ in range(3):
+        limiter.hit(user.id)
+
+    with pytest.raises(RateLimitExceeded) as raised:
+        limiter.hit(user.id)
+    assert "Daily limit of 3" in raised.value.reason
+    assert int(raised.value.retry_after_header) > 0
+
+
+def test_unknown_user_ids_share_the_client_bucket():
+    limiter = _limiter()
+    for n in range(FREE_CHAT_BURST):
+        limiter.hit(f"made-up-{n}", "10.0.0.1", kind="chat")
+
+    with pytest.raises(RateLimitExceeded):
+        limiter.hit("made-up-again", "10.0.0.1", kind="chat")
+    limiter.hit("made-up-again", "10.0.0.2", kind="chat")
+
+
+def test_buckets_are_bounded():
+    limiter = _limiter(max_buckets=3)
+    for n in range(10):
+        limiter.hit(None, f"10.0.0.{n}", kind="chat")
+    assert len(limiter._buckets) == 3
+    assert ("ip:10.0.0.9", "chat") in limiter._buckets
+
+
+def test_middleware_rejects_with_429():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = UsageTrackingMiddleware(app, limiter=_limiter())
+    scope = {"type": "http", "path": "/chat", "query_string": b"", "client": ("10.1.0.1", 5000)}
+
+    async def request():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, None, send)
+        return sent
+
+    async def main():
+        for _ in range(FREE_CHAT_BURST):
+            assert (await request())[0]["status"] == 200
+        return await request()
+
+    rejected = asyncio.run(main())
+    assert len(calls) == FREE_CHAT_BURST
+    assert rejected[0]["status"] == 429
+    assert (b"retry-after", b"10") in rejected[0]["headers"]
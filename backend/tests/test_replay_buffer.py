@@ -0,0 +1,70 @@
+"""
+Session replay buffer tests: sequence numbers, resume and gaps
+"""
+
+import time
+
+from utils.replay_buffer import ReplayLog, ReplayStore
+
+
+def _log(size: int = 5, events: int = 0) -> ReplayLog:
+    log = ReplayLog(size)
+    for n in range(events):
+        log.append({"type": "message", "n": n})
+    return log
+
+
+def test_frames_get_consecutive_sequence_numbers():
+    log = _log()
+    frame = {"type": "message"}
+    numbered = [log.append(frame) for _ in range(3)]
+
+    assert [f["seq"] for f in numbered] == [1, 2, 3]
+    assert "seq" not in frame
+    assert log.last_seq == 3
+
+
+def test_since_returns_missed_events():
+    log = _log(events=4)
+    events, complete = log.since(2)
+    assert [f["seq"] for f in events] == [3, 4]
+    assert complete
+
+
+def test_up_to_date_or_ahead_client_gets_nothing():
+    log = _log(events=3)
+    assert log.since(3) == ([], True)
+    assert log.since(10) == ([], True)
+
+
+def test_resume_before_the_buffer_reports_a_gap():
+    log = _log(size=3, events=6)
+    events, complete = log.since(1)
+    assert [f["seq"] for f in events] == [4, 5, 6]
+    assert not complete
+
+    # The oldest kept event directly follows last_seq: no gap
+    events, complete = log.since(3)
+    assert [f["seq"] for f in events] == [4, 5, 6]
+    assert complete
+
+
+def test_streams_differ_per_log():
+    assert ReplayLog(5).stream_id != ReplayLog(5).stream_id
+
+
+def test_store_keeps_logs_of_detached_sessions_until_the_ttl():
+    store = ReplayStore(size=5, ttl=60)
+    log = store.attach("s1")
+    log.append({"type": "message"})
+    store.attach("s2")
+
+    store.detach("s1")
+    assert store.prune() == []
+    assert store.attach("s1") is log and log.detached_at is None
+
+    store.detach("s1")
+    log.detached_at = time.monotonic() - 61
+    assert store.prune() == ["s1"]
+    assert store.get("s1") is None
+    assert len(store) == 1
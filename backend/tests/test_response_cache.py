@@ -0,0 +1,105 @@
+"""
+Conditional GET tests: ETags, 304 responses and the response cache
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from utils.response_cache import (
+    EntityVersions,
+    ResponseCache,
+    cached_json_response,
+    entity_versions,
+    etag_matches,
+    response_cache,
+)
+
+
+def _client(builds: list) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str, request: Request):
+        def build():
+            builds.append(item_id)
+            return {"id": item_id, "version": entity_versions.get(f"item:{item_id}")}
+        return cached_json_response(request, (f"item:{item_id}",), build)
+
+    return TestClient(app)
+
+
+def test_etag_then_304_until_the_entity_changes():
+    builds = []
+    client = _client(builds)
+
+    first = client.get("/items/a")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    not_modified = client.get("/items/a", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.content == b""
+
+    entity_versions.bump("item:a")
+    changed = client.get("/items/a", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["version"] == 1
+    assert builds == ["a", "a"]
+
+
+def test_cached_body_served_without_rebuilding():
+    builds = []
+    client = _client(builds)
+
+    bodies = [client.get("/items/b").content for _ in range(3)]
+    assert bodies[0] == bodies[1] == bodies[2]
+    assert builds == ["b"]
+
+    entity_versions.bump("item:other")
+    client.get("/items/b")
+    assert builds == ["b"]
+
+
+def test_bump_drops_dependent_cache_entries():
+    client = _client([])
+    client.get("/items/c")
+    key = "/items/c?"
+    assert key in response_cache._entries
+
+    entity_versions.bump("item:c")
+    assert key not in response_cache._entries
+
+
+def test_etag_matching_is_weak_and_handles_lists():
+    etag = 'W/"abc-1"'
+    assert etag_matches('W/"abc-1"', etag)
+    assert etag_matches('"abc-1"', etag)
+    assert etag_matches('W/"x", W/"abc-1"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('W/"abc-2"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_etags_change_with_epoch_and_salt():
+    versions = EntityVersions()
+    tags = ("deployment:d1",)
+    assert versions.etag(tags) != versions.etag(tags, salt="page2")
+
+    before = versions.etag(tags)
+    versions.reset()
+    assert versions.etag(tags) != before
+
+
+def test_cache_is_bounded_lru():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "e1", b"A", ("t:a",))
+    cache.put("b", "e1", b"B", ("t:b",))
+    assert cache.get("a", "e1") == b"A"
+    cache.put("c", "e1", b"C", ("t:c",))
+
+    assert len(cache) == 2
+    assert cache.get("b", "e1") is None
+    assert cache.get("a", "e2") is None
+    assert cache._by_tag.keys() == {"t:a", "t:c"}
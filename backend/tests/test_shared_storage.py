@@ -0,0 +1,236 @@
+"""
+Multi-process storage tests (STORAGE_MULTIPROCESS mode)
+"""
+
+import asyncio
+import multiprocessing
+import os
+
+import pytest
+
+from services.usage_service import UsageService
+from storage import JsonBackend, SqliteBackend, StorageWriter
+from storage.journal import JournaledStore, put_op
+from storage.shared import FileLock
+
+WORKERS = 4
+ITERATIONS = 60
+
+fork = multiprocessing.get_context("fork")
+
+
+def _shared_store(path) -> JournaledStore:
+    return JournaledStore(str(path), shared=True)
+
+
+def _run(target, *args):
+    process = fork.Process(target=target, args=args)
+    process.start()
+    process.join(60)
+    assert process.exitcode == 0
+
+
+def _append_and_compact(path):
+    store = _shared_store(path)
+    store.load()
+    store.append(put_op("b", {"v": 2}))
+    store.compact({})
+    store.close()
+
+
+def _append(path):
+    store = _shared_store(path)
+    store.load()
+    store.append(put_op("b", {"v": 2}))
+    store.close()
+
+
+def test_changes_returns_foreign_ops(tmp_path):
+    store = _shared_store(tmp_path / "items.json")
+    store.append(put_op("a", {"v": 1}))
+    assert store.load_records() == {"a": {"v": 1}}
+    assert store.changes() == []
+
+    _run(_append, tmp_path / "items.json")
+
+    assert store.changes() == [put_op("b", {"v": 2})]
+    assert store.changes() == []
+
+
+def test_changes_requests_reload_after_foreign_compaction(tmp_path):
+    store = _shared_store(tmp_path / "items.json")
+    store.append(put_op("a", {"v": 1}))
+    store.load_records()
+
+    _run(_append_and_compact, tmp_path / "items.json")
+
+    assert store.changes() is None
+    assert store.load_records() == {"a": {"v": 1}, "b": {"v": 2}}
+    assert store.changes() == []
+
+
+def test_own_compaction_keeps_position(tmp_path):
+    store = _shared_store(tmp_path / "items.json")
+    store.load()
+    with store.lock():
+        store.append(put_op("a", {"v": 1}))
+    store.compact({})
+
+    assert store.changes() == []
+    _run(_append, tmp_path / "items.json")
+    assert store.changes() == [put_op("b", {"v": 2})]
+
+
+# ============================================================================
+# Concurrent writers
+# ============================================================================
+
+def _open_backend(kind: str, data_dir: str, writer):
+    if kind == "json":
+        return JsonBackend(data_dir, writer=writer, shared=True)
+    return SqliteBackend(os.path.join(data_dir, "test.db"), writer=writer, shared=True)
+
+
+def _writer_process(kind: str, data_dir: str, worker: int):
+    os.environ["JOURNAL_COMPACT_THRESHOLD"] = "25"
+    writer = StorageWriter()
+    backend = _open_backend(kind, data_dir, writer)
+    collection = backend.collection("items", ("worker",))
+    collection.load()
+
+    async def main():
+        for i in range(ITERATIONS):
+            # Read-modify-write of one shared counter, locked off the loop
+            async with collection.locked():
+                counter = collection.load_records().get("counter", {"n": 0})
+                collection.apply(put_op("counter", {"n": counter["n"] + 1}))
+            # Blind writes of our own records, queued for the storage thread
+            collection.apply(put_op(f"{worker}-{i}", {"worker": worker, "i": i}))
+            if collection.needs_compaction:
+                collection.compact({})
+        await writer.drain()
+
+    asyncio.run(main())
+    writer.close()
+    backend.close()
+
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_concurrent_writers_lose_no_updates(tmp_path, kind):
+    data_dir = str(tmp_path)
+    processes = [
+        fork.Process(target=_writer_process, args=(kind, data_dir, worker))
+        for worker in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(120)
+    assert [process.exitcode for process in processes] == [0] * WORKERS
+
+    backend = _open_backend(kind, data_dir, None)
+    records = backend.collection("items", ("worker",)).load_records()
+    backend.close()
+
+    assert records.pop("counter") == {"n": WORKERS * ITERATIONS}
+    assert len(records) == WORKERS * ITERATIONS
+    assert all(records[f"{w}-{i}"] == {"worker": w, "i": i} for w in range(WORKERS) for i in range(ITERATIONS))
+
+
+def _usage_process(kind: str, data_dir: str, worker: int):
+    os.environ["JOURNAL_COMPACT_THRESHOLD"] = "25"
+    writer = StorageWriter()
+    backend = _open_backend(kind, data_dir, writer)
+    usage = UsageService(os.path.join(data_dir, "usage.json"), backend=backend, flush_threshold=10 ** 9)
+
+    async def main():
+        for i in range(ITERATIONS):
+            usage.track_request("user")
+            if i % 7 == 0:
+                await usage.aflush()
+        await usage.aflush()
+        await writer.drain()
+
+    asyncio.run(main())
+    writer.close()
+    backend.close()
+
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_concurrent_usage_flushes_lose_no_counts(tmp_path, kind):
+    data_dir = str(tmp_path)
+    processes = [
+        fork.Process(target=_usage_process, args=(kind, data_dir, worker))
+        for worker in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(120)
+    assert [process.exitcode for process in processes] == [0] * WORKERS
+
+    backend = _open_backend(kind, data_dir, None)
+    usage = UsageService(os.path.join(data_dir, "usage.json"), backend=backend)
+    assert usage.get_lifetime_totals("user")["requests"] == WORKERS * ITERATIONS
+    backend.close()
+
+
+# ============================================================================
+# locked() sections
+# ============================================================================
+
+def test_locked_wait_leaves_storage_thread_free(tmp_path):
+    writer = StorageWriter()
+    backend = JsonBackend(str(tmp_path), writer=writer, shared=True)
+    collection = backend.collection("items")
+    neighbour = backend.collection("others")
+    collection.load()
+    neighbour.load()
+    # A second lock on the same file stands in for another process
+    other_process = FileLock(collection.lock().path)
+
+    async def main():
+        other_process.acquire()
+        section = asyncio.create_task(_enter(collection))
+        await asyncio.sleep(0.05)
+        assert not section.done()
+        # Other collections' writes and reads still go through meanwhile
+        neighbour.apply(put_op("a", {"v": 1}))
+        assert await asyncio.wait_for(writer.run(neighbour.inner.get, "a"), 5) == {"v": 1}
+        other_process.release()
+        await asyncio.wait_for(section, 5)
+
+    asyncio.run(main())
+    writer.close()
+    backend.close()
+
+
+async def _enter(collection):
+    async with collection.locked():
+        pass
+
+
+def test_locked_section_belongs_to_its_task(tmp_path):
+    writer = StorageWriter()
+    backend = JsonBackend(str(tmp_path), writer=writer, shared=True)
+    collection = backend.collection("items")
+    collection.load()
+    lock = collection.lock()
+
+    async def other_task():
+        assert not lock.owned
+        collection.apply(put_op("other", {"v": 2}))  # queued, not written in place
+
+    async def main():
+        async with collection.locked():
+            assert lock.owned
+            await asyncio.create_task(other_task())
+            collection.apply(put_op("mine", {"v": 1}))
+            assert collection.inner.get("mine") == {"v": 1}
+        assert not lock.owned
+        await writer.drain()
+
+    asyncio.run(main())
+    assert collection.load_records() == {"mine": {"v": 1}, "other": {"v": 2}}
+    writer.close()
+    backend.close()
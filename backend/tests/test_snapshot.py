@@ -0,0 +1,55 @@
+"""
+Binary snapshot tests
+"""
+
+import pytest
+
+from storage.journal import JournaledStore, put_op
+from storage.snapshot import CODEC_JSON, CODEC_MSGPACK, load_snapshot, msgpack, write_snapshot
+
+RECORDS = {
+    "a": {"id": "a", "user_id": "u1", "nested": {"list": [1, 2.5, None, True]}, "text": "héllo"},
+    "b": {"id": "b", "user_id": "u2", "nested": {}, "text": ""},
+}
+
+CODECS = [CODEC_JSON] + ([CODEC_MSGPACK] if msgpack is not None else [])
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_snapshot_round_trip(tmp_path, codec):
+    path = str(tmp_path / "items.snap")
+    write_snapshot(path, RECORDS, index_fields=("user_id",), codec=codec)
+
+    records = load_snapshot(path)
+    assert len(records) == 2
+    assert set(records) == {"a", "b"}
+    assert dict(records) == RECORDS
+    assert records.index_fields("b") == {"user_id": "u2"}
+
+
+def test_empty_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "empty.snap")
+    write_snapshot(path, {})
+
+    assert dict(load_snapshot(path)) == {}
+
+
+def test_compaction_round_trip_through_store(tmp_path):
+    store = JournaledStore(str(tmp_path / "items.json"), index_fields=("user_id",))
+    for key, record in RECORDS.items():
+        store.append(put_op(key, record))
+    store.compact(store.load_records())
+    store.close()
+
+    reopened = JournaledStore(str(tmp_path / "items.json"))
+    records, ops = reopened.load()
+    assert ops == []
+    assert dict(records) == RECORDS
+
+
+def test_not_a_snapshot_is_rejected(tmp_path):
+    path = tmp_path / "bogus.snap"
+    path.write_bytes(b"not a snapshot at all, just some bytes")
+
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
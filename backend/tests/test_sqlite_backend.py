@@ -0,0 +1,144 @@
+"""
+SQLite backend and JSON -> SQLite migrator tests
+"""
+
+import json
+import os
+
+from storage import JsonBackend, SqliteBackend
+from storage.journal import JournaledStore, append_op, delete_op, patch_op, put_op
+from storage.migrate import migrate_json_to_sqlite
+from storage.schema import COLLECTION_INDEXES
+
+
+def _backend(tmp_path) -> SqliteBackend:
+    return SqliteBackend(str(tmp_path / "test.db"))
+
+
+def test_operations_round_trip(tmp_path):
+    backend = _backend(tmp_path)
+    items = backend.collection("items", ("owner",))
+    items.apply_many([
+        put_op("a", {"owner": "u1", "tags": []}),
+        put_op("b", {"owner": "u2"}),
+        patch_op("a", {"name": "renamed"}),
+        append_op("a", "tags", "x", 0),
+        append_op("a", "tags", "x", 0),  # replayed append is not duplicated
+        delete_op("b"),
+        patch_op("missing", {"name": "ignored"}),
+    ])
+    backend.close()
+
+    reopened = _backend(tmp_path)
+    assert reopened.collection("items", ("owner",)).load_records() == {
+        "a": {"owner": "u1", "tags": ["x"], "name": "renamed"}
+    }
+    reopened.close()
+
+
+def test_find_uses_the_indexed_column(tmp_path):
+    backend = _backend(tmp_path)
+    items = backend.collection("items", ("owner",))
+    items.apply_many([put_op(str(n), {"owner": f"u{n % 3}", "n": n}) for n in range(9)])
+    items.apply(patch_op("0", {"owner": "u9"}))
+
+    assert sorted(record["n"] for record in items.find("owner", "u0")) == [3, 6]
+    assert items.find("owner", "u9") == [{"owner": "u9", "n": 0}]
+    assert items.get("4") == {"owner": "u1", "n": 4}
+    assert items.get("nope") is None
+
+    plan = backend._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT data FROM items WHERE owner = ?", ("u0",)
+    ).fetchall()
+    assert any("idx_items_owner" in row[-1] for row in plan)
+    backend.close()
+
+
+def test_index_added_later_is_backfilled(tmp_path):
+    backend = _backend(tmp_path)
+    backend.collection("items").apply(put_op("a", {"owner": "u1"}))
+    backend.close()
+
+    reopened = _backend(tmp_path)
+    items = reopened.collection("items", ("owner",))
+    assert items.find("owner", "u1") == [{"owner": "u1"}]
+    reopened.close()
+
+
+def test_compact_replaces_rows(tmp_path):
+    backend = _backend(tmp_path)
+    items = backend.collection("items", ("owner",))
+    items.apply_many([put_op("a", {"owner": "u1"}), put_op("b", {"owner": "u2"})])
+    items.compact({"c": {"owner": "u3"}})
+
+    assert items.load_records() == {"c": {"owner": "u3"}}
+    assert items.find("owner", "u1") == []
+    backend.close()
+
+
+def test_shared_changes_skip_own_locked_writes(tmp_path):
+    path = str(tmp_path / "test.db")
+    mine, theirs = SqliteBackend(path, shared=True), SqliteBackend(path, shared=True)
+    items = mine.collection("items")
+    items.load()
+    other = theirs.collection("items")
+    other.load()
+
+    with items.lock():
+        items.apply(put_op("a", {"v": 1}))
+    other.apply(put_op("b", {"v": 2}))
+    other.apply(delete_op("a"))
+
+    assert items.changes() == [put_op("b", {"v": 2}), delete_op("a")]
+    assert items.changes() == []
+    # Writes made outside a locked section come back as current rows
+    assert other.changes() == [delete_op("a"), put_op("b", {"v": 2})]
+    mine.close()
+    theirs.close()
+
+
+def test_migrator_imports_every_collection(tmp_path):
+    data_dir = tmp_path / "data"
+    json_backend = JsonBackend(str(data_dir))
+    deployments = json_backend.collection("deployments", COLLECTION_INDEXES["deployments"])
+    deployments.load()
+    deployments.apply(put_op("dep_1", {"id": "dep_1", "user_id": "u1", "status": "live"}))
+    deployments.apply(patch_op("dep_1", {"status": "failed"}))
+    json_backend.close()
+    # Legacy usage.json nests metrics as {user_id: {date: metrics}}
+    with open(data_dir / "usage.json", "w") as f:
+        json.dump({"u1": {"2026-01-01": {"user_id": "u1", "date": "2026-01-01", "requests": 4}}}, f)
+
+    db_path = str(tmp_path / "servergem.db")
+    counts = migrate_json_to_sqlite(str(data_dir), db_path)
+    assert counts == {"deployments": 1, "users": 0, "usage": 1}
+
+    backend = SqliteBackend(db_path)
+    migrated = backend.collection("deployments", COLLECTION_INDEXES["deployments"])
+    assert migrated.find("status", "failed") == [{"id": "dep_1", "user_id": "u1", "status": "failed"}]
+    usage = backend.collection("usage", COLLECTION_INDEXES["usage"])
+    assert usage.get("u1:2026-01-01")["requests"] == 4
+    assert usage.find("date", "2026-01-01")[0]["user_id"] == "u1"
+    backend.close()
+
+
+def test_migrator_overwrite_drops_stale_rows(tmp_path):
+    data_dir = tmp_path / "data"
+    os.makedirs(data_dir)
+    store = JournaledStore(str(data_dir / "users.json"))
+    store.append(put_op("u1", {"email": "a@example.com", "username": "a"}))
+    store.close()
+
+    db_path = str(tmp_path / "servergem.db")
+    backend = SqliteBackend(db_path)
+    backend.collection("users", COLLECTION_INDEXES["users"]).apply(
+        put_op("stale", {"email": "old@example.com", "username": "old"})
+    )
+    backend.close()
+
+    migrate_json_to_sqlite(str(data_dir), db_path, overwrite=True)
+    backend = SqliteBackend(db_path)
+    assert backend.collection("users", COLLECTION_INDEXES["users"]).load_records() == {
+        "u1": {"email": "a@example.com", "username": "a"}
+    }
+    backend.close()
@@ -0,0 +1,102 @@
+"""
+Usage tracking middleware tests
+"""
+
+import asyncio
+
+from middleware.rate_limiter import RateLimiter
+from middleware.usage_tracker import UsageTrackingMiddleware
+
+
+class _Usage:
+    def __init__(self):
+        self.requests = []
+
+    def record_http_request(self, user_id, response_bytes):
+        self.requests.append((user_id, response_bytes))
+
+
+async def _streaming_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    for part in (b"abc", b"de", b""):
+        await send({"type": "http.response.body", "body": part, "more_body": bool(part)})
+
+
+def _call(middleware, path, query=b""):
+    scope = {"type": "http", "path": path, "query_string": query, "client": ("10.2.0.1", 5000)}
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, None, send))
+    return sent
+
+
+def _middleware(usage, **kwargs):
+    return UsageTrackingMiddleware(
+        _streaming_app, usage=usage, limiter=RateLimiter(enabled=False), **kwargs
+    )
+
+
+def test_counts_streamed_body_bytes_per_user():
+    usage = _Usage()
+    sent = _call(_middleware(usage), "/api/deployments", b"user_id=u1&limit=5")
+
+    assert [m["type"] for m in sent] == ["http.response.start"] + ["http.response.body"] * 3
+    assert usage.requests == [("u1", 5)]
+
+
+def test_requests_without_a_user_are_not_counted():
+    usage = _Usage()
+    middleware = _middleware(usage)
+    _call(middleware, "/api/deployments")
+    _call(middleware, "/api/deployments", b"user_id=anonymous")
+    _call(middleware, "/api/deployments", b"user_id=")
+    assert usage.requests == []
+
+
+def test_skipped_paths_pass_through():
+    usage = _Usage()
+    middleware = _middleware(usage, skip_paths={"/health"}, skip_prefixes=("/static/",))
+    assert _call(middleware, "/health", b"user_id=u1")[0]["status"] == 200
+    _call(middleware, "/static/app.js", b"user_id=u1")
+    assert usage.requests == []
+
+
+def test_non_http_scopes_pass_through():
+    usage = _Usage()
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(scope["type"])
+
+    middleware = UsageTrackingMiddleware(app, usage=usage, limiter=RateLimiter(enabled=False))
+    asyncio.run(middleware({"type": "websocket", "path": "/ws"}, None, None))
+    assert seen == ["websocket"]
+    assert usage.requests == []
+
+
+def test_counted_even_when_the_app_fails():
+    usage = _Usage()
+
+    async def failing_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"xy", "more_body": True})
+        raise RuntimeError("boom")
+
+    middleware = UsageTrackingMiddleware(failing_app, usage=usage, limiter=RateLimiter(enabled=False))
+    try:
+        _call(middleware, "/api/x", b"user_id=u2")
+    except RuntimeError:
+        pass
+    assert usage.requests == [("u2", 2)]
+
+
+def test_rejected_requests_are_not_counted():
+    usage = _Usage()
+    middleware = UsageTrackingMiddleware(_streaming_app, usage=usage, limiter=RateLimiter(enabled=True))
+    statuses = [_call(middleware, "/chat", b"user_id=ghost")[0]["status"] for _ in range(5)]
+
+    assert 429 in statuses
+    assert len(usage.requests) == statuses.index(429)
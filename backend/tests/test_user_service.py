@@ -0,0 +1,57 @@
+"""
+User service update tests
+"""
+
+import pytest
+
+from models import PlanTier
+from services.user_service import UserService
+from storage import JsonBackend
+
+
+def _service(tmp_path) -> UserService:
+    return UserService(
+        storage_path=str(tmp_path / "users.json"),
+        backend=JsonBackend(str(tmp_path))
+    )
+
+
+def test_update_coerces_plan_tier(tmp_path):
+    service = _service(tmp_path)
+    user = service.create_user("a@example.com", "alice", "Alice")
+
+    updated = service.update_user(user.id, plan_tier="pro", max_services=5)
+    assert updated.plan_tier is PlanTier.PRO
+    assert updated.to_dict()["plan_tier"] == "pro"
+
+    reloaded = _service(tmp_path).get_user(user.id)
+    assert reloaded.plan_tier is PlanTier.PRO
+    assert reloaded.max_services == 5
+
+
+@pytest.mark.parametrize("updates", [
+    {"plan_tier": "platinum"},
+    {"max_services": "5"},
+    {"max_requests_per_day": True},
+    {"settings": ["dark"]},
+    {"display_name": None},
+    {"email": "  "},
+])
+def test_invalid_update_leaves_user_unchanged(tmp_path, updates):
+    service = _service(tmp_path)
+    user = service.create_user("a@example.com", "alice", "Alice")
+
+    with pytest.raises(ValueError):
+        service.update_user(user.id, **{"email": "b@example.com", "username": "bob", **updates})
+
+    assert service.get_user(user.id).to_dict() == user.to_dict()
+    assert service.get_user_by_email("a@example.com").id == user.id
+    assert service.get_user_by_email("b@example.com") is None
+    assert service.get_user_by_username("bob") is None
+
+
+def test_unknown_fields_are_ignored(tmp_path):
+    service = _service(tmp_path)
+    user = service.create_user("a@example.com", "alice", "Alice")
+
+    assert service.update_user(user.id, id="other", nickname="al") is user
@@ -0,0 +1,159 @@
+"""
+WebSocket outbound queue tests: merging, eviction and overflow
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from utils.ws_outbound import OVERFLOW_CLOSE_CODE, OutboundQueue
+
+
+class _Socket:
+    """Records frames; send_json waits while `flowing` is clear"""
+
+    def __init__(self):
+        self.client_state = SimpleNamespace(name="CONNECTED")
+        self.sent = []
+        self.closed_with = None
+        self.flowing = asyncio.Event()
+        self.flowing.set()
+
+    async def send_json(self, frame):
+        await self.flowing.wait()
+        self.sent.append(frame)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = (code, reason)
+
+
+def _message(n):
+    return {"type": "message", "data": {"content": f"reply {n}"}}
+
+
+def _progress(stage, percent, deployment_id="dep_1"):
+    return {
+        "type": "deployment_progress", "status": "in-progress",
+        "deployment_id": deployment_id, "stage": stage, "progress": percent,
+    }
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_frames_are_sent_in_order():
+    async def main():
+        socket = _Socket()
+        queue = OutboundQueue(socket, "s1", max_frames=10)
+        queue.start()
+        for n in range(3):
+            assert queue.put(_message(n))
+        await _settle()
+        await queue.close()
+        return socket.sent
+
+    assert [frame["data"]["content"] for frame in asyncio.run(main())] == ["reply 0", "reply 1", "reply 2"]
+
+
+def test_progress_frames_merge_while_queued():
+    async def main():
+        socket = _Socket()
+        socket.flowing.clear()
+        queue = OutboundQueue(socket, "s1", max_frames=10)
+        queue.start()
+        queue.put(_message(0))
+        await _settle()  # the writer is now blocked sending reply 0
+        queue.put(_progress("build", 10))
+        queue.put(_progress("push", 5))
+        queue.put(_progress("build", 40))
+        assert len(queue) == 2
+        socket.flowing.set()
+        await _settle()
+        await queue.close()
+        return socket.sent
+
+    sent = asyncio.run(main())
+    assert [(frame.get("stage"), frame.get("progress")) for frame in sent[1:]] == [("build", 40), ("push", 5)]
+
+
+def test_full_queue_evicts_droppable_frames_and_reports_them():
+    async def main():
+        socket = _Socket()
+        socket.flowing.clear()
+        queue = OutboundQueue(socket, "s1", max_frames=3)
+        queue.start()
+        queue.put(_message(0))
+        await _settle()
+        queue.put({"type": "ping"})
+        queue.put(_message(1))
+        queue.put(_message(2))
+        # Full: the ping makes room for a must-deliver frame
+        assert queue.put(_message(3))
+        # Full of must-deliver frames: a droppable frame is refused
+        assert not queue.put({"type": "typing"})
+        assert queue.dropped == 2
+        socket.flowing.set()
+        await _settle()
+        await queue.close()
+        return socket.sent
+
+    sent = asyncio.run(main())
+    assert sent[1]["type"] == "backpressure" and sent[1]["dropped"] == 2
+    assert [frame["data"]["content"] for frame in sent if frame["type"] == "message"] == [
+        "reply 0", "reply 1", "reply 2", "reply 3"
+    ]
+
+
+def test_overflow_of_must_deliver_frames_closes_the_connection():
+    closed = []
+
+    async def main():
+        socket = _Socket()
+        socket.flowing.clear()
+        queue = OutboundQueue(socket, "s1", max_frames=2, on_closed=closed.append)
+        queue.start()
+        queue.put(_message(0))
+        await _settle()
+        queue.put(_message(1))
+        queue.put(_message(2))
+        assert not queue.put(_message(3))
+        await _settle()
+        assert queue.closed and len(queue) == 0
+        assert not queue.put(_message(4))
+        await queue.close()
+        return socket
+
+    socket = asyncio.run(main())
+    assert socket.closed_with[0] == OVERFLOW_CLOSE_CODE
+    assert len(closed) == 1
+
+
+def test_send_failure_shuts_the_queue_down():
+    closed = []
+
+    async def main():
+        socket = _Socket()
+        socket.client_state.name = "DISCONNECTED"
+        queue = OutboundQueue(socket, "s1", max_frames=5, on_closed=closed.append)
+        queue.start()
+        queue.put(_message(0))
+        await _settle()
+        assert queue.closed
+        await queue.close()
+
+    asyncio.run(main())
+    assert len(closed) == 1
+
+
+def test_close_drains_queued_frames_within_the_timeout():
+    async def main():
+        socket = _Socket()
+        queue = OutboundQueue(socket, "s1", max_frames=10)
+        queue.start()
+        for n in range(4):
+            queue.put(_message(n))
+        await queue.close(drain_timeout=1.0)
+        return socket.sent
+
+    assert len(asyncio.run(main())) == 4
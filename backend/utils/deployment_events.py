@@ -0,0 +1,226 @@
+"""
+Deployment Event Streams
+Per-deployment progress event log with Server-Sent Events delivery and Last-Event-ID resume
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+
+class DeploymentChannel:
+    """
+    Progress events of one deployment
+
+    Features:
+    - Events are numbered; the SSE id is "<stream>-<n>", where the stream
+      part changes whenever the channel is recreated (server restart,
+      expiry), so a stale Last-Event-ID never skips events of a new stream
+    - Bounded ring buffer (SSE_BUFFER_SIZE events). Subscribers read it by
+      cursor - there is no per-subscriber queue, so a slow reader only
+      falls behind and at worst gets a gap notice
+    - finished after the deployment's terminal event; subscribers drain
+      what is left and the stream ends
+    - expired when dropped by the hub without finishing (idle too long);
+      subscribers' streams end as well
+    """
+
+    __slots__ = (
+        "deployment_id", "stream_id", "last_id", "events",
+        "updated_at", "finished_at", "expired", "_changed"
+    )
+
+    def __init__(self, deployment_id: str, size: int):
+        self.deployment_id = deployment_id
+        self.stream_id = uuid.uuid4().hex[:8]
+        self.last_id = 0
+        self.events: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=size)
+        self.updated_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.expired = False
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def append(self, event: Dict[str, Any]):
+        self.last_id += 1
+        self.events.append((self.last_id, event))
+        self.updated_at = time.monotonic()
+        self._wake()
+
+    def finish(self):
+        if self.finished_at is None:
+            self.finished_at = time.monotonic()
+            self._wake()
+
+    def expire(self):
+        self.expired = True
+        self._wake()
+
+    def _wake(self):
+        # Each waiter holds the event it started on; swap in a fresh one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def resume_point(self, last_event_id: Optional[str]) -> int:
+        """Number of the last event the client has, from its Last-Event-ID"""
+        if not last_event_id:
+            return 0
+        stream_id, _, number = last_event_id.rpartition("-")
+        if stream_id != self.stream_id or not number.isdigit():
+            return 0
+        return int(number)
+
+    def since(self, after: int) -> Tuple[List[Tuple[int, Dict[str, Any]]], bool]:
+        """(events after the given number, whether none were lost to the ring buffer)"""
+        if after >= self.last_id:
+            return [], True
+        complete = not self.events or self.events[0][0] <= after + 1
+        return [(number, event) for number, event in self.events if number > after], complete
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for a new event or the end of the deployment; False on timeout"""
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+def format_sse(data: Dict[str, Any], event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    """One Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class DeploymentEventHub:
+    """
+    Progress events by deployment ID, for GET /api/deployments/{id}/stream
+
+    Features:
+    - ProgressNotifier and DeploymentProgressTracker publish every frame
+      they produce, whether or not a chat WebSocket is listening
+    - DeploymentService publishes status changes of stored deployments and
+      finishes their channel on a terminal status
+    - finish() publishes a deployment_finished event and ends the stream
+    - Finished channels are kept SSE_RETENTION seconds (default 600) for
+      late subscribers and resumes, then dropped; channels without an
+      event for SSE_IDLE_TIMEOUT seconds (default 3600) are dropped too,
+      ending their streams
+    """
+
+    KEEPALIVE_SECONDS = 15.0
+    RETRY_MS = 3000
+
+    def __init__(self, size: int = None, retention: float = None, idle_timeout: float = None):
+        self.size = size or int(os.getenv("SSE_BUFFER_SIZE", "1000"))
+        self.retention = retention or float(os.getenv("SSE_RETENTION", "600"))
+        self.idle_timeout = idle_timeout or float(os.getenv("SSE_IDLE_TIMEOUT", "3600"))
+        self._channels: Dict[str, DeploymentChannel] = {}
+        self._last_prune = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def get(self, deployment_id: str) -> Optional[DeploymentChannel]:
+        return self._channels.get(deployment_id)
+
+    def open(self, deployment_id: str) -> DeploymentChannel:
+        """The deployment's channel, created on first use"""
+        channel = self._channels.get(deployment_id)
+        if channel is None:
+            self._prune()
+            channel = self._channels[deployment_id] = DeploymentChannel(deployment_id, self.size)
+        return channel
+
+    def restart(self, deployment_id: str) -> DeploymentChannel:
+        """Replace the deployment's channel with a new stream (e.g. a redeploy)"""
+        channel = self._channels.pop(deployment_id, None)
+        if channel is not None and not channel.finished:
+            channel.expire()
+        return self.open(deployment_id)
+
+    def publish(self, deployment_id: str, event: Dict[str, Any]):
+        """Record a progress frame for the deployment's subscribers"""
+        channel = self.open(deployment_id)
+        if not channel.finished:
+            channel.append(event)
+
+    def finish(self, deployment_id: str, status: Optional[str] = None):
+        """The deployment is over (idempotent)"""
+        channel = self._channels.get(deployment_id)
+        if channel is None or channel.finished:
+            return
+        channel.append({
+            'type': 'deployment_finished',
+            'deployment_id': deployment_id,
+            'status': status,
+            'timestamp': datetime.now().isoformat()
+        })
+        channel.finish()
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        cutoff = now - self.retention
+        idle_cutoff = now - self.idle_timeout
+        for deployment_id, channel in list(self._channels.items()):
+            if channel.finished_at is not None:
+                if channel.finished_at < cutoff:
+                    del self._channels[deployment_id]
+            elif channel.updated_at < idle_cutoff:
+                # Nothing will finish it - end its subscribers' streams
+                del self._channels[deployment_id]
+                channel.expire()
+
+    async def stream(self, channel: DeploymentChannel, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        SSE body for one subscriber: everything after last_event_id, then
+        live events until the deployment finishes or its channel expires
+
+        Idle periods get a comment line every KEEPALIVE_SECONDS so proxies
+        and CDNs keep the response open.
+        """
+        yield f"retry: {self.RETRY_MS}\n\n"
+        cursor = channel.resume_point(last_event_id)
+        if last_event_id and cursor == 0 and channel.last_id:
+            # Unknown or stale ID: the client gets the whole stream again
+            yield format_sse({'deployment_id': channel.deployment_id, 'complete': False}, event='reset')
+
+        while True:
+            events, complete = channel.since(cursor)
+            if not complete:
+                yield format_sse({'deployment_id': channel.deployment_id, 'after': cursor}, event='gap')
+            for number, event in events:
+                yield format_sse(event, event=event.get('type'), event_id=f"{channel.stream_id}-{number}")
+                cursor = number
+            if cursor < channel.last_id:
+                # Published while we were yielding
+                continue
+            if channel.finished or channel.expired:
+                return
+            if not await channel.wait(self.KEEPALIVE_SECONDS):
+                # Idle channels also expire when no new channel triggers a prune
+                self._prune()
+                if channel.expired:
+                    return
+                yield ": keep-alive\n\n"
+
+
+# Global instance
+deployment_events = DeploymentEventHub()
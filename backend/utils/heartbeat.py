@@ -0,0 +1,236 @@
+"""
+Heartbeat Scheduler
+One timer for every WebSocket connection's pings, pong latency and dead-peer detection
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.metrics import WEBSOCKET_DEAD_CONNECTIONS, WEBSOCKET_PONG_LATENCY
+
+logger = logging.getLogger("servergem.websocket.heartbeat")
+
+
+class _Beat:
+    """Heartbeat state for one connection"""
+
+    __slots__ = (
+        "session_id", "token", "send", "close", "due", "ping_id",
+        "ping_sent_at", "last_seen", "latency", "cancelled",
+    )
+
+    def __init__(self, session_id: str, token: Any, send: Callable, close: Callable, now: float):
+        self.session_id = session_id
+        self.token = token
+        self.send = send
+        self.close = close
+        self.due = 0.0
+        self.ping_id = 0
+        self.ping_sent_at: Optional[float] = None
+        self.last_seen = now
+        self.latency: Optional[float] = None
+        self.cancelled = False
+
+
+class HeartbeatScheduler:
+    """
+    Shared heartbeat for all WebSocket sessions
+
+    Features:
+    - A single task and a min-heap of (due, beat) entries instead of a
+      sleeping task per connection; deadlines are rounded up to a tick
+      (WS_HEARTBEAT_TICK, default 1 s) so everything due in the same
+      tick is handled in one wake-up
+    - Every WS_HEARTBEAT_INTERVAL seconds (default 30) a connection gets
+      {"type": "ping", "id": n}; the client echoes {"type": "pong", "id": n}
+      and the round trip is recorded per session and in a histogram
+    - A connection that sends nothing at all - no pong, no message -
+      within WS_HEARTBEAT_TIMEOUT seconds (default 20) of a ping is
+      closed; any inbound frame counts as a sign of life
+    - Unregistering is O(1): stale heap entries are skipped when popped
+    """
+
+    def __init__(self, interval: float = None, timeout: float = None, tick: float = None):
+        self.interval = interval or float(os.getenv("WS_HEARTBEAT_INTERVAL", "30"))
+        self.timeout = timeout or float(os.getenv("WS_HEARTBEAT_TIMEOUT", "20"))
+        self.tick = tick or float(os.getenv("WS_HEARTBEAT_TICK", "1"))
+        self._beats: Dict[str, _Beat] = {}
+        self._heap: List[Tuple[float, int, _Beat]] = []
+        self._counter = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._beats)
+
+    # ========================================================================
+    # Registration
+    # ========================================================================
+
+    def register(
+        self,
+        session_id: str,
+        token: Any,
+        send: Callable[[Dict[str, Any]], Any],
+        close: Callable[[], Any]
+    ):
+        """
+        Start heartbeats for a connection
+
+        Args:
+            session_id: Session the connection serves (replaces any earlier beat)
+            token: Identifies the connection, so a stale unregister() after
+                a reconnect leaves the new connection alone
+            send: Queues a frame on the connection (must not block)
+            close: Coroutine function that closes the dead connection
+        """
+        previous = self._beats.get(session_id)
+        if previous is not None:
+            previous.cancelled = True
+        loop = asyncio.get_running_loop()
+        beat = _Beat(session_id, token, send, close, loop.time())
+        self._beats[session_id] = beat
+        self._schedule(beat, loop.time() + self.interval)
+        self.start()
+
+    def unregister(self, session_id: str, token: Any = None):
+        """Stop heartbeats for a connection (only if token still matches)"""
+        beat = self._beats.get(session_id)
+        if beat is None or (token is not None and beat.token is not token):
+            return
+        beat.cancelled = True
+        del self._beats[session_id]
+
+    # ========================================================================
+    # Inbound frames
+    # ========================================================================
+
+    def seen(self, session_id: str):
+        """The client sent something - it is alive"""
+        beat = self._beats.get(session_id)
+        if beat is not None:
+            beat.last_seen = asyncio.get_running_loop().time()
+
+    def pong(self, session_id: str, ping_id: Optional[int] = None) -> Optional[float]:
+        """
+        Record a pong; returns the round trip in seconds when it answers
+        the outstanding ping
+        """
+        beat = self._beats.get(session_id)
+        if beat is None:
+            return None
+        now = asyncio.get_running_loop().time()
+        beat.last_seen = now
+        if beat.ping_sent_at is None or (ping_id is not None and ping_id != beat.ping_id):
+            return None
+        latency = now - beat.ping_sent_at
+        beat.latency = latency
+        beat.ping_sent_at = None
+        WEBSOCKET_PONG_LATENCY.observe(latency)
+        logger.debug("Pong from %s after %.1f ms", session_id, latency * 1000)
+        return latency
+
+    def latency(self, session_id: str) -> Optional[float]:
+        """Last measured round trip for a session, in seconds"""
+        beat = self._beats.get(session_id)
+        return beat.latency if beat is not None else None
+
+    # ========================================================================
+    # Scheduler
+    # ========================================================================
+
+    def start(self):
+        """Start the scheduler task (on the running event loop)"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def _schedule(self, beat: _Beat, when: float):
+        # Round up to the tick so connections due close together share a wake-up
+        due = math.ceil(when / self.tick) * self.tick
+        beat.due = due
+        self._counter += 1
+        wake = not self._heap or due < self._heap[0][0]
+        heapq.heappush(self._heap, (due, self._counter, beat))
+        if wake and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            if self._heap:
+                delay = self._heap[0][0] - loop.time()
+            else:
+                delay = None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = loop.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, _, beat = heapq.heappop(self._heap)
+                if beat.cancelled or due != beat.due:
+                    continue
+                try:
+                    self._fire(beat, now)
+                except Exception as e:
+                    logger.error(
+                        "Heartbeat error for %s: %s", beat.session_id, e,
+                        extra={"session_id": beat.session_id}
+                    )
+
+    def _fire(self, beat: _Beat, now: float):
+        if beat.ping_sent_at is not None:
+            if beat.last_seen < beat.ping_sent_at:
+                self._dead(beat, now)
+                return
+            # No pong, but the client has been talking since the ping
+            beat.ping_sent_at = None
+
+        if now - beat.last_seen < self.interval - self.tick:
+            # Recent inbound traffic already proves the connection is alive
+            self._schedule(beat, beat.last_seen + self.interval)
+            return
+
+        beat.ping_id += 1
+        beat.ping_sent_at = now
+        beat.send({
+            'type': 'ping',
+            'id': beat.ping_id,
+            'timestamp': datetime.now().isoformat()
+        })
+        logger.debug("Heartbeat sent to %s", beat.session_id, extra={"session_id": beat.session_id})
+        self._schedule(beat, now + self.timeout)
+
+    def _dead(self, beat: _Beat, now: float):
+        # The scheduler task runs for every session - name this one explicitly
+        logger.warning(
+            "No response from %s for %.0fs after ping - closing connection",
+            beat.session_id, now - beat.ping_sent_at,
+            extra={"session_id": beat.session_id}
+        )
+        WEBSOCKET_DEAD_CONNECTIONS.inc()
+        self.unregister(beat.session_id, beat.token)
+        asyncio.ensure_future(beat.close())
+
+
+# Global instance
+heartbeat_scheduler = HeartbeatScheduler()
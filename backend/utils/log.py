@@ -0,0 +1,240 @@
+"""
+Structured Logging
+Non-blocking, queue-backed log output with correlation IDs, per-module levels and sampling
+
+Configuration (environment):
+- LOG_LEVEL: root level (default INFO)
+- LOG_LEVELS: per-logger levels, e.g. "agents.orchestrator=DEBUG,servergem.websocket=WARNING"
+- LOG_SAMPLING: keep 1 in N records below WARNING per logger, e.g.
+  "servergem.websocket.send=100" (defaults: DEFAULT_SAMPLING)
+- LOG_FORMAT: "json" (one object per line, Cloud Logging field names) or
+  "text" (default: json on Cloud Run, text elsewhere)
+- LOG_QUEUE_SIZE: records buffered for the writer thread before new ones
+  are dropped (default 10000)
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterator, Optional
+
+
+# High-frequency events: 1 in N kept when their logger is enabled
+DEFAULT_SAMPLING = {
+    "servergem.websocket.send": 100,
+    "servergem.websocket.heartbeat": 10,
+    "utils.progress_notifier": 10,
+}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s %(session_id)s/%(deployment_id)s] - %(message)s"
+
+session_id_var: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+deployment_id_var: ContextVar[Optional[str]] = ContextVar("deployment_id", default=None)
+
+_CONTEXT_VARS = {"session_id": session_id_var, "deployment_id": deployment_id_var}
+
+# Attributes every LogRecord has - anything else came in through extra={...}
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "correlation_id", "session_id", "deployment_id", "sample_rate",
+}
+
+
+def bind_log_context(**ids: Optional[str]):
+    """
+    Attach correlation IDs (session_id, deployment_id) to every record
+    logged from the current task from now on
+
+    Tasks created afterwards inherit them; use log_context() for a scope
+    that ends.
+    """
+    for name, value in ids.items():
+        _CONTEXT_VARS[name].set(value)
+
+
+@contextmanager
+def log_context(**ids: Optional[str]) -> Iterator[None]:
+    """Attach correlation IDs to records logged inside the with-block"""
+    tokens = [(_CONTEXT_VARS[name], _CONTEXT_VARS[name].set(value)) for name, value in ids.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Fill in correlation fields on every record
+
+    Values passed explicitly (extra={"session_id": ...}, or a service's
+    LoggerAdapter correlation_id) win over the task's bound context.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, var in _CONTEXT_VARS.items():
+            if getattr(record, name, None) is None:
+                setattr(record, name, var.get() or "-")
+        if not hasattr(record, "correlation_id"):
+            record.correlation_id = "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep 1 in N records below WARNING for the configured loggers
+
+    Rates apply to a logger and its children; warnings and errors always
+    pass. Kept records carry sample_rate so counts can be scaled back up.
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = {name: rate for name, rate in rates.items() if rate > 1}
+        self._resolved: Dict[str, int] = {}
+        self._seen: Dict[str, int] = {}
+
+    def _rate(self, name: str) -> int:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, prefix = 1, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate == 1:
+            return True
+        seen = self._seen.get(record.name, 0)
+        self._seen[record.name] = seen + 1
+        if seen % rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; severity / message / time as Cloud Logging expects"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in ("session_id", "deployment_id", "correlation_id"):
+            value = getattr(record, name, "-")
+            if value != "-":
+                entry[name] = value
+        if getattr(record, "sample_rate", None):
+            entry["sample_rate"] = record.sample_rate
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRS and not name.startswith("_"):
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without ever waiting
+
+    Message formatting happens here (args may be mutable), everything else
+    on the listener thread. When the queue is full the record is dropped
+    and counted; the count is reported once there is room again.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            notice = logging.LogRecord(
+                "servergem.logging", logging.WARNING, __file__, 0,
+                f"Dropped {dropped} log records (queue full)", None, None
+            )
+            ContextFilter().filter(notice)
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self.dropped += dropped
+
+
+def _parse_mapping(spec: str) -> Dict[str, str]:
+    """'a=1,b.c=2' -> {'a': '1', 'b.c': '2'}"""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {name.strip(): value.strip() for name, value in pairs if name.strip()}
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> QueueListener:
+    """
+    Route all logging through one non-blocking queue handler
+
+    Safe to call more than once; only the first call configures.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    fmt = fmt or os.getenv("LOG_FORMAT") or ("json" if os.getenv("K_SERVICE") else "text")
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    handler = NonBlockingQueueHandler(log_queue)
+    rates = {**DEFAULT_SAMPLING, **{
+        name: int(rate) for name, rate in _parse_mapping(os.getenv("LOG_SAMPLING", "")).items()
+    }}
+    handler.addFilter(SamplingFilter(rates))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    for name, module_level in _parse_mapping(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(module_level.upper())
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
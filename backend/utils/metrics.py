@@ -0,0 +1,339 @@
+"""
+Prometheus Metrics
+Dependency-free counters, gauges and histograms rendered in the text exposition format
+"""
+
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Seconds - HTTP handlers and WebSocket sends
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds - LLM calls, build and deploy stages
+SLOW_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class CounterValue:
+    """One counter series"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class GaugeValue:
+    """One gauge series - set directly or read from a callback at scrape time"""
+
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def get(self) -> float:
+        return float(self.function()) if self.function is not None else self.value
+
+
+class HistogramValue:
+    """One histogram series: per-bucket counts, made cumulative only when rendered"""
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Metric:
+    """
+    A named metric family with zero or more label dimensions
+
+    labels() returns the series object for one set of label values; it
+    is cached, so hot paths can either call labels() per event (one dict
+    lookup) or keep the series around and call it directly.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def series(self) -> List[Tuple[Tuple[str, ...], object]]:
+        """(label values, series) pairs - a snapshot, safe while others record"""
+        return list(self._series.items())
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in self.series():
+            lines.extend(self._render_series(values, series))
+        return lines
+
+    def _render_series(self, values: Tuple[str, ...], series) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_series(self) -> CounterValue:
+        return CounterValue()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _render_series(self, values, series: CounterValue) -> List[str]:
+        return [f"{self.name}_total{self._label_text(values)} {_format(series.value)}"]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_series(self) -> GaugeValue:
+        return GaugeValue()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self.labels().set_function(function)
+
+    def _render_series(self, values, series: GaugeValue) -> List[str]:
+        try:
+            value = series.get()
+        except Exception:
+            return []
+        return [f"{self.name}{self._label_text(values)} {_format(value)}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+
+    def _new_series(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_series(self, values, series: HistogramValue) -> List[str]:
+        counts = list(series.counts)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = 'le="%s"' % _format(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(values, le)} {cumulative}")
+        labels = self._label_text(values)
+        lines.append(f"{self.name}_sum{labels} {_format(series.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide metric families for the /metrics endpoint
+
+    Features:
+    - No locks on the hot path: an observation is a bisect plus two
+      in-place increments on a per-series object, and each series is
+      written from a single thread (the event loop or the storage writer)
+    - Gauges can be backed by callbacks evaluated only when scraped
+    - Prometheus text exposition format (version 0.0.4)
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> bytes:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+@contextmanager
+def track_llm_call(agent: str) -> Iterator[None]:
+    """Observe an LLM request's latency, labelled ok / error by outcome"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        LLM_REQUEST_DURATION.labels(agent, outcome).observe(time.perf_counter() - start)
+
+
+# Global instance
+registry = MetricsRegistry()
+
+# ============================================================================
+# Metric families
+# ============================================================================
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "servergem_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+WEBSOCKET_SEND_DURATION = registry.histogram(
+    "servergem_websocket_send_duration_seconds",
+    "Time to write one WebSocket frame by message type",
+    ("type",),
+)
+WEBSOCKET_DROPPED_FRAMES = registry.counter(
+    "servergem_websocket_outbound_frames_discarded",
+    "Outbound frames coalesced or merged into a newer one, dropped for a slow client, or overflowing its queue",
+    ("reason",),
+)
+WEBSOCKET_QUEUED_FRAMES = registry.gauge(
+    "servergem_websocket_queued_frames",
+    "Frames waiting in per-connection send queues",
+)
+WEBSOCKET_PONG_LATENCY = registry.histogram(
+    "servergem_websocket_pong_latency_seconds",
+    "Round trip from a heartbeat ping to the client's pong",
+)
+WEBSOCKET_DEAD_CONNECTIONS = registry.counter(
+    "servergem_websocket_dead_connections",
+    "Connections closed for not answering a heartbeat ping",
+)
+WEBSOCKET_ACTIVE_SESSIONS = registry.gauge(
+    "servergem_websocket_active_sessions",
+    "Chat WebSocket sessions currently connected",
+)
+LLM_REQUEST_DURATION = registry.histogram(
+    "servergem_llm_request_duration_seconds",
+    "Gemini request latency by calling agent and outcome",
+    ("agent", "outcome"),
+    buckets=SLOW_BUCKETS,
+)
+DEPLOYMENTS_STARTED = registry.counter(
+    "servergem_deployments_started",
+    "Deployments started by the orchestrator",
+)
+DEPLOYMENT_DURATION = registry.histogram(
+    "servergem_deployment_duration_seconds",
+    "End-to-end deployment time by final status",
+    ("status",),
+    buckets=SLOW_BUCKETS,
+)
+DEPLOYMENT_STAGE_DURATION = registry.histogram(
+    "servergem_deployment_stage_duration_seconds",
+    "Duration of each build / deploy pipeline stage",
+    ("stage", "status"),
+    buckets=SLOW_BUCKETS,
+)
+CLOUD_BUILDS = registry.counter(
+    "servergem_cloud_builds",
+    "Cloud Build runs by result",
+    ("status",),
+)
+STORAGE_FLUSH_DURATION = registry.histogram(
+    "servergem_storage_flush_duration_seconds",
+    "Time spent writing a batch or snapshot to storage, per collection",
+    ("collection", "operation"),
+)
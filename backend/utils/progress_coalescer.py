@@ -0,0 +1,118 @@
+"""
+Progress Coalescing
+Buffers a session's progress frames for a short window and sends them as one batch
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from utils.metrics import WEBSOCKET_DROPPED_FRAMES
+
+
+def progress_frame_key(frame: Dict[str, Any]) -> Tuple[bool, Optional[Hashable]]:
+    """
+    (is progress, collapse key) for an outbound frame
+
+    Progress frames are ProgressNotifier updates (deployment_progress),
+    orchestrator progress messages and DeploymentProgressTracker messages.
+    Percentage-only updates get a collapse key: within one window only
+    the latest value per deployment and stage is kept.
+    """
+    frame_type = frame.get('type')
+    if frame_type == 'deployment_progress':
+        if frame.get('status') == 'in-progress' and frame.get('progress') is not None:
+            return True, ('deployment_progress', frame.get('deployment_id'), frame.get('stage'))
+        return True, None
+    if frame_type == 'message':
+        metadata = (frame.get('data') or {}).get('metadata') or {}
+        if metadata.get('type') == 'progress':
+            return True, None
+        if metadata.get('deployment_id'):
+            if metadata.get('percentage'):
+                return True, ('message', metadata['deployment_id'], metadata.get('stage'))
+            return True, None
+    return False, None
+
+
+class _Window:
+    __slots__ = ("frames", "keys", "timer")
+
+    def __init__(self):
+        self.frames: List[Dict[str, Any]] = []
+        self.keys: Dict[Hashable, int] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class ProgressCoalescer:
+    """
+    Per-session progress batching
+
+    Features:
+    - The first progress frame of a session opens a window of
+      WS_PROGRESS_BATCH_MS (default 75 ms); everything buffered by then
+      goes out as one {"type": "progress_batch", "events": [...]} frame
+      (a lone event is sent as-is)
+    - Percentage updates for the same deployment/stage collapse to the
+      latest value
+    - deliver() is called with (session_id, frame) and is synchronous -
+      it only has to queue the frame for the connection's writer
+    - Callers flush() before sending a non-progress frame so ordering
+      across both kinds is preserved
+    - A window of 0 disables batching
+    """
+
+    def __init__(self, deliver: Callable[[str, Dict[str, Any]], bool], window_ms: float = None):
+        self.deliver = deliver
+        if window_ms is None:
+            window_ms = float(os.getenv("WS_PROGRESS_BATCH_MS", "75"))
+        self.window = window_ms / 1000.0
+        self._windows: Dict[str, _Window] = {}
+
+    def add(self, session_id: str, frame: Dict[str, Any], key: Optional[Hashable] = None) -> bool:
+        """Buffer a progress frame; returns False only if an immediate send failed"""
+        if self.window <= 0:
+            return self.deliver(session_id, frame)
+
+        window = self._windows.get(session_id)
+        if window is None:
+            window = self._windows[session_id] = _Window()
+            window.timer = asyncio.get_running_loop().call_later(self.window, self.flush, session_id)
+
+        if key is not None:
+            previous = window.keys.get(key)
+            if previous is not None:
+                # Drop the stale value; the latest goes after anything logged since
+                window.frames[previous] = None
+                WEBSOCKET_DROPPED_FRAMES.labels("coalesced").inc()
+            window.keys[key] = len(window.frames)
+        window.frames.append(frame)
+        return True
+
+    def flush(self, session_id: str) -> bool:
+        """Send whatever is buffered for a session now"""
+        window = self._windows.pop(session_id, None)
+        if window is None:
+            return True
+        if window.timer is not None:
+            window.timer.cancel()
+
+        events = [frame for frame in window.frames if frame is not None]
+        if len(events) == 1:
+            return self.deliver(session_id, events[0])
+        return self.deliver(session_id, {
+            'type': 'progress_batch',
+            'events': events,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    def pending(self, session_id: str) -> int:
+        window = self._windows.get(session_id)
+        return sum(frame is not None for frame in window.frames) if window else 0
+
+    def discard(self, session_id: str):
+        """Forget a session's buffered frames"""
+        window = self._windows.pop(session_id, None)
+        if window is not None and window.timer is not None:
+            window.timer.cancel()
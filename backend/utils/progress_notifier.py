@@ -4,9 +4,15 @@ Uses safe WebSocket sending to avoid "close message sent" errors
 """
 
 import asyncio
+import logging
 from typing import Callable, Optional
 from datetime import datetime
 
+from utils.deployment_events import deployment_events
+from utils.metrics import DEPLOYMENT_STAGE_DURATION
+
+logger = logging.getLogger(__name__)
+
 
 class DeploymentStages:
     """Stage name constants"""
@@ -38,6 +44,8 @@ class ProgressNotifier:
         self.safe_send = safe_send_func
         self.current_stage = None
         self.stage_start_time = None
+        # SSE subscribers (GET /api/deployments/{id}/stream) can attach from now on
+        deployment_events.open(deployment_id)
     
     async def send_update(
         self,
@@ -64,13 +72,17 @@ class ProgressNotifier:
         if progress is not None:
             payload["progress"] = progress
         
+        deployment_events.publish(self.deployment_id, payload)
+        
         # Use safe send function
         success = await self.safe_send(self.session_id, payload)
         
+        # Correlation IDs passed explicitly - updates may come from other tasks
+        ids = {"session_id": self.session_id, "deployment_id": self.deployment_id}
         if success:
-            print(f"[Progress] ✅ Sent: {stage} - {status}")
+            logger.debug("Sent: %s - %s", stage, status, extra=ids)
         else:
-            print(f"[Progress] ⚠️  Failed to send: {stage} - {status}")
+            logger.warning("Failed to send: %s - %s", stage, status, extra=ids)
     
     async def start_stage(self, stage: str, message: str):
         """Mark stage as started"""
@@ -78,11 +90,18 @@ class ProgressNotifier:
         self.stage_start_time = datetime.now()
         await self.send_update(stage, "in-progress", message)
     
+    def _stage_duration(self, stage: str, status: str) -> Optional[float]:
+        """Seconds since the last start_stage; recorded when it was this stage"""
+        if not self.stage_start_time:
+            return None
+        duration = (datetime.now() - self.stage_start_time).total_seconds()
+        if stage == self.current_stage:
+            DEPLOYMENT_STAGE_DURATION.labels(stage, status).observe(duration)
+        return duration
+    
     async def complete_stage(self, stage: str, message: str, details: Optional[dict] = None):
         """Mark stage as completed"""
-        duration = None
-        if self.stage_start_time:
-            duration = (datetime.now() - self.stage_start_time).total_seconds()
+        duration = self._stage_duration(stage, "success")
         
         if details is None:
             details = {}
@@ -94,6 +113,7 @@ class ProgressNotifier:
     
     async def fail_stage(self, stage: str, error_message: str, details: Optional[dict] = None):
         """Mark stage as failed"""
+        self._stage_duration(stage, "failed")
         await self.send_update(stage, "error", error_message, details=details)
     
     async def update_progress(self, stage: str, message: str, progress: int):
@@ -0,0 +1,104 @@
+"""
+Session Replay Buffer
+Sequence-numbered outbound events per session, replayed to a reconnecting client
+"""
+
+import os
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+class ReplayLog:
+    """
+    Outbound events of one session
+
+    Features:
+    - Every event gets the next sequence number (seq) of the session's
+      stream; stream_id changes whenever the log is recreated (server
+      restart, expiry), so a client never resumes against the wrong stream
+    - Bounded ring buffer (WS_REPLAY_BUFFER_SIZE events): the oldest
+      events fall off, and a resume from before them is reported as a gap
+    - Events are recorded whether or not the client is connected, so
+      progress sent during a reconnect is not lost
+    """
+
+    __slots__ = ("stream_id", "last_seq", "events", "detached_at")
+
+    def __init__(self, size: int):
+        self.stream_id = uuid.uuid4().hex[:12]
+        self.last_seq = 0
+        self.events: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=size)
+        self.detached_at: Optional[float] = None
+
+    def append(self, frame: Dict[str, Any]) -> Dict[str, Any]:
+        """Number a frame and keep it; returns the numbered copy to send"""
+        self.last_seq += 1
+        frame = {**frame, 'seq': self.last_seq}
+        self.events.append((self.last_seq, frame))
+        return frame
+
+    def since(self, last_seq: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Events after last_seq, oldest first
+
+        Returns:
+            (events, complete) - complete is False when some of the missed
+            events already fell out of the buffer
+        """
+        if last_seq >= self.last_seq:
+            return [], True
+        complete = not self.events or self.events[0][0] <= last_seq + 1
+        return [frame for seq, frame in self.events if seq > last_seq], complete
+
+
+class ReplayStore:
+    """
+    Replay logs for all sessions
+
+    Logs outlive their connection: a session that stays disconnected for
+    longer than WS_REPLAY_TTL seconds (default 3600) is dropped by prune().
+    Logs are per process, so a resume only replays on the instance that
+    sent the events.
+    """
+
+    def __init__(self, size: int = None, ttl: float = None):
+        self.size = size or int(os.getenv("WS_REPLAY_BUFFER_SIZE", "500"))
+        self.ttl = ttl or float(os.getenv("WS_REPLAY_TTL", "3600"))
+        self._logs: Dict[str, ReplayLog] = {}
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def get(self, session_id: str) -> Optional[ReplayLog]:
+        return self._logs.get(session_id)
+
+    def attach(self, session_id: str) -> ReplayLog:
+        """A connection for the session is live (creates its log on first use)"""
+        log = self._logs.get(session_id)
+        if log is None:
+            log = self._logs[session_id] = ReplayLog(self.size)
+        log.detached_at = None
+        return log
+
+    def detach(self, session_id: str):
+        """The session's connection went away; keep its log until the TTL"""
+        log = self._logs.get(session_id)
+        if log is not None:
+            log.detached_at = time.monotonic()
+
+    def prune(self) -> List[str]:
+        """Drop logs of sessions disconnected for longer than the TTL"""
+        cutoff = time.monotonic() - self.ttl
+        expired = [
+            session_id for session_id, log in self._logs.items()
+            if log.detached_at is not None and log.detached_at < cutoff
+        ]
+        for session_id in expired:
+            del self._logs[session_id]
+        return expired
+
+
+# Global instance
+replay_store = ReplayStore()
@@ -0,0 +1,178 @@
+"""
+Conditional GET Support
+Entity version counters, ETags and a bounded cache of serialized responses
+"""
+
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import Request, Response
+
+
+class EntityVersions:
+    """
+    Per-entity change counters
+
+    Services bump a tag from every mutation method - including changes
+    replayed from other worker processes - and endpoints turn the tags
+    they depend on into an ETag:
+    - deployment:<id>      one deployment record
+    - deployments:<user>   any deployment of a user (list pages, counts)
+    - user:<id>            one user record
+    - usage:<user>         a user's usage metrics
+
+    Features:
+    - O(1) bump and lookup
+    - Listeners (the response cache) hear about every bump
+    - ETags carry a per-process epoch: counters restart with the process
+      and differ between workers, so a tag from one can never match
+      different content in another
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def bump(self, *tags: str):
+        """Record a change to each tag"""
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+            for listener in self._listeners:
+                listener(tag)
+
+    def reset(self):
+        """Invalidate every ETag at once (after a full reload from storage)"""
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def get(self, tag: str) -> int:
+        return self._versions.get(tag, 0)
+
+    def etag(self, tags: Iterable[str], salt: str = "") -> str:
+        """Weak ETag for a response built from the given tags"""
+        versions = '.'.join(str(self._versions.get(tag, 0)) for tag in tags)
+        return f'W/"{self.epoch}-{salt}-{versions}"' if salt else f'W/"{self.epoch}-{versions}"'
+
+    def subscribe(self, listener: Callable[[str], None]):
+        self._listeners.append(listener)
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized JSON bodies
+
+    Entries are stored with their ETag and the tags they were built from;
+    bumping any of those tags drops the entry right away, and a lookup
+    only hits when the stored ETag is still current.
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+        # cache key -> (etag, body, tags)
+        self._entries: "OrderedDict[str, Tuple[str, bytes, Tuple[str, ...]]]" = OrderedDict()
+        # tag -> cache keys built from it
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, etag: str) -> Optional[bytes]:
+        """Cached body for key if it was stored under etag"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, etag: str, body: bytes, tags: Tuple[str, ...]):
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (etag, body, tags)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, tag: str):
+        """Drop every entry built from tag"""
+        if tag not in self._by_tag:
+            return
+        with self._lock:
+            for key in list(self._by_tag.get(tag, ())):
+                self._drop(key)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, so W/ prefixes are ignored)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    current = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
+
+
+def cached_json_response(
+    request: Request,
+    tags: Tuple[str, ...],
+    build: Callable[[], Any],
+    salt: str = ""
+) -> Response:
+    """
+    Serve a JSON body with an ETag, a 304 or a cached serialization
+
+    Args:
+        request: Incoming request (If-None-Match, cache key)
+        tags: Entity version tags the body depends on
+        build: Produces the payload; only called on a cache miss
+        salt: Extra ETag input for state that has no version tag
+    """
+    etag = entity_versions.etag(tags, salt)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    key = f"{request.url.path}?{request.url.query}"
+    body = response_cache.get(key, etag)
+    if body is None:
+        body = json.dumps(build(), separators=(',', ':')).encode('utf-8')
+        response_cache.put(key, etag, body, tags)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Global instances
+entity_versions = EntityVersions()
+response_cache = ResponseCache()
+entity_versions.subscribe(response_cache.invalidate)
@@ -0,0 +1,230 @@
+"""
+WebSocket Outbound Queue
+Bounded per-connection send queue drained by a single writer task
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from fastapi import WebSocket
+
+from utils.metrics import WEBSOCKET_DROPPED_FRAMES, WEBSOCKET_SEND_DURATION
+
+logger = logging.getLogger("servergem.websocket.send")
+
+# Close code sent to a client that cannot keep up with must-deliver frames
+OVERFLOW_CLOSE_CODE = 1013  # "Try Again Later"
+
+
+def frame_policy(frame: Dict[str, Any]) -> Tuple[bool, Optional[Hashable]]:
+    """
+    (droppable, merge key) for an outbound frame
+
+    - Heartbeats, typing indicators and in-progress updates are droppable:
+      a newer frame makes them obsolete
+    - Frames with a merge key replace a queued frame with the same key
+      instead of queueing behind it (latest progress per deployment/stage)
+    - Everything else (chat replies, errors, stage results, deployment
+      start/complete) must be delivered
+    """
+    frame_type = frame.get('type')
+    if frame_type in ('ping', 'typing'):
+        return True, (frame_type,)
+    if frame_type == 'deployment_progress' and frame.get('status') == 'in-progress':
+        return True, ('progress', frame.get('deployment_id'), frame.get('stage'))
+    if frame_type == 'message':
+        metadata = (frame.get('data') or {}).get('metadata') or {}
+        if metadata.get('type') == 'progress':
+            return True, None
+    return False, None
+
+
+class _Entry:
+    __slots__ = ("frame", "droppable", "key")
+
+    def __init__(self, frame: Dict[str, Any], droppable: bool, key: Optional[Hashable]):
+        self.frame = frame
+        self.droppable = droppable
+        self.key = key
+
+
+class OutboundQueue:
+    """
+    Outbound frames for one WebSocket connection
+
+    Features:
+    - put() never waits: producers (the orchestrator, progress notifiers,
+      heartbeats) enqueue and carry on, and a single writer task does
+      every websocket.send_json in order - a slow browser only delays
+      its own frames
+    - Bounded (WS_SEND_QUEUE_SIZE frames). When full, the oldest droppable
+      frame is evicted; mergeable frames overwrite their queued
+      predecessor in place
+    - Overflow signal: after frames were dropped the client receives one
+      {"type": "backpressure", "dropped": n} frame before the next frame
+    - When a must-deliver frame finds the queue full of must-deliver
+      frames the client is not keeping up at all: the connection is closed
+      with code 1013 so it reconnects instead of lagging ever further
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        max_frames: int = None,
+        on_closed: Optional[Callable[["OutboundQueue"], None]] = None
+    ):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.max_frames = max_frames or int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+        self.on_closed = on_closed
+        self.closed = False
+        self.dropped = 0
+        self._unreported_drops = 0
+        self._frames: Deque[_Entry] = deque()
+        self._by_key: Dict[Hashable, _Entry] = {}
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def start(self):
+        """Start the writer task (on the running event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def put(self, frame: Dict[str, Any]) -> bool:
+        """
+        Queue a frame for sending
+
+        Returns:
+            False if the frame was dropped or the connection is closed
+        """
+        if self.closed:
+            return False
+
+        droppable, key = frame_policy(frame)
+        if key is not None:
+            queued = self._by_key.get(key)
+            if queued is not None:
+                queued.frame = frame
+                WEBSOCKET_DROPPED_FRAMES.labels("merged").inc()
+                return True
+
+        if len(self._frames) >= self.max_frames and not self._evict_droppable():
+            if droppable:
+                self._count_drop()
+                return False
+            self._overflow()
+            return False
+
+        entry = _Entry(frame, droppable, key)
+        self._frames.append(entry)
+        if key is not None:
+            self._by_key[key] = entry
+        self._ready.set()
+        return True
+
+    def _evict_droppable(self) -> bool:
+        """Drop the oldest droppable frame; False if there is none"""
+        for entry in self._frames:
+            if entry.droppable:
+                self._frames.remove(entry)
+                if entry.key is not None and self._by_key.get(entry.key) is entry:
+                    del self._by_key[entry.key]
+                self._count_drop()
+                return True
+        return False
+
+    def _count_drop(self):
+        self.dropped += 1
+        self._unreported_drops += 1
+        WEBSOCKET_DROPPED_FRAMES.labels("dropped").inc()
+
+    def _overflow(self):
+        """Must-deliver frame with no room: disconnect the slow client"""
+        WEBSOCKET_DROPPED_FRAMES.labels("overflow").inc()
+        logger.warning(
+            "Send queue overflow for %s (%d frames queued) - closing connection",
+            self.session_id, len(self._frames)
+        )
+        self._shutdown()
+        asyncio.ensure_future(self._close_socket(OVERFLOW_CLOSE_CODE, "Send queue overflow"))
+
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def _run(self):
+        """Writer task: the only code that sends on this connection"""
+        try:
+            while True:
+                while not self._frames:
+                    self._ready.clear()
+                    await self._ready.wait()
+
+                if self._unreported_drops:
+                    dropped, self._unreported_drops = self._unreported_drops, 0
+                    await self._send({
+                        'type': 'backpressure',
+                        'dropped': dropped,
+                        'timestamp': datetime.now().isoformat()
+                    })
+
+                entry = self._frames.popleft()
+                if entry.key is not None and self._by_key.get(entry.key) is entry:
+                    del self._by_key[entry.key]
+                await self._send(entry.frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if "close message has been sent" in str(e):
+                logger.warning("Session %s already closed, stopping writer", self.session_id)
+            else:
+                logger.error("Error sending to %s: %s", self.session_id, e)
+            self._shutdown()
+
+    async def _send(self, frame: Dict[str, Any]):
+        if self.websocket.client_state.name != "CONNECTED":
+            raise RuntimeError(f"not connected (state: {self.websocket.client_state.name})")
+        message_type = frame.get('type', 'unknown')
+        with WEBSOCKET_SEND_DURATION.labels(message_type).time():
+            await self.websocket.send_json(frame)
+        logger.debug("Sent to %s: %s", self.session_id, message_type)
+
+    def _shutdown(self):
+        """Stop accepting frames and notify the owner (once)"""
+        if self.closed:
+            return
+        self.closed = True
+        self._frames.clear()
+        self._by_key.clear()
+        if self.on_closed is not None:
+            self.on_closed(self)
+
+    async def close(self, drain_timeout: float = 0.0):
+        """
+        Stop the writer task
+
+        Args:
+            drain_timeout: Seconds to let already queued frames go out first
+        """
+        if drain_timeout and self._task is not None and not self.closed:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + drain_timeout
+            while self._frames and not self._task.done() and loop.time() < deadline:
+                await asyncio.sleep(0.01)
+        self.closed = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
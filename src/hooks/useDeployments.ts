@@ -23,7 +23,6 @@ export interface Deployment {
   created_at: string;
   updated_at: string;
   last_deployed?: string;
-  build_logs: string[];
   error_message?: string;
   request_count: number;
   uptime_percentage: number;
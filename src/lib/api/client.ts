@@ -90,8 +90,28 @@ class APIClient {
   // Deployment Operations
   // ========================================================================
 
-  async listDeployments(userId: string) {
-    return this.request(`/api/deployments?user_id=${userId}`, {
+  async listDeployments(
+    userId: string,
+    options: {
+      status?: string;
+      region?: string;
+      createdAfter?: string;
+      createdBefore?: string;
+      sort?: 'created_at' | '-created_at' | 'updated_at' | '-updated_at';
+      limit?: number;
+      cursor?: string;
+    } = {}
+  ) {
+    const params = new URLSearchParams({ user_id: userId });
+    if (options.status) params.set('status', options.status);
+    if (options.region) params.set('region', options.region);
+    if (options.createdAfter) params.set('created_after', options.createdAfter);
+    if (options.createdBefore) params.set('created_before', options.createdBefore);
+    if (options.sort) params.set('sort', options.sort);
+    if (options.limit) params.set('limit', String(options.limit));
+    if (options.cursor) params.set('cursor', options.cursor);
+
+    return this.request(`/api/deployments?${params.toString()}`, {
       method: 'GET',
     });
   }
@@ -137,8 +157,11 @@ class APIClient {
     });
   }
 
-  async getDeploymentEvents(deploymentId: string, limit: number = 50) {
-    return this.request(`/api/deployments/${deploymentId}/events?limit=${limit}`, {
+  async getDeploymentEvents(deploymentId: string, limit: number = 50, cursor?: string) {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) params.set('cursor', cursor);
+
+    return this.request(`/api/deployments/${deploymentId}/events?${params.toString()}`, {
       method: 'GET',
     });
   }
@@ -150,6 +173,13 @@ class APIClient {
     });
   }
 
+  async addDeploymentLogs(deploymentId: string, lines: string[]) {
+    return this.request(`/api/deployments/${deploymentId}/logs/batch`, {
+      method: 'POST',
+      body: JSON.stringify({ lines }),
+    });
+  }
+
   // ========================================================================
   // Usage Operations
   // ========================================================================
@@ -42,6 +42,10 @@ export class WebSocketClient {
   private heartbeatTimer: NodeJS.Timeout | null = null;
   private heartbeatTimeoutTimer: NodeJS.Timeout | null = null;
   
+  // Resume position: stream and last sequence number processed
+  private streamId: string | undefined;
+  private lastSeq = 0;
+  
   // Message queue for offline scenarios
   private messageQueue: ClientMessage[] = [];
   
@@ -233,6 +237,9 @@ export class WebSocketClient {
       session_id: this.sessionId, // This persists across reconnections!
       instance_id: this.instanceId, // For debugging
       is_reconnect: wasReconnect, // Now correctly reports reconnections!
+      // Resume: the server replays numbered frames sent after last_seq
+      stream_id: this.streamId,
+      last_seq: this.streamId ? this.lastSeq : undefined,
       metadata: {
         userAgent: navigator.userAgent,
         timestamp: new Date().toISOString(),
@@ -256,28 +263,79 @@ export class WebSocketClient {
     try {
       const message: ServerMessage = JSON.parse(event.data);
       console.log('[WebSocket] Received message:', message.type);
-      
-      // Handle pong for heartbeat
-      if (message.type === 'pong') {
-        this.handlePong();
-        return;
-      }
-      
-      // Emit to all message handlers
-      this.eventHandlers.message.forEach(handler => {
-        try {
-          handler(message);
-        } catch (error) {
-          console.error('[WebSocket] Message handler error:', error);
-        }
-      });
-      
+      this.dispatchMessage(message);
     } catch (error) {
       console.error('[WebSocket] Message parse error:', error);
       this.emitError(new Error('Failed to parse server message'));
     }
   }
   
+  private dispatchMessage(message: ServerMessage): void {
+    // Numbered frames: skip anything already processed (overlap after a resume)
+    if (message.seq !== undefined) {
+      if (message.seq <= this.lastSeq) {
+        return;
+      }
+      this.lastSeq = message.seq;
+    }
+    
+    // New stream (first connect or server restarted): numbering starts over
+    if (message.type === 'connected' && message.stream_id !== this.streamId) {
+      this.streamId = message.stream_id;
+      this.lastSeq = 0;
+    }
+    
+    // Handle pong for heartbeat
+    if (message.type === 'pong') {
+      this.handlePong();
+      return;
+    }
+    
+    // Server heartbeat: answer right away so it can measure latency
+    if (message.type === 'ping') {
+      this.sendMessage({
+        type: 'pong',
+        id: message.id,
+        timestamp: new Date().toISOString(),
+      });
+      return;
+    }
+    
+    // Server could not keep up with this client and skipped stale progress frames
+    if (message.type === 'backpressure') {
+      console.warn(`[WebSocket] ⚠️ Server dropped ${message.dropped} low-priority frames (slow connection)`);
+    }
+    
+    // Coalesced progress: hand each event to the handlers as if it arrived alone
+    if (message.type === 'progress_batch') {
+      message.events.forEach(event => this.emitMessage(event));
+      return;
+    }
+    
+    // Frames sent while we were reconnecting
+    if (message.type === 'replay') {
+      console.log(`[WebSocket] 🔁 Replaying ${message.events.length} missed frames`);
+      if (!message.complete) {
+        console.warn('[WebSocket] ⚠️ Some frames sent while disconnected are no longer available');
+      }
+      message.events.forEach(event => this.dispatchMessage(event));
+      return;
+    }
+    
+    this.emitMessage(message);
+  }
+  
+  private emitMessage(message: ServerMessage): void {
+    // Emit to all message handlers
+    this.eventHandlers.message.forEach(handler => {
+      try {
+        handler(message);
+      } catch (error) {
+        console.error('[WebSocket] Message handler error:', error);
+      }
+    });
+  }
+  
   private handleError(event: Event): void {
     console.error('[WebSocket] WebSocket error:', event);
     const error = new Error('WebSocket connection error');
@@ -354,10 +412,13 @@ export class WebSocketClient {
         
         // 90 second timeout for long-running operations like deployments
         // Backend may be busy building containers, analyzing code, etc.
-        this.heartbeatTimeoutTimer = setTimeout(() => {
-          console.warn('[WebSocket] ⚠️ Heartbeat timeout - no pong received, reconnecting...');
-          this.ws?.close();
-        }, 90000); // 90 second timeout - be patient during deployments
+        // Counted from the oldest unanswered ping
+        if (!this.heartbeatTimeoutTimer) {
+          this.heartbeatTimeoutTimer = setTimeout(() => {
+            console.warn('[WebSocket] ⚠️ Heartbeat timeout - no pong received, reconnecting...');
+            this.ws?.close();
+          }, 90000); // 90 second timeout - be patient during deployments
+        }
       }
     }, 30000); // Send ping every 30 seconds
   }
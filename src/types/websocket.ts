@@ -38,12 +38,17 @@ export type ServerMessageType =
   | 'deployment_update'   // Deployment progress update (legacy)
   | 'deployment_complete' // Deployment finished
   | 'error'               // Error occurred
+  | 'backpressure'        // Server dropped low-priority frames for this client
+  | 'progress_batch'      // Several progress frames coalesced into one
+  | 'replay'              // Frames missed while reconnecting
+  | 'ping'                // Server heartbeat - answer with pong
   | 'pong';               // Heartbeat response
 
 export type ClientMessageType =
   | 'init'                // Initialize connection
   | 'message'             // User message
-  | 'ping';               // Heartbeat
+  | 'ping'                // Heartbeat
+  | 'pong';               // Answer to a server heartbeat ping
 
 // ============================================================================
 // Client Messages (Frontend → Backend)
@@ -54,6 +59,8 @@ export interface ClientInitMessage {
   session_id: string;
   instance_id?: string;
   is_reconnect?: boolean;
+  stream_id?: string;     // Stream from the last 'connected' frame
+  last_seq?: number;      // Last sequence number processed - missed frames are replayed
   metadata?: {
     userAgent: string;
     timestamp: string;
@@ -71,10 +78,17 @@ export interface ClientPingMessage {
   timestamp: string;
 }
 
+export interface ClientPongMessage {
+  type: 'pong';
+  id: number;             // Echoes the server ping's id (round-trip measurement)
+  timestamp: string;
+}
+
 export type ClientMessage = 
   | ClientInitMessage 
   | ClientChatMessage 
-  | ClientPingMessage;
+  | ClientPingMessage
+  | ClientPongMessage;
 
 // ============================================================================
 // Server Messages (Backend → Frontend)
@@ -83,6 +97,7 @@ export type ClientMessage =
 export interface ServerConnectedMessage {
   type: 'connected';
   session_id: string;
+  stream_id: string;      // Sequence numbers restart when this changes
   message: string;
 }
 
@@ -173,12 +188,42 @@ export interface ServerErrorMessage {
   timestamp: string;
 }
 
+export interface ServerBackpressureMessage {
+  type: 'backpressure';
+  dropped: number;
+  timestamp: string;
+}
+
+export interface ServerProgressBatchMessage {
+  type: 'progress_batch';
+  events: ServerMessage[];  // In send order; unpacked by the WebSocket client
+  timestamp: string;
+}
+
+export interface ServerReplayMessage {
+  type: 'replay';
+  events: ServerMessage[];  // Oldest first, each with its seq
+  complete: boolean;        // False if some missed frames were no longer buffered
+  timestamp: string;
+}
+
+export interface ServerPingMessage {
+  type: 'ping';
+  id: number;
+  timestamp: string;
+}
+
 export interface ServerPongMessage {
   type: 'pong';
   timestamp: string;
 }
 
-export type ServerMessage = 
+// Replayable frames carry a per-session sequence number
+export interface ServerSequenced {
+  seq?: number;
+}
+
+export type ServerMessage = ServerSequenced & (
   | ServerConnectedMessage
   | ServerTypingMessage
   | ServerChatMessage
@@ -188,7 +233,12 @@ export type ServerMessage =
   | ServerDeploymentUpdate
   | ServerDeploymentComplete
   | ServerErrorMessage
-  | ServerPongMessage;
+  | ServerBackpressureMessage
+  | ServerProgressBatchMessage
+  | ServerReplayMessage
+  | ServerPingMessage
+  | ServerPongMessage
+);
 
 // ============================================================================
 // Message Actions (UI Interactions)